@@ -0,0 +1,70 @@
+"""
+Endpoints JSON del carrito como vistas asíncronas.
+
+El contador del carrito y "agregar al carrito" desde fetch son los pedidos
+más frecuentes del sitio. Servidos por ASGI (``ferreteria_ecommerce.asgi``
+con workers de uvicorn), mientras esperan la caché o la base de datos no
+ocupan un hilo del worker: un mismo proceso atiende muchos a la vez. Bajo
+WSGI siguen funcionando igual, Django las ejecuta en un bucle propio.
+
+La reserva de stock es transaccional y el ORM no admite transacciones
+asíncronas, así que ``add_to_cart`` la delega a ``views.add_item`` con
+``sync_to_async``.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_POST
+
+from catalog.models import Product, ProductVariant
+from .store import aget_item_count
+from .views import add_item
+
+
+async def cart_count(request):
+    """
+    Obtener cantidad de items en el carrito (para AJAX). Sin cookie de carrito
+    responde 0 sin tocar la base de datos ni la sesión; el ETag permite que el
+    navegador revalide y reciba 304.
+    """
+    count = await aget_item_count(request)
+    etag = f'"cart-{count}"'
+    response = get_conditional_response(request, etag=etag) or JsonResponse({'count': count})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _error(message, status=400, cart_count=0):
+    return JsonResponse({'success': False, 'message': message, 'cart_count': cart_count}, status=status)
+
+
+@require_POST
+async def add_to_cart(request, product_id):
+    """Agregar producto al carrito desde fetch; responde siempre JSON"""
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        return _error('La cantidad no es válida.', cart_count=await aget_item_count(request))
+    if quantity <= 0:
+        return _error('La cantidad debe ser mayor a 0.', cart_count=await aget_item_count(request))
+
+    product = await Product.objects.filter(id=product_id, is_active=True).afirst()
+    if product is None:
+        return _error('El producto no existe.', status=404, cart_count=await aget_item_count(request))
+
+    variant = None
+    variant_id = request.POST.get('variant_id')
+    if variant_id:
+        if variant_id.isdigit():
+            variant = await ProductVariant.objects.filter(id=variant_id, product=product, is_active=True).afirst()
+        if variant is None:
+            return _error('La variante seleccionada no es válida.', cart_count=await aget_item_count(request))
+
+    level, message = await sync_to_async(add_item)(request, product, variant, quantity)
+    return JsonResponse(
+        {'success': level == messages.SUCCESS, 'message': message, 'cart_count': await aget_item_count(request)},
+        status=200 if level == messages.SUCCESS else 400,
+    )
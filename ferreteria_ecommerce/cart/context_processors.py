@@ -0,0 +1,6 @@
+from .store import get_item_count
+
+
+def cart(request):
+    """Contador del carrito para el encabezado; se calcula solo si la plantilla lo usa"""
+    return {'cart_count': lambda: get_item_count(request)}
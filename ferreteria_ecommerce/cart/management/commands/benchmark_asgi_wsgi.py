@@ -0,0 +1,123 @@
+import importlib.util
+import os
+import shutil
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from catalog.models import Product
+
+SERVERS = {
+    'wsgi': ['ferreteria_ecommerce.wsgi:application'],
+    'asgi': ['ferreteria_ecommerce.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Comparar los endpoints JSON del carrito y catálogo servidos por WSGI (gunicorn) y ASGI (uvicorn)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Procesos de gunicorn (los mismos en ambos casos)')
+        parser.add_argument('--concurrency', type=int, default=64, help='Pedidos simultáneos del cliente')
+        parser.add_argument('--requests', type=int, default=2000, help='Pedidos por endpoint y servidor')
+        parser.add_argument('--port', type=int, default=8765, help='Puerto local para el servidor de prueba')
+        parser.add_argument('--servers', default='wsgi,asgi', help='Servidores a comparar, separados por coma')
+
+    def handle(self, *args, **options):
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        if not servers or any(name not in SERVERS for name in servers):
+            raise CommandError('--servers acepta wsgi y/o asgi')
+        gunicorn = shutil.which('gunicorn')
+        if gunicorn is None:
+            raise CommandError('gunicorn no está instalado (pip install -r requirements.txt)')
+        if 'asgi' in servers and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('uvicorn no está instalado (pip install -r requirements.txt)')
+
+        ids = list(Product.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)[:20])
+        if not ids:
+            raise CommandError('No hay productos activos: ejecuta populate_database primero')
+        endpoints = {
+            'Contador del carrito': '/cart/count/',
+            'Disponibilidad (20 productos)': '/api/availability/?ids=' + ','.join(map(str, ids)),
+        }
+
+        self.stdout.write(
+            f'{options["workers"]} workers, {options["concurrency"]} pedidos simultáneos, '
+            f'{options["requests"]} pedidos por endpoint'
+        )
+        results = []
+        for name in servers:
+            process = self.start(gunicorn, name, options)
+            try:
+                for label, path in endpoints.items():
+                    url = f'http://127.0.0.1:{options["port"]}{path}'
+                    result = self.load(url, options['requests'], options['concurrency'])
+                    result.update(server=name.upper(), endpoint=label)
+                    results.append(result)
+                    self.stdout.write(self.style.SUCCESS(f'✓ {name.upper()} {label}: {result["per_second"]:.0f} pedidos/s'))
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'{"Servidor":<9} {"Endpoint":<30} {"Pedidos/s":>10} {"p50 ms":>8} {"p95 ms":>8} {"Errores":>8}')
+        for r in results:
+            self.stdout.write(
+                f'{r["server"]:<9} {r["endpoint"]:<30} {r["per_second"]:>10.0f} '
+                f'{r["p50"]:>8.1f} {r["p95"]:>8.1f} {r["errors"]:>8}'
+            )
+        if any(r['errors'] for r in results):
+            self.stdout.write(self.style.WARNING('\nHubo pedidos con error: revisa el log del servidor'))
+
+    def start(self, gunicorn, name, options):
+        """Levantar gunicorn con la aplicación WSGI o ASGI y esperar a que responda"""
+        command = [gunicorn, *SERVERS[name], '--workers', str(options['workers']),
+                   '--bind', f'127.0.0.1:{options["port"]}', '--log-level', 'warning']
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+        url = f'http://127.0.0.1:{options["port"]}/cart/count/'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'✗ gunicorn ({name}) terminó al iniciar')
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                return process
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'✗ gunicorn ({name}) no respondió en 30 segundos')
+
+    def load(self, url, total, concurrency):
+        """Hacer ``total`` pedidos con ``concurrency`` hilos; devuelve pedidos/s, percentiles y errores"""
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                ok = False
+            return ok, (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies = [ms for ok, ms in samples if ok] or [0]
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'per_second': sum(ok for ok, _ in samples) / elapsed if elapsed else 0,
+            'p50': percentiles[49],
+            'p95': percentiles[94],
+            'errors': sum(not ok for ok, _ in samples),
+        }
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from cart.models import Cart, CartItem
+
+
+class Command(BaseCommand):
+    help = 'Comparar los totales guardados de los carritos con los items y corregir los desfases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar los carritos desfasados sin corregirlos',
+        )
+
+    def handle(self, *args, **options):
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        carts = Cart.objects.annotate(
+            real_count=Coalesce(
+                Subquery(items.annotate(total=Sum('quantity')).values('total'), output_field=IntegerField()),
+                0,
+            ),
+            real_subtotal=Coalesce(
+                Subquery(
+                    items.annotate(total=Sum(F('quantity') * F('price'))).values('total'),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                Decimal('0'),
+            ),
+        )
+        drifted = carts.filter(~Q(item_count=F('real_count')) | ~Q(subtotal=F('real_subtotal'))).order_by('id')
+
+        checked = Cart.objects.count()
+        fixed = 0
+        for cart in drifted:
+            self.stdout.write(self.style.ERROR(
+                f'✗ Carrito {cart.id}: {cart.item_count} items / RD$ {cart.subtotal} guardados, '
+                f'{cart.real_count} items / RD$ {cart.real_subtotal} reales'
+            ))
+            if not options['dry_run'] and cart.recalculate_totals():
+                fixed += 1
+                self.stdout.write(self.style.SUCCESS(f'✓ Carrito {cart.id} corregido'))
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'Carritos revisados: {checked}')
+        self.stdout.write(f'Carritos corregidos: {fixed}')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\nModo --dry-run: no se modificó nada'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n¡Totales de carritos verificados!'))
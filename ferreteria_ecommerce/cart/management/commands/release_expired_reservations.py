@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from cart.models import StockReservation
+from cart.reservations import release_expired, resync_reserved_quantities
+
+
+class Command(BaseCommand):
+    help = 'Liberar el stock de las reservas de carrito vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Reservas liberadas por transacción',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SEGUNDOS',
+            help='Seguir ejecutándose y revisar cada SEGUNDOS (modo worker)',
+        )
+        parser.add_argument(
+            '--resync',
+            action='store_true',
+            help='Recalcular reserved_quantity a partir de las reservas vigentes',
+        )
+
+    def sweep(self, batch_size):
+        released = release_expired(batch_size=batch_size)
+        if released:
+            self.stdout.write(f'[{timezone.now():%H:%M:%S}] Reservas vencidas liberadas: {released}')
+        return released
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['loop']:
+            self.stdout.write(f'Revisando reservas vencidas cada {options["loop"]} s (Ctrl+C para salir)...')
+            try:
+                while True:
+                    close_old_connections()
+                    self.sweep(batch_size)
+                    time.sleep(options['loop'])
+            except KeyboardInterrupt:
+                self.stdout.write('\nDetenido.')
+            return
+
+        released = self.sweep(batch_size)
+        corrected = resync_reserved_quantities() if options['resync'] else 0
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'Reservas liberadas: {released}')
+        self.stdout.write(f'Reservas vigentes: {StockReservation.objects.count()}')
+        if options['resync']:
+            self.stdout.write(f'Registros de stock corregidos: {corrected}')
+        self.stdout.write(self.style.SUCCESS('\n¡Reservas vencidas liberadas!'))
@@ -0,0 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .store import set_cookie
+
+
+class CartCookieMiddleware:
+    """Guardar en la respuesta la cookie firmada de los carritos recién creados o modificados"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Bajo ASGI no obligar a Django a pasar las vistas asíncronas a un hilo
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        set_cookie(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        set_cookie(request, response)
+        return response
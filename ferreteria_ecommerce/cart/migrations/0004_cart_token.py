@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:40
+
+import secrets
+
+from django.db import migrations, models
+
+
+def assign_tokens(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    for cart in Cart.objects.only('id').iterator():
+        Cart.objects.filter(pk=cart.pk).update(token=secrets.token_urlsafe(32))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='token',
+            field=models.CharField(max_length=64, null=True, verbose_name='Identificador'),
+        ),
+        migrations.RunPython(assign_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_cart_token'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='token',
+            field=models.CharField(max_length=64, unique=True, verbose_name='Identificador'),
+        ),
+        migrations.RemoveField(
+            model_name='cart',
+            name='session',
+        ),
+    ]
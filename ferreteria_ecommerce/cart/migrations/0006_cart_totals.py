@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:03
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_totals(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    Cart.objects.update(
+        item_count=Coalesce(
+            Subquery(items.annotate(total=Sum('quantity')).values('total'), output_field=IntegerField()),
+            0,
+        ),
+        subtotal=Coalesce(
+            Subquery(
+                items.annotate(total=Sum(F('quantity') * F('price'))).values('total'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            Decimal('0'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_remove_cart_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Cantidad de items'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12, verbose_name='Subtotal'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,25 @@
-from django.db import models
-from django.contrib.sessions.models import Session
-from catalog.models import Product, ProductVariant
+from decimal import Decimal
+
+from django.db import connections, models, router, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from catalog.models import ItemStock, Product, ProductVariant
+
+
+def _can_update_returning(connection):
+    """PostgreSQL y SQLite 3.35+ admiten ``UPDATE ... RETURNING``"""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
 
 
 class Cart(models.Model):
-    session = models.ForeignKey(Session, on_delete=models.CASCADE, verbose_name="Sesión")
+    # Id opaco que el navegador guarda en una cookie firmada (ver cart/store.py)
+    token = models.CharField(max_length=64, unique=True, verbose_name="Identificador")
+    # Totales desnormalizados; los mantiene CartItem con UPDATE ... SET x = x + delta
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Cantidad de items")
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'), verbose_name="Subtotal")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
 
@@ -13,16 +28,83 @@ class Cart(models.Model):
         verbose_name_plural = "Carritos"
 
     def __str__(self):
-        return f"Carrito {self.id} - {self.session.session_key}"
+        return f"Carrito {self.id}"
 
     def get_total(self):
-        return sum(item.get_total() for item in self.items.all())
+        return self.subtotal
 
     def get_item_count(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.item_count
+
+    def calculate_totals(self):
+        """Totales calculados en la base de datos a partir de los items (respaldo)"""
+        return self.items.aggregate(
+            item_count=Coalesce(Sum('quantity'), 0),
+            subtotal=Coalesce(Sum(F('quantity') * F('price'), output_field=models.DecimalField()), Decimal('0')),
+        )
+
+    def adjust_totals(self, item_count, subtotal):
+        """Sumar las diferencias a los totales de forma atómica y refrescar la instancia"""
+        now = timezone.now()
+        using = router.db_for_write(Cart, instance=self)
+        connection = connections[using]
+        if _can_update_returning(connection):
+            # UPDATE ... RETURNING: los totales nuevos vuelven con el mismo UPDATE, sin otro SELECT
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {connection.ops.quote_name(Cart._meta.db_table)} '
+                    'SET item_count = item_count + %s, subtotal = subtotal + %s, updated_at = %s '
+                    'WHERE id = %s RETURNING item_count, subtotal',
+                    [
+                        item_count,
+                        connection.ops.adapt_decimalfield_value(subtotal),
+                        connection.ops.adapt_datetimefield_value(now),
+                        self.pk,
+                    ],
+                )
+                row = cursor.fetchone()
+            if row is not None:
+                self._set_totals(row[0], Decimal(str(row[1])).quantize(Decimal('0.01')), now)
+            return
+        Cart.objects.using(using).filter(pk=self.pk).update(
+            item_count=F('item_count') + item_count,
+            subtotal=F('subtotal') + subtotal,
+            updated_at=now,
+        )
+        self.refresh_from_db(using=using, fields=['item_count', 'subtotal', 'updated_at'])
+
+    def recalculate_totals(self):
+        """Reemplazar los totales guardados por los calculados; devuelve True si estaban desfasados"""
+        totals = self.calculate_totals()
+        now = timezone.now()
+        updated = Cart.objects.filter(pk=self.pk).exclude(
+            item_count=totals['item_count'], subtotal=totals['subtotal'],
+        ).update(updated_at=now, **totals)
+        self._set_totals(totals['item_count'], totals['subtotal'], now if updated else self.updated_at)
+        return bool(updated)
+
+    def _set_totals(self, item_count, subtotal, updated_at):
+        """Totales ya escritos en la fila: copiarlos a la instancia"""
+        self.item_count = item_count
+        self.subtotal = subtotal
+        self.updated_at = updated_at
 
     def clear(self):
-        self.items.all().delete()
+        # Los totales se ponen en 0 abajo: que post_delete no los descuente item por item
+        self.items.all().delete_batch()
+        now = timezone.now()
+        Cart.objects.filter(pk=self.pk).update(item_count=0, subtotal=0, updated_at=now)
+        self._set_totals(0, Decimal('0'), now)
+
+
+class CartItemQuerySet(models.QuerySet):
+    def delete_batch(self):
+        """
+        Borrar los items con un solo DELETE sin que post_delete ajuste los
+        totales item por item; quien llama los recalcula una vez.
+        """
+        self._batch_delete = True
+        return self.delete()
 
 
 class CartItem(models.Model):
@@ -34,6 +116,8 @@ class CartItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Item del carrito"
         verbose_name_plural = "Items del carrito"
@@ -61,9 +145,47 @@ class CartItem(models.Model):
         return self.product.sku
 
     def save(self, *args, **kwargs):
-        if not self.price:
-            if self.variant:
-                self.price = self.variant.get_final_price()
-            else:
-                self.price = self.product.price
-        super().save(*args, **kwargs)
+        if 'price' not in self.get_deferred_fields():
+            if not self.price:
+                if self.variant:
+                    self.price = self.variant.get_final_price()
+                else:
+                    self.price = self.product.price
+            self.price = self._meta.get_field('price').to_python(self.price)
+        with transaction.atomic():
+            # La diferencia se calcula contra la fila bloqueada y no contra lo leído
+            # en este proceso: dos guardados simultáneos del mismo item se aplican en orden
+            previous = (0, Decimal('0'))
+            if not self._state.adding:
+                previous = CartItem.objects.select_for_update().filter(pk=self.pk).values_list('quantity', 'price').first() or previous
+            super().save(*args, **kwargs)
+            quantity, price = self._saved_totals(previous, kwargs.get('update_fields'))
+            if (quantity, price) != previous:
+                self.cart.adjust_totals(quantity - previous[0], quantity * price - previous[0] * previous[1])
+
+    def _saved_totals(self, previous, update_fields):
+        """Cantidad y precio que quedaron en la fila (los campos diferidos o no guardados no cambian)"""
+        skipped = self.get_deferred_fields()
+        if update_fields is not None:
+            skipped |= {'quantity', 'price'} - set(update_fields)
+        quantity = previous[0] if 'quantity' in skipped else self.quantity
+        price = previous[1] if 'price' in skipped else self.price
+        return quantity, price
+
+
+class StockReservation(models.Model):
+    """Unidades de stock apartadas para un item del carrito hasta ``expires_at``"""
+    cart_item = models.OneToOneField(CartItem, on_delete=models.CASCADE, related_name='reservation', verbose_name="Item del carrito")
+    stock_item = models.ForeignKey(ItemStock, on_delete=models.CASCADE, related_name='reservations', verbose_name="Stock")
+    quantity = models.PositiveIntegerField(verbose_name="Cantidad reservada")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Vence")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
+
+    class Meta:
+        verbose_name = "Reserva de stock"
+        verbose_name_plural = "Reservas de stock"
+        ordering = ['expires_at']
+
+    def __str__(self):
+        return f"{self.quantity}x {self.cart_item.get_product_display_name()} hasta {self.expires_at:%d/%m/%Y %H:%M}"
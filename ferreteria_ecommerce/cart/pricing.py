@@ -0,0 +1,66 @@
+"""
+Totales del carrito: promociones automáticas y cupón de la sesión.
+
+``cart_detail``, ``update_cart`` y el checkout calculan el resumen con
+``cart_totals`` para que el carrito muestre exactamente lo que se cobra.
+Las promociones (``promotions/rules.py``) se aplican primero y el cupón
+descuenta sobre lo que queda.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from promotions.rules import get_promotion_engine
+from promotions.table import get_coupon
+
+
+@dataclass
+class CartTotals:
+    subtotal: Decimal = Decimal('0.00')
+    # Pares (promoción, descuento)
+    promotions: list = field(default_factory=list)
+    promotion_discount: Decimal = Decimal('0.00')
+    coupon: object = None
+    coupon_discount: Decimal = Decimal('0.00')
+
+    @property
+    def after_promotions(self):
+        """Monto sobre el que se calcula el cupón"""
+        return self.subtotal - self.promotion_discount
+
+    @property
+    def discount(self):
+        return self.promotion_discount + self.coupon_discount
+
+    @property
+    def total(self):
+        return self.subtotal - self.discount
+
+
+def price_lines(cart):
+    """
+    Subtotal y promociones del carrito, siempre desde sus líneas en la base de
+    datos (no desde los totales de una copia del carrito); sin promociones
+    vigentes basta con sumarlas.
+    """
+    engine = get_promotion_engine()
+    if cart is None:
+        return engine.price([])
+    if not engine:
+        priced = engine.price([])
+        priced.subtotal = cart.calculate_totals()['subtotal'].quantize(Decimal('0.01'))
+        return priced
+    return engine.price(cart.items.values_list('product_id', 'product__category_id', 'quantity', 'price'))
+
+
+def cart_totals(request, cart):
+    """Resumen del carrito; quita de la sesión el cupón que ya no es válido"""
+    priced = price_lines(cart)
+    totals = CartTotals(subtotal=priced.subtotal, promotions=priced.applied, promotion_discount=priced.discount)
+
+    if 'applied_coupon_id' in request.session:
+        totals.coupon = get_coupon(id=request.session['applied_coupon_id'])
+        if totals.coupon:
+            totals.coupon_discount = totals.coupon.discount_for(totals.after_promotions)
+        else:
+            del request.session['applied_coupon_id']
+    return totals
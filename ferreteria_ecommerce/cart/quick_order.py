@@ -0,0 +1,101 @@
+"""
+Pedido rápido por SKU.
+
+Los clientes mayoristas pegan listas de ``SKU, cantidad`` (una por línea,
+separadas por coma, punto y coma, tabulador o espacio). Todas las líneas se
+resuelven con una sola consulta sobre ``Product.sku`` y ``ProductVariant.sku``
+(sin distinguir mayúsculas) y se agregan al carrito con ``reservations.add_quantities``: una consulta de
+disponibilidad y un solo UPDATE de reservas, sin importar cuántas líneas sean.
+"""
+import re
+
+from django.db.models import CharField, F, IntegerField, Value
+from django.db.models.functions import Concat, Upper
+
+from catalog.models import Product, ProductVariant
+from . import reservations
+from .store import get_or_create_cart
+
+LINE_SEPARATORS = re.compile(r'[,;\t ]+')
+
+
+def parse_lines(text):
+    """
+    Lista de (número de línea, SKU, cantidad) del texto pegado. La cantidad es
+    1 si no se indica y None si no es un entero positivo; las líneas vacías se
+    ignoran.
+    """
+    lines = []
+    for number, raw in enumerate(text.splitlines(), 1):
+        parts = LINE_SEPARATORS.split(raw.strip())
+        if not parts[0]:
+            continue
+        quantity = None
+        if len(parts) == 1:
+            quantity = 1
+        elif len(parts) == 2 and parts[1].isdigit() and int(parts[1]) > 0:
+            quantity = int(parts[1])
+        lines.append((number, parts[0].upper(), quantity))
+    return lines
+
+
+def resolve_skus(skus):
+    """
+    {SKU: (id de producto, id de variante, precio, nombre)} para los SKU de
+    productos y variantes activos, en una sola consulta (UNION de los dos IN).
+    Los SKU se comparan en mayúsculas de los dos lados (``parse_lines`` ya los
+    pasa a mayúsculas), con los índices sobre ``UPPER(sku)``.
+    """
+    if not skus:
+        return {}
+    products = Product.objects.annotate(sku_key=Upper('sku')).filter(sku_key__in=skus, is_active=True).annotate(
+        product_ref=F('id'),
+        variant_ref=Value(None, output_field=IntegerField()),
+        unit_price=F('price'),
+        label=F('name'),
+    )
+    variants = ProductVariant.objects.annotate(sku_key=Upper('sku')).filter(
+        sku_key__in=skus, is_active=True, product__is_active=True,
+    ).annotate(
+        product_ref=F('product_id'),
+        variant_ref=F('id'),
+        unit_price=F('product__price') + F('price_modifier'),
+        label=Concat('product__name', Value(' - '), 'name', Value(': '), 'value', output_field=CharField()),
+    )
+    fields = ('sku_key', 'product_ref', 'variant_ref', 'unit_price', 'label')
+    rows = products.order_by().values_list(*fields).union(variants.order_by().values_list(*fields), all=True)
+    return {sku: (product_id, variant_id, price, name) for sku, product_id, variant_id, price, name in rows}
+
+
+def add_lines(request, lines):
+    """
+    Agregar las líneas al carrito del visitante (lo crea solo si alguna línea
+    es válida). Devuelve el reporte por línea con estado 'added',
+    'insufficient', 'unknown' o 'invalid'.
+    """
+    resolved = resolve_skus({sku for _, sku, quantity in lines if quantity})
+
+    # Varias líneas con el mismo SKU se suman
+    additions = {}
+    for _, sku, quantity in lines:
+        if quantity and sku in resolved:
+            product_id, variant_id, price, _ = resolved[sku]
+            previous = additions.get((product_id, variant_id), (0, price))[0]
+            additions[(product_id, variant_id)] = (previous + quantity, price)
+
+    results = reservations.add_quantities(get_or_create_cart(request), additions) if additions else {}
+
+    report = []
+    for number, sku, quantity in lines:
+        entry = {'line': number, 'sku': sku, 'quantity': quantity}
+        if quantity is None:
+            entry['status'] = 'invalid'
+        elif sku not in resolved:
+            entry['status'] = 'unknown'
+        else:
+            product_id, variant_id, _, name = resolved[sku]
+            status, count = results[(product_id, variant_id)]
+            entry.update(status=status, name=name)
+            entry['available' if status == 'insufficient' else 'in_cart'] = count
+        report.append(entry)
+    return report
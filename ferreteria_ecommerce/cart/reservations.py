@@ -0,0 +1,337 @@
+"""
+Reservas de stock con vencimiento para los carritos.
+
+Cada item del carrito con stock apartado tiene una fila ``StockReservation``
+con la cantidad y la fecha de vencimiento. La actividad en el carrito
+renueva el plazo (``CART_RESERVATION_TTL``); las reservas vencidas las
+libera ``python manage.py release_expired_reservations`` por lotes, con un
+solo ``UPDATE`` sobre ``ItemStock`` por lote.
+
+``ItemStock.reserved_quantity`` se mantiene como contador para validar
+disponibilidad sin sumar filas, y siempre se puede recalcular a partir de
+las reservas vigentes con ``resync_reserved_quantities()``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from catalog import shards, stock
+from catalog.models import ItemStock, StockShard
+from .models import CartItem, StockReservation
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'CART_RESERVATION_TTL', 30 * 60))
+
+
+def stock_item_for(cart_item):
+    """Registro de stock del producto o variante del item (None si no existe)"""
+    return ItemStock.objects.filter(product_id=cart_item.product_id, variant_id=cart_item.variant_id).first()
+
+
+def hold(cart_item, quantity, stock_item=None):
+    """
+    Dejar reservadas exactamente ``quantity`` unidades para el item,
+    reservando o liberando solo la diferencia con lo que ya tenía.
+    Devuelve False si no hay stock suficiente (la reserva anterior se conserva).
+    """
+    stock_item = stock_item or stock_item_for(cart_item)
+    if stock_item is None:
+        return False
+    expires_at = timezone.now() + reservation_ttl()
+
+    with transaction.atomic():
+        reservation = StockReservation.objects.select_for_update().filter(cart_item=cart_item).first()
+        held = reservation.quantity if reservation else 0
+        difference = quantity - held
+
+        if difference > 0 and not stock_item.reserve_stock(difference):
+            if reservation:
+                StockReservation.objects.filter(pk=reservation.pk).update(expires_at=expires_at)
+            return False
+        if difference < 0:
+            stock_item.release_stock(-difference)
+
+        if quantity <= 0:
+            if reservation:
+                reservation.delete()
+        elif reservation:
+            reservation.quantity = quantity
+            reservation.expires_at = expires_at
+            reservation.save(update_fields=['quantity', 'expires_at', 'updated_at'])
+        else:
+            StockReservation.objects.create(
+                cart_item=cart_item, stock_item=stock_item, quantity=quantity, expires_at=expires_at
+            )
+    return True
+
+
+def release(cart_item):
+    """Liberar la reserva del item; si ya venció no se libera nada dos veces"""
+    return _release(StockReservation.objects.filter(cart_item=cart_item))
+
+
+def release_cart(cart):
+    """Liberar todas las reservas del carrito"""
+    return _release(StockReservation.objects.filter(cart_item__cart=cart))
+
+
+def touch(cart, rehold=True):
+    """
+    Renovar el plazo de las reservas del carrito que ya pasaron la mitad de
+    su vigencia (un solo UPDATE, que no escribe nada si ninguna está por
+    vencer). Los items cuya reserva ya venció se vuelven a reservar de una vez
+    con ``rehold`` (acciones sobre el carrito); al solo mostrarlo (GET) no se
+    bloquea stock y solo se informan. Devuelve {id de item: (estado, cantidad)}
+    de los items vencidos: los de ``set_cart_quantities`` o 'lapsed'.
+    """
+    now = timezone.now()
+    ttl = reservation_ttl()
+    StockReservation.objects.filter(cart_item__cart=cart, expires_at__lt=now + ttl / 2).update(
+        expires_at=now + ttl,
+        updated_at=now,
+    )
+    lapsed = dict(cart.items.filter(reservation__isnull=True).values_list('pk', 'quantity'))
+    if not lapsed or not rehold:
+        return {item_id: ('lapsed', quantity) for item_id, quantity in lapsed.items()}
+    return set_cart_quantities(cart, lapsed)
+
+
+def release_expired(batch_size=500, now=None):
+    """Liberar las reservas vencidas por lotes; devuelve cuántas se liberaron"""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        count = _release(StockReservation.objects.filter(expires_at__lte=now), limit=batch_size, skip_locked=True)
+        released += count
+        if count < batch_size:
+            return released
+
+
+def _release(reservations, limit=None, skip_locked=False):
+    """
+    Borrar las reservas dadas y descontarlas de ``ItemStock`` con un solo
+    UPDATE agrupado por registro de stock (``catalog.stock.release_many``). Las filas se bloquean en orden
+    de stock para que dos liberaciones simultáneas no se bloqueen entre sí.
+    """
+    with transaction.atomic():
+        rows = reservations.order_by('stock_item_id', 'pk').select_for_update(skip_locked=skip_locked)
+        rows = list(rows.values_list('pk', 'stock_item_id', 'quantity')[:limit])
+        if not rows:
+            return 0
+
+        totals = defaultdict(int)
+        for _, stock_item_id, quantity in rows:
+            totals[stock_item_id] += quantity
+        stock.release_many(totals)
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+    return len(rows)
+
+
+def _lock_holds(items):
+    """
+    {id de item: StockReservation} de los items dados, leídas con bloqueo en
+    el mismo orden que ``_release`` y el checkout (reservas primero, después
+    el stock, por ``stock_item_id, pk``). Una reserva que el barrido borró
+    antes del bloqueo ya no aparece y el item se trata como sin reserva.
+    """
+    if not items:
+        return {}
+    return {
+        reservation.cart_item_id: reservation
+        for reservation in StockReservation.objects.select_for_update()
+        .filter(cart_item_id__in=list(items)).order_by('stock_item_id', 'pk')
+    }
+
+
+def set_cart_quantities(cart, quantities):
+    """
+    Cambiar varias líneas del carrito a la vez. ``quantities`` es {id de item:
+    nueva cantidad}; 0 quita el item. Se bloquean las reservas y después el
+    stock afectado (ver ``_lock_holds``), se decide qué líneas caben y todas las
+    diferencias de reserva se aplican con un solo UPDATE. Devuelve {id de
+    item: (estado, cantidad)} con estado 'updated', 'removed', 'insufficient'
+    o 'not_found'.
+    """
+    now = timezone.now()
+    expires_at = now + reservation_ttl()
+    results = {}
+
+    with transaction.atomic():
+        items = {item.pk: item for item in cart.items.filter(pk__in=quantities)}
+        for item_id in quantities:
+            if item_id not in items:
+                results[item_id] = ('not_found', 0)
+        if not items:
+            return results
+
+        holds = _lock_holds(items)
+        stocks = stock.by_key({(item.product_id, item.variant_id) for item in items.values()}, lock=True)
+
+        deltas = defaultdict(int)
+        accepted = []
+        for item in items.values():
+            quantity = max(quantities[item.pk], 0)
+            reservation = holds.get(item.pk)
+            stock_item = stocks.get((item.product_id, item.variant_id))
+            difference = quantity - (reservation.quantity if reservation else 0)
+            if difference > 0 and (stock_item is None or stock_item.available_quantity - deltas[stock_item.pk] < difference):
+                results[item.pk] = ('insufficient', item.quantity)
+                continue
+            if difference:
+                deltas[reservation.stock_item_id if reservation else stock_item.pk] += difference
+            accepted.append((item, quantity, stock_item, reservation))
+
+        if not stock.reserve_many(deltas):
+            # Solo puede pasar si otro proceso cambió el stock sin bloquear la fila
+            transaction.set_rollback(True)
+            return {item_id: ('insufficient', item.quantity) for item_id, item in items.items()}
+
+        changed, removed, held, new_holds = [], [], [], []
+        for item, quantity, stock_item, reservation in accepted:
+            if quantity == 0:
+                removed.append(item.pk)
+                results[item.pk] = ('removed', 0)
+                continue
+            results[item.pk] = ('updated', quantity)
+            if quantity != item.quantity:
+                item.quantity = quantity
+                item.updated_at = now
+                changed.append(item)
+            if reservation:
+                reservation.quantity = quantity
+                reservation.expires_at = expires_at
+                reservation.updated_at = now
+                held.append(reservation)
+            elif stock_item is not None:
+                new_holds.append(StockReservation(
+                    cart_item=item, stock_item=stock_item, quantity=quantity, expires_at=expires_at,
+                ))
+
+        CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+        StockReservation.objects.bulk_update(held, ['quantity', 'expires_at', 'updated_at'])
+        StockReservation.objects.bulk_create(new_holds)
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete_batch()
+        # bulk_update y delete_batch no ajustan los totales: recalcularlos una sola vez
+        cart.recalculate_totals()
+    return results
+
+
+def add_quantities(cart, additions):
+    """
+    Agregar varios productos al carrito a la vez (pedido rápido por SKU).
+    ``additions`` es {(id de producto, id de variante): (cantidad, precio)} y la
+    cantidad se suma a la que ya tenga el carrito. Con una consulta se bloquea
+    el stock en orden de id, con otra se leen los items existentes, y todas las
+    reservas se aplican con un solo UPDATE. Devuelve {clave: (estado, cantidad)}:
+    'added' con la cantidad final en el carrito o 'insufficient' con las
+    unidades disponibles. Las reservas existentes se bloquean antes que el
+    stock, como en ``set_cart_quantities``.
+    """
+    now = timezone.now()
+    expires_at = now + reservation_ttl()
+    results = {}
+    if not additions:
+        return results
+
+    lookup = Q()
+    for product_id, variant_id in additions:
+        lookup |= Q(product_id=product_id, variant_id=variant_id)
+
+    with transaction.atomic():
+        items = {(item.product_id, item.variant_id): item for item in cart.items.filter(lookup)}
+        holds = _lock_holds({item.pk: item for item in items.values()})
+        stocks = stock.by_key(additions, lock=True)
+
+        deltas = defaultdict(int)
+        accepted = []
+        for key, (quantity, price) in additions.items():
+            stock_item = stocks.get(key)
+            item = items.get(key)
+            reservation = holds.get(item.pk) if item else None
+            total = quantity + (item.quantity if item else 0)
+            difference = total - (reservation.quantity if reservation else 0)
+            if stock_item is None or stock_item.available_quantity - deltas[stock_item.pk] < difference:
+                results[key] = ('insufficient', stock_item.available_quantity - deltas[stock_item.pk] if stock_item else 0)
+                continue
+            if difference:
+                deltas[stock_item.pk] += difference
+            accepted.append((key, item, reservation, stock_item, total, price))
+
+        if not stock.reserve_many(deltas):
+            # Solo puede pasar si otro proceso cambió el stock sin bloquear la fila
+            transaction.set_rollback(True)
+            return {key: ('insufficient', 0) for key in additions}
+
+        new_items, changed = [], []
+        for index, (key, item, reservation, stock_item, total, price) in enumerate(accepted):
+            results[key] = ('added', total)
+            if item is None:
+                item = CartItem(cart=cart, product_id=key[0], variant_id=key[1], quantity=total, price=price)
+                accepted[index] = (key, item, reservation, stock_item, total, price)
+                new_items.append(item)
+            elif item.quantity != total:
+                item.quantity = total
+                item.updated_at = now
+                changed.append(item)
+        CartItem.objects.bulk_create(new_items)
+        CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+
+        held, new_holds = [], []
+        for key, item, reservation, stock_item, total, price in accepted:
+            if reservation:
+                reservation.quantity = total
+                reservation.expires_at = expires_at
+                reservation.updated_at = now
+                held.append(reservation)
+            else:
+                new_holds.append(StockReservation(
+                    cart_item=item, stock_item=stock_item, quantity=total, expires_at=expires_at,
+                ))
+        StockReservation.objects.bulk_update(held, ['quantity', 'expires_at', 'updated_at'])
+        StockReservation.objects.bulk_create(new_holds)
+        # Los items se escribieron sin save(): recalcular los totales una sola vez
+        if accepted:
+            cart.recalculate_totals()
+    return results
+
+
+def resync_reserved_quantities():
+    """
+    Recalcular ``ItemStock.reserved_quantity`` como la suma de las reservas
+    vigentes. Corrige reservas huérfanas (por ejemplo, de carritos borrados
+    o anteriores a las reservas con vencimiento). En los SKU con shards se
+    corrige la suma de lo reservado en los shards. Devuelve las filas corregidas.
+    """
+    held = Coalesce(
+        Subquery(
+            StockReservation.objects.filter(stock_item=OuterRef('pk'))
+            .order_by().values('stock_item').annotate(total=Sum('quantity')).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+    corrected = ItemStock.objects.filter(~Q(reserved_quantity=held), shard_count=0).update(
+        reserved_quantity=held,
+        updated_at=timezone.now(),
+    )
+
+    in_shards = Coalesce(
+        Subquery(
+            StockShard.objects.filter(stock_item=OuterRef('pk'))
+            .order_by().values('stock_item').annotate(total=Sum('reserved_quantity')).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+    drifted = ItemStock.objects.filter(shard_count__gt=0).annotate(held=held).filter(~Q(held=in_shards))
+    for stock_id, total in drifted.values_list('pk', 'held'):
+        shards.rebalance(stock_id, reserved=total)
+        corrected += 1
+    return corrected
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Cart, CartItem
+from .store import forget
+
+
+@receiver(post_delete, sender=Cart)
+def forget_deleted_cart(sender, instance, **kwargs):
+    """Quitar de la caché los carritos borrados para no usar una copia huérfana"""
+    forget(instance)
+
+
+@receiver(post_delete, sender=CartItem)
+def subtract_deleted_item(sender, instance, origin=None, **kwargs):
+    """Descontar el item borrado de los totales del carrito (también en borrados en cascada)"""
+    if isinstance(origin, Cart) or getattr(origin, 'model', None) is Cart:
+        return  # Se está borrando el carrito completo
+    if getattr(origin, '_batch_delete', False):
+        return  # CartItemQuerySet.delete_batch(): los totales se recalculan una vez
+    if CartItem.cart.is_cached(instance):
+        cart = instance.cart
+    else:
+        cart = Cart.objects.filter(pk=instance.cart_id).first()
+    if cart is None:
+        return
+    if {'quantity', 'price'} & instance.get_deferred_fields():
+        # La fila ya no existe para leer lo diferido: recalcular desde los items
+        cart.recalculate_totals()
+    elif instance.quantity:
+        cart.adjust_totals(-instance.quantity, -instance.quantity * instance.price)
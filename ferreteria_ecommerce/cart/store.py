@@ -0,0 +1,115 @@
+"""
+Almacén de carritos sin sesión.
+
+El carrito se identifica con un id opaco guardado en una cookie firmada
+(``CART_COOKIE_NAME``), así navegar el catálogo o pedir el contador del
+carrito no crea sesiones ni consulta ``django_session``. La fila ``Cart``
+solo se crea al agregar el primer producto.
+
+La caché (``CACHES['default']``) guarda solo el id del carrito de cada
+token, que nunca cambia: sirve igual con memoria local por proceso o con
+Redis, y dos escrituras en distinto orden guardan lo mismo. La fila (con
+``item_count`` y ``subtotal``) se lee de la base de datos en cada petición
+que la usa, así ningún proceso trabaja con totales viejos.
+"""
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Cart
+
+COOKIE_SALT = 'cart.store'
+
+
+def _cache_key(token):
+    return f'cart-id:{token}'
+
+
+def get_token(request):
+    """Id del carrito de la cookie firmada (None si no hay o fue alterada)"""
+    if not hasattr(request, '_cart_token'):
+        request._cart_token = request.get_signed_cookie(
+            settings.CART_COOKIE_NAME, default=None, salt=COOKIE_SALT,
+            max_age=settings.CART_COOKIE_AGE,
+        )
+    return request._cart_token
+
+
+def get_cart(request):
+    """
+    Carrito del visitante o None; sin cookie no toca la base de datos. Las
+    acciones sobre el carrito (POST) renuevan la cookie: su firma vence
+    ``CART_COOKIE_AGE`` después de emitida y un carrito en uso no debe perderse.
+    """
+    token = get_token(request)
+    if not token:
+        return None
+    cart_id = cache.get(_cache_key(token))
+    if cart_id is None:
+        cart = Cart.objects.filter(token=token).first()
+        if cart is not None:
+            remember(cart)
+    else:
+        cart = Cart.objects.filter(pk=cart_id).first()
+    if cart is not None and request.method == 'POST':
+        request._cart_cookie_pending = True
+    return cart
+
+
+def get_or_create_cart(request):
+    """Carrito del visitante; lo crea (y programa la cookie) si todavía no tiene"""
+    cart = get_cart(request)
+    if cart is None:
+        cart = Cart.objects.create(token=secrets.token_urlsafe(32))
+        request._cart_token = cart.token
+        request._cart_cookie_pending = True
+        remember(cart)
+    return cart
+
+
+def get_item_count(request):
+    """Cantidad para el contador del carrito; sin cookie no consulta nada"""
+    cart = get_cart(request)
+    return cart.get_item_count() if cart else 0
+
+
+async def aget_cart(request):
+    """Versión asíncrona de ``get_cart`` para las vistas ASGI (cart/api.py)"""
+    token = get_token(request)
+    if not token:
+        return None
+    cart_id = await cache.aget(_cache_key(token))
+    if cart_id is None:
+        cart = await Cart.objects.filter(token=token).afirst()
+        if cart is not None:
+            await cache.aset(_cache_key(cart.token), cart.pk, settings.CART_CACHE_TIMEOUT)
+        return cart
+    return await Cart.objects.filter(pk=cart_id).afirst()
+
+
+async def aget_item_count(request):
+    cart = await aget_cart(request)
+    return cart.get_item_count() if cart else 0
+
+
+def remember(cart):
+    cache.set(_cache_key(cart.token), cart.pk, settings.CART_CACHE_TIMEOUT)
+
+
+def forget(cart):
+    cache.delete(_cache_key(cart.token))
+
+
+def set_cookie(request, response):
+    """Agregar la cookie de un carrito creado o usado por una acción en esta petición (CartCookieMiddleware)"""
+    if getattr(request, '_cart_cookie_pending', False):
+        response.set_signed_cookie(
+            settings.CART_COOKIE_NAME,
+            request._cart_token,
+            salt=COOKIE_SALT,
+            max_age=settings.CART_COOKIE_AGE,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
@@ -1,15 +1,18 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'cart'
 
 urlpatterns = [
     path('', views.cart_detail, name='cart_detail'),
     path('add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
+    path('update/', views.update_cart, name='update_cart'),
     path('update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('remove/<int:item_id>/', views.remove_cart_item, name='remove_cart_item'),
+    path('quick-order/', views.quick_order, name='quick_order'),
     path('clear/', views.clear_cart, name='clear_cart'),
-    path('count/', views.cart_count, name='cart_count'),
+    path('count/', api.cart_count, name='cart_count'),
+    path('api/add/<int:product_id>/', api.add_to_cart, name='api_add_to_cart'),
     path('apply-coupon/', views.apply_coupon, name='apply_coupon'),
     path('remove-coupon/', views.remove_coupon, name='remove_coupon'),
 ]
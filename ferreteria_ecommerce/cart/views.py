@@ -1,85 +1,171 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.http import JsonResponse
+from django.utils.formats import number_format
 from django.views.decorators.http import require_POST
-from django.contrib.sessions.models import Session
+from django.db import transaction
 from catalog.models import Product, ProductVariant, ItemStock
 from promotions.models import Coupon
-from .models import Cart, CartItem
+from promotions.table import get_coupon
+from . import quick_order as quick_order_lines
+from . import reservations
+from .models import CartItem
+from .pricing import cart_totals, price_lines
+from .store import get_cart, get_item_count, get_or_create_cart
 
+# Líneas que acepta una sola actualización del carrito
+MAX_BATCH_LINES = 200
+# Líneas que acepta un pedido rápido por SKU
+MAX_QUICK_ORDER_LINES = 500
 
-def get_or_create_cart(request):
-    """Obtener o crear carrito para la sesión actual"""
-    if not request.session.session_key:
-        request.session.create()
-    
-    try:
-        session = Session.objects.get(session_key=request.session.session_key)
-        cart, created = Cart.objects.get_or_create(session=session)
-    except Session.DoesNotExist:
-        request.session.create()
-        session = Session.objects.get(session_key=request.session.session_key)
-        cart, created = Cart.objects.get_or_create(session=session)
-    
-    return cart
+
+def wants_json(request):
+    """Pedidos hechos con fetch desde los scripts del sitio"""
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def cart_response(request, level, message, redirect_to):
+    """
+    Respuesta de una acción sobre el carrito: JSON con el contador actualizado
+    para fetch (así no hace falta pedir /cart/count/), o mensaje y redirección.
+    """
+    if wants_json(request):
+        return JsonResponse(
+            {'success': level == messages.SUCCESS, 'message': message, 'cart_count': get_item_count(request)},
+            status=200 if level == messages.SUCCESS else 400,
+        )
+    messages.add_message(request, level, message)
+    return redirect(redirect_to)
 
 
 def cart_detail(request):
     """Vista del carrito de compras"""
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
-    
-    # Obtener cupón aplicado de la sesión
-    applied_coupon = None
-    discount_amount = 0
-    if 'applied_coupon_id' in request.session:
-        try:
-            applied_coupon = Coupon.objects.get(id=request.session['applied_coupon_id'])
-            if applied_coupon.is_valid():
-                # Calcular el descuento
-                discount_amount = applied_coupon.calculate_discount(cart.get_total())
-            else:
-                # Si el cupón ya no es válido, removerlo de la sesión
-                del request.session['applied_coupon_id']
-                applied_coupon = None
-        except Coupon.DoesNotExist:
-            del request.session['applied_coupon_id']
+    cart = get_cart(request)
+    cart_items = []
+    if cart:
+        # Mostrar el carrito no bloquea stock: las reservas vencidas se renuevan en la próxima acción
+        lapsed = reservations.touch(cart, rehold=False)
+        if lapsed:
+            messages.warning(
+                request,
+                f'La reserva de {len(lapsed)} producto(s) de tu carrito venció. '
+                'Se volverá a reservar al actualizar el carrito o confirmar la compra, si todavía hay stock.',
+            )
+        cart_items = cart.items.select_related('product__category', 'variant').prefetch_related('product__images')
     
-    # Calcular el total final después del descuento
-    final_total = cart.get_total() - discount_amount
+    # Promociones y cupón con el mismo cálculo que el checkout
+    totals = cart_totals(request, cart)
     
     context = {
         'cart': cart,
         'cart_items': cart_items,
-        'applied_coupon': applied_coupon,
-        'discount_amount': discount_amount,
-        'final_total': final_total,
+        'subtotal': totals.subtotal,
+        'promotions': totals.promotions,
+        'promotion_discount': totals.promotion_discount,
+        'applied_coupon': totals.coupon,
+        'discount_amount': totals.coupon_discount,
+        'final_total': totals.total,
     }
     return render(request, 'cart/cart_detail.html', context)
 
 
+@require_POST
+def update_cart(request):
+    """
+    Actualizar varias líneas del carrito en un solo pedido (lo usa cart.js).
+    Recibe JSON ``{"items": [{"item_id": 1, "quantity": 3}, ...]}`` (cantidad 0
+    quita el item), aplica todos los cambios de reserva en una transacción y
+    responde con el estado nuevo del carrito.
+    """
+    try:
+        lines = json.loads(request.body)['items']
+        quantities = {int(line['item_id']): int(line['quantity']) for line in lines}
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Formato de pedido inválido.'}, status=400)
+    if len(quantities) > MAX_BATCH_LINES:
+        return JsonResponse(
+            {'success': False, 'message': f'Se pueden actualizar hasta {MAX_BATCH_LINES} productos a la vez.'},
+            status=400,
+        )
+
+    cart = get_cart(request)
+    if cart is None:
+        return JsonResponse({'success': False, 'message': 'El carrito está vacío.', 'cart_count': 0}, status=404)
+
+    results = reservations.set_cart_quantities(cart, quantities)
+    # Los items vencidos que no se pudieron volver a reservar también se informan
+    for item_id, result in reservations.touch(cart).items():
+        if result[0] == 'insufficient':
+            results.setdefault(item_id, result)
+
+    items = cart.items.only('id', 'quantity', 'price')
+    totals = cart_totals(request, cart)
+    failed = [item_id for item_id, (status, _) in results.items() if status in ('insufficient', 'not_found')]
+    return JsonResponse({
+        'success': not failed,
+        'message': 'Carrito actualizado.' if not failed else 'Algunos productos no tienen stock suficiente.',
+        'lines': [
+            {'item_id': item_id, 'status': status, 'quantity': quantity}
+            for item_id, (status, quantity) in results.items()
+        ],
+        'items': [
+            {'item_id': item.id, 'quantity': item.quantity, 'total': number_format(item.get_total(), 2)}
+            for item in items
+        ],
+        'subtotal': number_format(totals.subtotal, 2),
+        'promotions': number_format(totals.promotion_discount, 2),
+        'discount': number_format(totals.coupon_discount, 2),
+        'total': number_format(totals.total, 2),
+        'cart_count': cart.get_item_count(),
+    })
+
+
+def quick_order(request):
+    """
+    Pedido rápido: el cliente pega líneas ``SKU, cantidad`` y se agregan todas
+    al carrito en un solo pedido. Con fetch responde JSON con el reporte por
+    línea; si no, muestra el reporte en la misma página.
+    """
+    text = request.POST.get('lines', '') if request.method == 'POST' else ''
+    report = None
+    lines = quick_order_lines.parse_lines(text)
+
+    if request.method == 'POST':
+        if not lines:
+            return cart_response(request, messages.ERROR, 'Ingresa al menos un SKU.', 'cart:quick_order')
+        if len(lines) > MAX_QUICK_ORDER_LINES:
+            return cart_response(
+                request, messages.ERROR,
+                f'Se pueden agregar hasta {MAX_QUICK_ORDER_LINES} líneas por pedido.', 'cart:quick_order',
+            )
+        report = quick_order_lines.add_lines(request, lines)
+        added = sum(1 for entry in report if entry['status'] == 'added')
+        if wants_json(request):
+            return JsonResponse({
+                'success': added == len(report),
+                'added': added,
+                'lines': report,
+                'cart_count': get_item_count(request),
+            })
+        if added:
+            messages.success(request, f'{added} de {len(report)} líneas agregadas al carrito.')
+        if added < len(report):
+            messages.warning(request, 'Revisa las líneas que no se pudieron agregar.')
+
+    return render(request, 'cart/quick_order.html', {'text': text, 'report': report})
+
+
 @require_POST
 def remove_cart_item(request, item_id):
     """Eliminar un item específico del carrito"""
     try:
-        cart = get_or_create_cart(request)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+        cart = get_cart(request)
+        cart_item = get_object_or_404(CartItem.objects.select_related('cart'), id=item_id, cart=cart)
         
-        # Liberar stock reservado
-        if cart_item.variant:
-            # Buscar stock de la variante
-            try:
-                stock_item = ItemStock.objects.get(product=cart_item.product, variant=cart_item.variant)
-                stock_item.release_stock(cart_item.quantity)
-            except ItemStock.DoesNotExist:
-                pass
-        else:
-            # Buscar stock del producto sin variante
-            try:
-                stock_item = ItemStock.objects.get(product=cart_item.product, variant__isnull=True)
-                stock_item.release_stock(cart_item.quantity)
-            except ItemStock.DoesNotExist:
-                pass
+        # Liberar stock reservado (si la reserva no venció ya)
+        reservations.release(cart_item)
         
         # Eliminar el item del carrito
         product_name = cart_item.get_product_display_name()
@@ -93,17 +179,74 @@ def remove_cart_item(request, item_id):
     return redirect('cart:cart_detail')
 
 
+def add_item(request, product, variant, quantity):
+    """
+    Agregar ``quantity`` unidades al carrito del visitante reservando el stock.
+    Devuelve (nivel, mensaje) para la respuesta; lo usan add_to_cart y su
+    versión asíncrona (cart/api.py).
+    """
+    # Verificar stock disponible
+    try:
+        stock_item = ItemStock.objects.get(product=product, variant=variant)
+        
+        if stock_item.available_quantity < quantity:
+            return messages.ERROR, f'Solo hay {stock_item.available_quantity} unidades disponibles.'
+            
+    except ItemStock.DoesNotExist:
+        # Crear automáticamente un registro de stock si no existe
+        try:
+            stock_item = ItemStock.objects.create(
+                product=product,
+                variant=variant,
+                quantity=product.stock,
+                reserved_quantity=0,
+                min_stock_level=5,
+                location='Almacén Principal'
+            )
+            messages.info(request, f'Stock inicializado para {product.name}.')
+        except Exception as e:
+            return messages.ERROR, f'Error al inicializar stock: {str(e)}'
+    
+    try:
+        cart = get_or_create_cart(request)
+        
+        with transaction.atomic():
+            # Buscar si ya existe el item en el carrito
+            cart_item, created = CartItem.objects.get_or_create(
+                cart=cart,
+                product=product,
+                variant=variant,
+                defaults={'quantity': quantity, 'price': product.price}
+            )
+            new_quantity = quantity if created else cart_item.quantity + quantity
+            
+            # La reserva es atómica y es la que decide si todavía quedan unidades
+            if not reservations.hold(cart_item, new_quantity, stock_item):
+                transaction.set_rollback(True)
+                return messages.ERROR, f'Solo hay {stock_item.available_quantity} unidades disponibles.'
+            
+            if not created:
+                cart_item.quantity = new_quantity
+                cart_item.save(update_fields=['quantity', 'updated_at'])
+        
+        reservations.touch(cart)
+        return messages.SUCCESS, f'{cart_item.get_product_display_name()} agregado al carrito.'
+            
+    except Exception as e:
+        return messages.ERROR, f'Error al agregar al carrito: {str(e)}'
+
+
 @require_POST
 def add_to_cart(request, product_id):
     """Agregar producto al carrito"""
     try:
         product = get_object_or_404(Product, id=product_id, is_active=True)
+        back = request.META.get('HTTP_REFERER', 'catalog:home')
         quantity = int(request.POST.get('quantity', 1))
         variant_id = request.POST.get('variant_id')
         
         if quantity <= 0:
-            messages.error(request, 'La cantidad debe ser mayor a 0.')
-            return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
+            return cart_response(request, messages.ERROR, 'La cantidad debe ser mayor a 0.', back)
         
         # Obtener la variante si se especificó
         variant = None
@@ -111,103 +254,30 @@ def add_to_cart(request, product_id):
             try:
                 variant = ProductVariant.objects.get(id=variant_id, product=product, is_active=True)
             except ProductVariant.DoesNotExist:
-                messages.error(request, 'La variante seleccionada no es válida.')
-                return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
+                return cart_response(request, messages.ERROR, 'La variante seleccionada no es válida.', back)
         
-        # Verificar stock disponible
-        try:
-            if variant:
-                stock_item = ItemStock.objects.get(product=product, variant=variant)
-            else:
-                stock_item = ItemStock.objects.get(product=product, variant__isnull=True)
-            
-            if stock_item.available_quantity < quantity:
-                messages.error(request, f'Solo hay {stock_item.available_quantity} unidades disponibles.')
-                return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
-                
-        except ItemStock.DoesNotExist:
-            # Crear automáticamente un registro de stock si no existe
-            try:
-                stock_item = ItemStock.objects.create(
-                    product=product,
-                    variant=variant,
-                    quantity=product.stock,
-                    reserved_quantity=0,
-                    min_stock_level=5,
-                    location='Almacén Principal'
-                )
-                messages.info(request, f'Stock inicializado para {product.name}.')
-            except Exception as e:
-                messages.error(request, f'Error al inicializar stock: {str(e)}')
-                return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
+        level, message = add_item(request, product, variant, quantity)
+        if level != messages.SUCCESS:
+            return cart_response(request, level, message, back)
         
-        try:
-            cart = get_or_create_cart(request)
-            
-            # Buscar si ya existe el item en el carrito
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                variant=variant,
-                defaults={'quantity': quantity, 'price': product.price}
-            )
-            
-            if not created:
-                # Verificar que la nueva cantidad total no exceda el stock
-                total_quantity = cart_item.quantity + quantity
-                if total_quantity > stock_item.available_quantity:
-                    messages.error(request, f'Solo puedes agregar {stock_item.available_quantity - cart_item.quantity} unidades más.')
-                    return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
-                
-                cart_item.quantity += quantity
-                cart_item.save()
-            
-            # Reservar stock
-            if not stock_item.reserve_stock(quantity):
-                messages.error(request, 'No hay suficiente stock disponible.')
-                return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
-            
-            messages.success(request, f'{cart_item.get_product_display_name()} agregado al carrito.')
-            
-            # Redirigir a la página anterior o a la página del producto
-            referer = request.META.get('HTTP_REFERER')
-            if referer:
-                return redirect(referer)
-            else:
-                return redirect('catalog:product_detail', product_id=product_id)
-                
-        except Exception as e:
-            messages.error(request, f'Error al agregar al carrito: {str(e)}')
-            return redirect(request.META.get('HTTP_REFERER', 'catalog:home'))
+        # Volver a la página anterior o a la página del producto
+        return cart_response(request, level, message, request.META.get('HTTP_REFERER') or product.get_absolute_url())
                 
     except Exception as e:
-        messages.error(request, f'Error general: {str(e)}')
-        return redirect('catalog:offers')
+        return cart_response(request, messages.ERROR, f'Error general: {str(e)}', 'catalog:offers')
 
 
 @require_POST
 def update_cart_item(request, item_id):
     """Actualizar cantidad de un item en el carrito"""
     try:
-        cart = get_or_create_cart(request)
-        cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
+        cart = get_cart(request)
+        cart_item = get_object_or_404(CartItem.objects.select_related('cart'), id=item_id, cart=cart)
         new_quantity = int(request.POST.get('quantity', 1))
-        old_quantity = cart_item.quantity
         
         if new_quantity <= 0:
             # Liberar stock reservado y eliminar item
-            if cart_item.variant:
-                try:
-                    stock_item = ItemStock.objects.get(product=cart_item.product, variant=cart_item.variant)
-                    stock_item.release_stock(old_quantity)
-                except ItemStock.DoesNotExist:
-                    pass
-            else:
-                try:
-                    stock_item = ItemStock.objects.get(product=cart_item.product, variant__isnull=True)
-                    stock_item.release_stock(old_quantity)
-                except ItemStock.DoesNotExist:
-                    pass
+            reservations.release(cart_item)
             
             product_name = cart_item.get_product_display_name()
             cart_item.delete()
@@ -219,18 +289,14 @@ def update_cart_item(request, item_id):
             else:
                 stock_item = ItemStock.objects.get(product=cart_item.product, variant__isnull=True)
             
-            # Calcular stock disponible considerando lo ya reservado
-            available_stock = stock_item.quantity - (stock_item.reserved_quantity - old_quantity)
-            
-            if new_quantity > available_stock:
-                messages.error(request, f'Solo hay {available_stock} unidades disponibles.')
+            # Se reserva o libera solo la diferencia con lo ya reservado
+            if not reservations.hold(cart_item, new_quantity, stock_item):
+                held = getattr(getattr(cart_item, 'reservation', None), 'quantity', 0)
+                messages.error(request, f'Solo hay {stock_item.available_quantity + held} unidades disponibles.')
             else:
-                # Actualizar cantidad y stock reservado
-                stock_item.release_stock(old_quantity)
-                stock_item.reserve_stock(new_quantity)
-                
                 cart_item.quantity = new_quantity
-                cart_item.save()
+                cart_item.save(update_fields=['quantity', 'updated_at'])
+                reservations.touch(cart)
                 
                 messages.success(request, 'Carrito actualizado.')
     except Exception as e:
@@ -244,34 +310,16 @@ def update_cart_item(request, item_id):
 
 def clear_cart(request):
     """Limpiar todo el carrito"""
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     
-    # Liberar todo el stock reservado
-    for item in cart.items.all():
-        if item.variant:
-            try:
-                stock_item = ItemStock.objects.get(product=item.product, variant=item.variant)
-                stock_item.release_stock(item.quantity)
-            except ItemStock.DoesNotExist:
-                pass
-        else:
-            try:
-                stock_item = ItemStock.objects.get(product=item.product, variant__isnull=True)
-                stock_item.release_stock(item.quantity)
-            except ItemStock.DoesNotExist:
-                pass
-    
-    cart.clear()
+    if cart:
+        # Liberar todo el stock reservado
+        reservations.release_cart(cart)
+        cart.clear()
     messages.success(request, 'Carrito limpiado.')
     return redirect('cart:cart_detail')
 
 
-def cart_count(request):
-    """Obtener cantidad de items en el carrito (para AJAX)"""
-    cart = get_or_create_cart(request)
-    return JsonResponse({'count': cart.get_item_count()})
-
-
 @require_POST
 def apply_coupon(request):
     """Aplicar cupón de descuento"""
@@ -281,29 +329,26 @@ def apply_coupon(request):
         messages.error(request, 'Por favor ingresa un código de cupón.')
         return redirect('cart:cart_detail')
     
-    try:
-        coupon = Coupon.objects.get(code=coupon_code)
-        
-        if not coupon.is_valid():
+    coupon = get_coupon(code=coupon_code)
+    if coupon is None:
+        if Coupon.objects.filter(code=coupon_code).exists():
             messages.error(request, 'Este cupón no es válido o ha expirado.')
-            return redirect('cart:cart_detail')
-        
-        cart = get_or_create_cart(request)
-        cart_total = cart.get_total()
-        
-        if cart_total < coupon.min_amount:
-            messages.error(request, f'El monto mínimo para usar este cupón es RD$ {coupon.min_amount}.')
-            return redirect('cart:cart_detail')
-        
-        # Guardar el cupón en la sesión
-        request.session['applied_coupon_id'] = coupon.id
-        discount = coupon.calculate_discount(cart_total)
-        
-        messages.success(request, f'¡Cupón aplicado exitosamente! Descuento: RD$ {discount:.2f}')
-        
-    except Coupon.DoesNotExist:
-        messages.error(request, 'El código de cupón ingresado no existe.')
+        else:
+            messages.error(request, 'El código de cupón ingresado no existe.')
+        return redirect('cart:cart_detail')
+    
+    # El cupón descuenta sobre el monto que queda después de las promociones
+    cart_total = price_lines(get_cart(request)).total
+    
+    if cart_total < coupon.min_amount:
+        messages.error(request, f'El monto mínimo para usar este cupón es RD$ {coupon.min_amount}.')
+        return redirect('cart:cart_detail')
+    
+    # Guardar el cupón en la sesión
+    request.session['applied_coupon_id'] = coupon.id
+    discount = coupon.discount_for(cart_total)
     
+    messages.success(request, f'¡Cupón aplicado exitosamente! Descuento: RD$ {discount:.2f}')
     return redirect('cart:cart_detail')
 
 
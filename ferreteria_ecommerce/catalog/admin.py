@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, ProductVariant, ItemStock
+from .models import Category, Product, ProductImage, ProductVariant, ItemStock, StockShard
 
 
 class ProductImageInline(admin.TabularInline):
@@ -22,6 +22,18 @@ class ItemStockInline(admin.TabularInline):
     readonly_fields = ['reserved_quantity']
 
 
+class StockShardInline(admin.TabularInline):
+    model = StockShard
+    extra = 0
+    fields = ['index', 'quantity', 'reserved_quantity', 'updated_at']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # Los shards los crea y reparte el comando shard_stock
+        return False
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'parent', 'is_active', 'created_at']
@@ -101,18 +113,19 @@ class ProductVariantAdmin(admin.ModelAdmin):
 
 @admin.register(ItemStock)
 class ItemStockAdmin(admin.ModelAdmin):
-    list_display = ['product', 'variant_display', 'quantity', 'reserved_quantity', 'available_quantity', 'is_low_stock', 'location']
+    list_display = ['product', 'variant_display', 'quantity', 'reserved_quantity', 'available_quantity', 'is_low_stock', 'shard_count', 'location']
     list_filter = ['product__category', 'variant__name']
     search_fields = ['product__name', 'variant__name', 'variant__value', 'location']
     ordering = ['product__name', 'variant__name']
-    readonly_fields = ['available_quantity', 'is_low_stock', 'created_at', 'updated_at']
+    readonly_fields = ['available_quantity', 'is_low_stock', 'shard_count', 'created_at', 'updated_at']
+    inlines = [StockShardInline]
     
     fieldsets = (
         ('Producto y Variante', {
             'fields': ('product', 'variant')
         }),
         ('Stock', {
-            'fields': ('quantity', 'reserved_quantity', 'available_quantity', 'min_stock_level')
+            'fields': ('quantity', 'reserved_quantity', 'available_quantity', 'min_stock_level', 'shard_count')
         }),
         ('Estado', {
             'fields': ('is_low_stock',)
@@ -0,0 +1,73 @@
+"""
+Endpoints JSON del catálogo como vistas asíncronas (ver ``cart/api.py``).
+
+La ficha de producto consulta la disponibilidad al cargar y después de cada
+"agregar al carrito"; bajo ASGI esas esperas a la base de datos no ocupan
+un hilo del worker.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Sum
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+
+from .models import ItemStock, Product, StockShard
+
+MAX_AVAILABILITY_IDS = 100
+
+
+async def availability(request):
+    """
+    Unidades disponibles de los productos pedidos (``?ids=1,2,3``) y de sus
+    variantes, en tres consultas sin importar cuántos sean. Los productos sin
+    registro de stock informan ``Product.stock``.
+    """
+    try:
+        ids = {int(value) for value in request.GET.get('ids', '').split(',') if value.strip()}
+    except ValueError:
+        return JsonResponse({'error': 'ids debe ser una lista de números separados por coma'}, status=400)
+    if not ids or len(ids) > MAX_AVAILABILITY_IDS:
+        return JsonResponse({'error': f'Indica entre 1 y {MAX_AVAILABILITY_IDS} productos'}, status=400)
+
+    products = {
+        pk: stock
+        async for pk, stock in Product.objects.filter(pk__in=ids, is_active=True).values_list('pk', 'stock')
+    }
+
+    rows = ItemStock.objects.filter(product_id__in=products).annotate(
+        free=F('quantity') - F('reserved_quantity'),
+    ).values_list('pk', 'product_id', 'variant_id', 'free', 'shard_count')
+    stock_rows = [row async for row in rows]
+
+    # En los SKU con shards lo libre está repartido en sus filas StockShard
+    sharded = [pk for pk, _, _, _, shard_count in stock_rows if shard_count]
+    in_shards = {}
+    if sharded:
+        in_shards = {
+            stock_id: free
+            async for stock_id, free in StockShard.objects.filter(stock_item_id__in=sharded)
+            .values('stock_item_id').annotate(free=Sum(F('quantity') - F('reserved_quantity')))
+            .values_list('stock_item_id', 'free')
+        }
+
+    available = defaultdict(int)
+    variants = defaultdict(dict)
+    for pk, product_id, variant_id, free, _ in stock_rows:
+        free += in_shards.get(pk, 0)
+        available[product_id] += free
+        if variant_id:
+            variants[product_id][variant_id] = free
+
+    data = {}
+    for product_id, product_stock in products.items():
+        units = available[product_id] if product_id in available else product_stock
+        data[product_id] = {
+            'available': units,
+            'in_stock': units > 0,
+            'variants': variants[product_id],
+        }
+
+    response = JsonResponse({'products': data})
+    # Un número aproximado alcanza: la reserva real se valida al agregar al carrito
+    patch_cache_control(response, public=True, max_age=5)
+    return response
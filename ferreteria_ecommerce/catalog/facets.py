@@ -0,0 +1,189 @@
+"""
+Filtros por facetas para los listados de productos.
+
+Facetas disponibles (parámetros GET):
+
+- ``price``: banda de precio, por ejemplo ``price=500-1000`` (se puede repetir)
+- ``attr``: atributo de variante ``Nombre:Valor``, por ejemplo ``attr=Peso:500g``
+- ``in_stock=1``: solo productos con stock disponible en ``ItemStock``
+- ``on_offer=1``: solo productos destacados con descuento
+
+Los conteos de todas las facetas se calculan con una sola consulta
+(``UNION ALL`` de agregados agrupados). Cada faceta se cuenta sin su
+propio filtro, así al marcar "Color: Rojo" se siguen viendo cuántos
+productos hay en los demás colores.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, Exists, F, OuterRef, Q, Value, When
+
+# (clave, etiqueta, mínimo, máximo exclusivo)
+PRICE_BANDS = [
+    ('0-500', 'Hasta RD$ 500', None, Decimal('500')),
+    ('500-1000', 'RD$ 500 - 1,000', Decimal('500'), Decimal('1000')),
+    ('1000-2500', 'RD$ 1,000 - 2,500', Decimal('1000'), Decimal('2500')),
+    ('2500-5000', 'RD$ 2,500 - 5,000', Decimal('2500'), Decimal('5000')),
+    ('5000-', 'Más de RD$ 5,000', Decimal('5000'), None),
+]
+
+PRICE_BAND_KEYS = {key for key, _, _, _ in PRICE_BANDS}
+
+
+@dataclass
+class FacetSelection:
+    price: set = field(default_factory=set)
+    attrs: dict = field(default_factory=dict)
+    in_stock: bool = False
+    on_offer: bool = False
+
+    @classmethod
+    def from_query(cls, params):
+        selection = cls(
+            price={key for key in params.getlist('price') if key in PRICE_BAND_KEYS},
+            in_stock=params.get('in_stock') == '1',
+            on_offer=params.get('on_offer') == '1',
+        )
+        for raw in params.getlist('attr'):
+            name, sep, value = raw.partition(':')
+            if sep and name and value:
+                selection.attrs.setdefault(name, set()).add(value)
+        return selection
+
+    @property
+    def is_active(self):
+        return bool(self.price or self.attrs or self.in_stock or self.on_offer)
+
+
+def _price_band_q(key):
+    for band_key, _, low, high in PRICE_BANDS:
+        if band_key == key:
+            q = Q()
+            if low is not None:
+                q &= Q(price__gte=low)
+            if high is not None:
+                q &= Q(price__lt=high)
+            return q
+    return Q()
+
+
+def _price_band_expression():
+    whens = []
+    for key, _, low, high in PRICE_BANDS:
+        if high is not None:
+            whens.append(When(price__lt=high, then=Value(key)))
+    return Case(*whens, default=Value(PRICE_BANDS[-1][0]), output_field=CharField())
+
+
+def in_stock_q():
+    from .models import ItemStock, StockShard
+
+    # En los SKU con shards lo libre está repartido entre sus filas StockShard
+    return Q(Exists(ItemStock.objects.filter(product=OuterRef('pk'), quantity__gt=F('reserved_quantity')))) | Q(
+        Exists(StockShard.objects.filter(stock_item__product=OuterRef('pk'), quantity__gt=F('reserved_quantity')))
+    )
+
+
+def apply_facets(queryset, selection, exclude=None):
+    """Aplicar los filtros seleccionados; ``exclude`` omite una faceta ('price', 'attr:<nombre>', ...)"""
+    from .models import ProductVariant
+
+    if selection.price and exclude != 'price':
+        q = Q()
+        for key in selection.price:
+            q |= _price_band_q(key)
+        queryset = queryset.filter(q)
+    if selection.in_stock and exclude != 'in_stock':
+        queryset = queryset.filter(in_stock_q())
+    if selection.on_offer and exclude != 'on_offer':
+        queryset = queryset.filter(is_featured=True, discount_percentage__gt=0)
+    for name, values in selection.attrs.items():
+        if exclude == f'attr:{name}':
+            continue
+        # Distintos valores del mismo atributo se combinan con OR; distintos atributos con AND
+        queryset = queryset.filter(Exists(ProductVariant.objects.filter(
+            product=OuterRef('pk'), is_active=True, name=name, value__in=values,
+        )))
+    return queryset
+
+
+def _branch(queryset, facet, name, key, count):
+    return queryset.order_by().annotate(
+        facet=Value(facet, output_field=CharField()),
+        facet_name=name,
+        facet_key=key,
+    ).values('facet', 'facet_name', 'facet_key').annotate(facet_count=count)
+
+
+def facet_counts(queryset, selection):
+    """
+    Conteos de todas las facetas para el resultado actual en una sola consulta.
+
+    Devuelve un diccionario con ``price`` (banda -> conteo), ``attrs``
+    (nombre -> {valor: conteo}), ``in_stock`` y ``on_offer``.
+    """
+    from .models import ProductVariant
+
+    empty = Value('', output_field=CharField())
+    branches = [
+        _branch(apply_facets(queryset, selection, exclude='price'),
+                'price', empty, _price_band_expression(), Count('id')),
+        _branch(apply_facets(queryset, selection, exclude='in_stock').filter(in_stock_q()),
+                'in_stock', empty, empty, Count('id')),
+        _branch(apply_facets(queryset, selection, exclude='on_offer').filter(is_featured=True, discount_percentage__gt=0),
+                'on_offer', empty, empty, Count('id')),
+    ]
+
+    variants = ProductVariant.objects.filter(is_active=True)
+    # Atributos seleccionados: contar sin su propio filtro
+    for name in selection.attrs:
+        branches.append(_branch(
+            variants.filter(name=name, product__in=apply_facets(queryset, selection, exclude=f'attr:{name}').values('pk')),
+            'attr', F('name'), F('value'), Count('product_id', distinct=True),
+        ))
+    # Resto de atributos: con todos los filtros aplicados
+    branches.append(_branch(
+        variants.exclude(name__in=list(selection.attrs)).filter(
+            product__in=apply_facets(queryset, selection).values('pk')
+        ),
+        'attr', F('name'), F('value'), Count('product_id', distinct=True),
+    ))
+
+    result = {'price': {}, 'attrs': {}, 'in_stock': 0, 'on_offer': 0}
+    for row in branches[0].union(*branches[1:], all=True):
+        facet, count = row['facet'], row['facet_count']
+        if facet == 'price':
+            result['price'][row['facet_key']] = count
+        elif facet == 'attr':
+            result['attrs'].setdefault(row['facet_name'], {})[row['facet_key']] = count
+        else:
+            result[facet] = count
+    return result
+
+
+def build_facets(queryset, selection):
+    """Estructura lista para la plantilla: facetas con etiqueta, conteo y si están marcadas"""
+    counts = facet_counts(queryset, selection)
+    price = [
+        {'key': key, 'label': label, 'count': counts['price'].get(key, 0), 'selected': key in selection.price}
+        for key, label, _, _ in PRICE_BANDS
+        if counts['price'].get(key) or key in selection.price
+    ]
+    attrs = []
+    for name in sorted(counts['attrs'].keys() | selection.attrs.keys()):
+        values = counts['attrs'].get(name, {})
+        selected = selection.attrs.get(name, set())
+        attrs.append({
+            'name': name,
+            'values': [
+                {'value': value, 'param': f'{name}:{value}', 'count': values.get(value, 0), 'selected': value in selected}
+                for value in sorted(values.keys() | selected)
+            ],
+        })
+    return {
+        'price': price,
+        'attrs': attrs,
+        'in_stock': {'count': counts['in_stock'], 'selected': selection.in_stock},
+        'on_offer': {'count': counts['on_offer'], 'selected': selection.on_offer},
+        'is_active': selection.is_active,
+    }
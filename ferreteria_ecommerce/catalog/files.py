@@ -0,0 +1,126 @@
+"""
+Utilidades para servir archivos de imágenes de forma eficiente:
+hash de contenido, respuestas condicionales (304) y peticiones Range (206).
+"""
+import hashlib
+import mimetypes
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+CHUNK_SIZE = 64 * 1024
+
+# Un año: las URLs con hash de contenido nunca cambian
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_sha256(field_file):
+    """SHA-256 del contenido de un FieldFile (subido o ya guardado en el storage)"""
+    digest = hashlib.sha256()
+    if not field_file._committed:
+        for chunk in field_file.file.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        field_file.file.seek(0)
+        return digest.hexdigest()
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Devolver (inicio, fin) inclusivos para un único rango. Devuelve None si
+    el encabezado se ignora (varios rangos o sintaxis inválida: RFC 9110
+    permite responder 200 completo) y lanza ``RangeNotSatisfiable`` si el
+    rango es válido pero queda fuera del archivo.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if start == '' and end == '':
+        return None
+    if start == '':
+        # Sufijo: los últimos N bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end != '' and int(end) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = size - 1 if end == '' else min(int(end), size - 1)
+    return start, end
+
+
+def _iter_range(f, start, end):
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def serve_file(request, storage, name, etag, immutable=False):
+    """
+    Servir un archivo del storage con ETag, Last-Modified, 304 y soporte de Range.
+    """
+    size = storage.size(name)
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    quoted_etag = f'"{etag}"'
+
+    # If-None-Match / If-Modified-Since -> 304 sin leer el archivo
+    not_modified = get_conditional_response(request, etag=quoted_etag, last_modified=last_modified)
+    if not_modified is not None:
+        response = not_modified
+    else:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        # If-Range: solo respetar el rango si el cliente tiene la misma versión
+        if range_header and if_range and if_range.strip() != quoted_etag:
+            range_header = None
+
+        try:
+            # Un encabezado que no se entiende (o con varios rangos) se ignora: 200 completo
+            byte_range = parse_range(range_header, size) if range_header else None
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        else:
+            if byte_range is not None:
+                start, end = byte_range
+                response = StreamingHttpResponse(
+                    _iter_range(storage.open(name, 'rb'), start, end),
+                    status=206,
+                    content_type=content_type,
+                )
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+                response['Content-Length'] = str(end - start + 1)
+            else:
+                response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+                response['Content-Length'] = str(size)
+
+    response['ETag'] = quoted_etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    return response
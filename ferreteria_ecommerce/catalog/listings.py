@@ -0,0 +1,83 @@
+"""
+Mantenimiento del modelo de lectura ``ProductListing``.
+
+Cada producto activo tiene una fila plana con lo que muestra su tarjeta
+(nombre, precios, descuento, categoría, imagen principal y stock), así
+los listados leen una sola tabla angosta e indexada. Las filas se
+actualizan desde señales (``catalog/signals.py``) y se reconstruyen por
+completo con ``python manage.py rebuild_listings``.
+"""
+from django.utils.text import Truncator
+
+from .search import search_rank
+
+# Campos que se sobrescriben al refrescar una fila existente
+LISTING_FIELDS = [
+    'name', 'slug', 'summary', 'price', 'original_price', 'is_featured', 'stock',
+    'category_id', 'category_name', 'image_id', 'image_name', 'image_hash',
+    'image_alt', 'image_derivatives_ready', 'created_at',
+]
+
+# Campos de Product que se copian al listado (para filtrar señales con update_fields)
+SOURCE_FIELDS = {
+    'name', 'slug', 'description', 'price', 'original_price', 'is_featured',
+    'is_active', 'stock', 'category',
+}
+
+
+def build_listing(product):
+    from .models import ProductListing
+
+    image = product.main_image
+    return ProductListing(
+        product_id=product.pk,
+        name=product.name,
+        slug=product.slug,
+        summary=Truncator(product.description).words(10)[:300],
+        price=product.price,
+        original_price=product.original_price,
+        is_featured=product.is_featured,
+        stock=product.stock,
+        category_id=product.category_id,
+        category_name=product.category.name,
+        image_id=image.pk if image else None,
+        image_name=image.image.name if image and image.image else '',
+        image_hash=image.content_hash if image else '',
+        image_alt=image.alt_text if image else '',
+        image_derivatives_ready=image.derivatives_ready if image else False,
+        created_at=product.created_at,
+    )
+
+
+def refresh_listings(product_ids):
+    """Recalcular las filas de los productos dados (y borrar las de productos inactivos)"""
+    from .models import Product, ProductListing
+
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    products = list(Product.objects.filter(pk__in=product_ids, is_active=True).with_main_image())
+    active_ids = {product.pk for product in products}
+    ProductListing.objects.filter(product_id__in=set(product_ids) - active_ids).delete()
+    ProductListing.objects.bulk_create(
+        [build_listing(product) for product in products],
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=LISTING_FIELDS,
+    )
+    return len(products)
+
+
+def listings_for(products, search_query=None):
+    """
+    Listados que corresponden a un queryset de productos ya filtrado
+    (búsqueda, facetas). Con búsqueda se conserva ``search_rank``.
+    """
+    from .models import ProductListing
+
+    listings = ProductListing.objects.filter(product_id__in=products.values('pk'))
+    if search_query:
+        listings = listings.annotate(
+            search_rank=search_rank(search_query, f'{ProductListing._meta.db_table}.product_id')
+        )
+    return listings
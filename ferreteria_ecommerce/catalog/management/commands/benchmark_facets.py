@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from catalog.facets import FacetSelection, build_facets
+from catalog.models import Category, ItemStock, Product, ProductVariant
+
+COLORS = ['Rojo', 'Azul', 'Negro', 'Amarillo', 'Verde']
+WEIGHTS = ['250g', '500g', '1kg', '2kg']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Medir el cálculo de conteos de facetas y verificar que cumpla el presupuesto de latencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000, help='Cantidad de productos de prueba')
+        parser.add_argument('--budget-ms', type=float, default=150.0, help='Latencia máxima permitida (mediana, ms)')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por medición')
+
+    def timed(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def create_catalog(self, category, total):
+        rng = random.Random(42)
+        products = Product.objects.bulk_create(
+            (Product(
+                name=f'Producto benchmark {i}', slug=f'benchmark-facetas-{i}', description='-',
+                price=Decimal(rng.randint(50, 8000)), original_price=Decimal(9000) if i % 4 == 0 else None,
+                is_featured=i % 4 == 0, category=category, sku=f'BENCH-FAC-{i}',
+            ) for i in range(total)),
+            batch_size=5000,
+        )
+        variants = []
+        stock = []
+        for product in products:
+            variants.append(ProductVariant(
+                product=product, name='Color', value=rng.choice(COLORS), sku=f'{product.sku}-C'
+            ))
+            if rng.random() < 0.5:
+                variants.append(ProductVariant(
+                    product=product, name='Peso', value=rng.choice(WEIGHTS), sku=f'{product.sku}-P'
+                ))
+            stock.append(ItemStock(product=product, quantity=rng.randint(0, 20)))
+        ProductVariant.objects.bulk_create(variants, batch_size=5000)
+        ItemStock.objects.bulk_create(stock, batch_size=5000)
+
+    def handle(self, *args, **options):
+        total = options['products']
+        budget = options['budget_ms']
+        repeat = options['repeat']
+
+        scenarios = [
+            ('Sin filtros', ''),
+            ('Color', 'attr=Color:Rojo'),
+            ('Color + precio + stock', 'attr=Color:Rojo&attr=Color:Azul&price=500-1000&in_stock=1'),
+            ('Todo', 'attr=Color:Negro&attr=Peso:1kg&price=1000-2500&in_stock=1&on_offer=1'),
+        ]
+
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        try:
+            with transaction.atomic():
+                self.stdout.write(f'Generando {total} productos de prueba con variantes y stock...')
+                category = Category.objects.create(name='Benchmark', slug='benchmark-facetas')
+                self.create_catalog(category, total)
+                base = Product.objects.filter(is_active=True, category=category)
+
+                results = []
+                for label, query in scenarios:
+                    selection = FacetSelection.from_query(QueryDict(query))
+                    with CaptureQueriesContext(connection) as ctx:
+                        build_facets(base, selection)
+                    ms = self.timed(lambda: build_facets(base, selection), repeat)
+                    results.append((label, len(ctx), ms))
+
+                self.stdout.write('\n' + '=' * 50)
+                self.stdout.write(f'RESULTADOS (mediana en ms, {total} productos)')
+                self.stdout.write('=' * 50)
+                for label, queries, ms in results:
+                    self.stdout.write(f'{label:<25} {queries:>3} consulta(s) {ms:>10.2f} ms')
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\nDatos de prueba eliminados.'))
+
+        slow = [label for label, _, ms in results if ms > budget]
+        if slow:
+            raise CommandError(f'Superan el presupuesto de {budget:.0f} ms: {", ".join(slow)}')
+        self.stdout.write(self.style.SUCCESS(f'¡Todas las facetas dentro del presupuesto de {budget:.0f} ms!'))
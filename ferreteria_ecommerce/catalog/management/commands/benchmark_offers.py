@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F
+from catalog.models import Category, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Comparar la página de ofertas: descuento calculado en cada consulta vs columna materializada con índice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Cantidad de productos de prueba')
+        parser.add_argument('--per-page', type=int, default=12, help='Productos por página')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por medición')
+
+    def timed(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def create_products(self, category, total):
+        rng = random.Random(42)
+        batch = []
+        for i in range(total):
+            price = Decimal(rng.randint(100, 10000))
+            # Un tercio de los productos destacados y con precio original mayor
+            on_offer = i % 3 == 0
+            batch.append(Product(
+                name=f'Producto benchmark {i}', slug=f'benchmark-ofertas-{i}', description='-',
+                price=price, original_price=price + rng.randint(1, 5000) if on_offer else None,
+                is_featured=on_offer, category=category, sku=f'BENCH-OF-{i}',
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+    def handle(self, *args, **options):
+        total = options['products']
+        per_page = options['per_page']
+        repeat = options['repeat']
+
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        try:
+            with transaction.atomic():
+                self.stdout.write(f'Generando {total} productos de prueba...')
+                category = Category.objects.create(name='Benchmark', slug='benchmark-ofertas')
+                self.create_products(category, total)
+
+                # Antes: filtro y porcentaje calculados sobre cada fila
+                before = Product.objects.filter(
+                    is_active=True, is_featured=True,
+                    original_price__isnull=False, original_price__gt=F('price'),
+                ).annotate(
+                    computed_discount=ExpressionWrapper(
+                        (F('original_price') - F('price')) / F('original_price') * 100,
+                        output_field=DecimalField(),
+                    )
+                ).order_by('-computed_discount', '-created_at', '-id')[:per_page]
+
+                # Después: columna materializada + índice parcial product_offers_idx
+                after = Product.objects.filter(
+                    is_active=True, is_featured=True, discount_percentage__gt=0,
+                ).order_by('-discount_percentage', '-created_at', '-id')[:per_page]
+
+                results = [
+                    ('Calculado por consulta', self.timed(lambda: list(before.all()), repeat)),
+                    ('Columna + índice', self.timed(lambda: list(after.all()), repeat)),
+                ]
+
+                self.stdout.write('\n' + '=' * 50)
+                self.stdout.write(f'RESULTADOS (mediana en ms, {total} productos)')
+                self.stdout.write('=' * 50)
+                for label, ms in results:
+                    self.stdout.write(f'{label:<25} {ms:>10.2f} ms')
+
+                self.stdout.write('\nPlan de la consulta nueva:')
+                self.stdout.write(after.explain())
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\nDatos de prueba eliminados.'))
@@ -0,0 +1,133 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from catalog import shards
+from catalog.models import Category, ItemStock, Product
+
+
+class Command(BaseCommand):
+    help = 'Medir reservas por segundo de un SKU muy disputado según la cantidad de shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--attempts', type=int, default=25, help='Reservas por hilo')
+        parser.add_argument(
+            '--shards',
+            default='0,2,4,8,16',
+            help='Cantidades de shards a comparar, separadas por coma (0 = una sola fila)',
+        )
+        parser.add_argument(
+            '--hold-ms',
+            type=float,
+            default=5,
+            help='Milisegundos que cada transacción mantiene la reserva abierta (resto de agregar al carrito)',
+        )
+
+    def hammer(self, stock_id, threads, attempts, hold):
+        """Lanzar todos los hilos a la vez; devuelve (reservas exitosas, errores de bloqueo)"""
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            successes = errors = 0
+            try:
+                stock_item = ItemStock.objects.get(pk=stock_id)
+                barrier.wait()
+                for _ in range(attempts):
+                    try:
+                        with transaction.atomic():
+                            if stock_item.reserve_stock(1):
+                                successes += 1
+                            # El bloqueo de la fila se mantiene hasta el final de la transacción
+                            time.sleep(hold)
+                    except OperationalError:
+                        # SQLite: "database is locked" con escrituras simultáneas
+                        errors += 1
+            finally:
+                connection.close()
+            return successes, errors
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda _: worker(), range(threads)))
+        return sum(s for s, _ in results), sum(e for _, e in results)
+
+    def run_scenario(self, stock_item, count, options):
+        shards.disable(stock_item.pk)
+        ItemStock.objects.filter(pk=stock_item.pk).update(quantity=stock_item.quantity, reserved_quantity=0)
+        if count:
+            shards.enable(stock_item.pk, count)
+
+        start = time.perf_counter()
+        successes, errors = self.hammer(
+            stock_item.pk, options['threads'], options['attempts'], options['hold_ms'] / 1000
+        )
+        elapsed = time.perf_counter() - start
+
+        stock_item.refresh_from_db()
+        reserved = stock_item.quantity - stock_item.available_quantity
+        return {
+            'shards': count,
+            'successes': successes,
+            'errors': errors,
+            'reserved': reserved,
+            'seconds': elapsed,
+            'per_second': successes / elapsed if elapsed else 0,
+        }
+
+    def handle(self, *args, **options):
+        try:
+            counts = [int(value) for value in options['shards'].split(',')]
+        except ValueError:
+            raise CommandError('--shards debe ser una lista de enteros, por ejemplo 0,4,8')
+        if any(count == 1 or count < 0 for count in counts):
+            raise CommandError('Cada cantidad de shards debe ser 0 o al menos 2')
+        if options['threads'] < 2:
+            raise CommandError('Se necesitan al menos 2 hilos')
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite bloquea toda la base en cada escritura y no tiene bloqueos por fila: '
+                'los shards solo se notan con PostgreSQL.'
+            ))
+
+        total = options['threads'] * options['attempts']
+        # Los hilos usan sus propias conexiones, así que los datos deben estar confirmados
+        category = Category.objects.create(name='Prueba de shards', slug='benchmark-stock-shards')
+        try:
+            product = Product.objects.create(
+                name='Taladro en oferta relámpago', slug='benchmark-stock-shards-taladro', sku='BENCH-SHARDS',
+                price=100, stock=total, category=category,
+            )
+            stock_item = ItemStock.objects.create(product=product, quantity=total)
+
+            self.stdout.write(
+                f'{options["threads"]} hilos x {options["attempts"]} reservas de 1 unidad, '
+                f'{options["hold_ms"]:g} ms por transacción'
+            )
+            results = [self.run_scenario(stock_item, count, options) for count in counts]
+        finally:
+            product = Product.objects.filter(slug='benchmark-stock-shards-taladro').first()
+            if product:
+                product.delete()
+            category.delete()
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'{"Shards":<8} {"Éxitos":>7} {"Reservado":>10} {"Segundos":>9} {"Reservas/s":>11}')
+        baseline = results[0]['per_second'] or 1
+        for r in results:
+            self.stdout.write(
+                f'{r["shards"] or "1 fila":<8} {r["successes"]:>7} {r["reserved"]:>10} '
+                f'{r["seconds"]:>9.2f} {r["per_second"]:>11.1f}  (x{r["per_second"] / baseline:.1f})'
+            )
+            if r['errors']:
+                self.stdout.write(self.style.WARNING(f'  {r["errors"]} intento(s) fallaron por bloqueo de la base de datos'))
+
+        for r in results:
+            if r['reserved'] != r['successes']:
+                raise CommandError(
+                    f'✗ Con {r["shards"]} shards se confirmaron {r["successes"]} reservas pero hay {r["reserved"]} reservadas'
+                )
+        self.stdout.write(self.style.SUCCESS('\n✓ Todas las reservas confirmadas figuran en el stock'))
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from catalog.models import Category, Product, ProductImage, ProductListing
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Verificar que los listados del catálogo hagan un número constante de consultas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-sql', action='store_true', help='Mostrar las consultas ejecutadas')
+
+    def create_products(self, category, count, prefix):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'{prefix} martillo {i}', slug=f'{prefix}-qc-{i}', description='Producto de prueba',
+                price=100, original_price=150, is_featured=True, stock=10,
+                category=category, sku=f'{prefix}-QC-{i}'
+            )
+            # Los archivos no existen: el hash queda vacío y las páginas deben funcionar igual
+            ProductImage.objects.create(product=product, image='products/qc-main.jpg', alt_text='principal', is_main=True)
+            ProductImage.objects.create(product=product, image='products/qc-2.jpg', alt_text='secundaria', order=1)
+        return product
+
+    def measure(self, client, urls):
+        counts = {}
+        for label, url in urls:
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{label}: respuesta {response.status_code} en {url}')
+            counts[label] = len(ctx.captured_queries)
+            if self.verbose_sql:
+                for query in ctx.captured_queries:
+                    self.stdout.write(f'    {query["sql"]}')
+        return counts
+
+    def check_deletes(self, category, product):
+        """Borrar un producto con imágenes y luego su categoría no debe dejar listados huérfanos"""
+        for label, delete in [('el producto', product.delete), ('la categoría', category.delete)]:
+            try:
+                delete()
+                # SQLite y PostgreSQL difieren la verificación de claves foráneas hasta el commit
+                connection.check_constraints()
+            except IntegrityError as e:
+                raise CommandError(f'✗ Borrar {label} con imágenes falló: {e}')
+        if ProductListing.objects.filter(category_id=category.pk).exists():
+            raise CommandError('✗ Quedaron listados de productos borrados')
+        self.stdout.write(self.style.SUCCESS('✓ Borrar productos y categorías con imágenes no deja listados huérfanos'))
+
+    def handle(self, *args, **options):
+        self.verbose_sql = options['verbose_sql']
+        client = Client(HTTP_HOST='127.0.0.1')
+        failures = []
+
+        # Se mide con pocos y con muchos productos; el número de consultas debe ser el mismo
+        try:
+            with transaction.atomic():
+                category = Category.objects.create(name='Control de consultas', slug='control-consultas-qc')
+                product = self.create_products(category, 2, 'a')
+                urls = [
+                    ('Inicio', '/'),
+                    ('Productos', '/products/'),
+                    ('Búsqueda', '/products/?q=martillo&sort=relevance'),
+                    ('Ofertas', '/offers/'),
+                    ('Ofertas por categoría', f'/offers/?category={category.slug}'),
+                    ('Categoría', f'/category/{category.slug}/'),
+                    ('Detalle de producto', f'/product/{product.slug}/'),
+                ]
+                small = self.measure(client, urls)
+                self.create_products(category, 12, 'b')
+                large = self.measure(client, urls)
+                self.check_deletes(category, product)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'{"Página":<25} {"2 productos":>12} {"14 productos":>13}')
+        for label, _ in urls:
+            ok = small[label] == large[label]
+            line = f'{label:<25} {small[label]:>12} {large[label]:>13}'
+            self.stdout.write(self.style.SUCCESS(line) if ok else self.style.ERROR(line))
+            if not ok:
+                failures.append(label)
+
+        if failures:
+            raise CommandError(f'Consultas N+1 detectadas en: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('\n¡Todas las páginas hacen un número constante de consultas!'))
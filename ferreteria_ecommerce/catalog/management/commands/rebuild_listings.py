@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog.listings import refresh_listings
+from catalog.models import Product, ProductListing
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir por completo el modelo de lectura ProductListing de los listados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cantidad de productos por lote',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        self.stdout.write(f'Productos a procesar: {len(product_ids)}')
+
+        with transaction.atomic():
+            # Filas de productos que ya no existen
+            orphans, _ = ProductListing.objects.exclude(product_id__in=Product.objects.values('id')).delete()
+            active = 0
+            for start in range(0, len(product_ids), batch_size):
+                active += refresh_listings(product_ids[start:start + batch_size])
+                self.stdout.write(f'  {min(start + batch_size, len(product_ids))}/{len(product_ids)}')
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'Listados activos: {active}')
+        self.stdout.write(f'Productos inactivos: {len(product_ids) - active}')
+        self.stdout.write(f'Filas huérfanas eliminadas: {orphans}')
+        self.stdout.write(self.style.SUCCESS('\n¡Listados reconstruidos!'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from catalog.models import Product
+from catalog.search import get_backend, index_products
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir el índice de búsqueda de productos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Cantidad de productos procesados por lote',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Asegurar que exista la estructura del índice (columna/tabla)
+        with connection.cursor() as cursor:
+            get_backend().setup(cursor)
+
+        products = Product.objects.select_related('category__parent').order_by('id')
+        total = 0
+        last_id = 0
+        while True:
+            batch = list(products.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            total += index_products(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'Indexados {total} productos...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'\n¡Índice de búsqueda reconstruido! Productos indexados: {total}')
+        )
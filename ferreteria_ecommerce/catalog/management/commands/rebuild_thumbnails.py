@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from catalog.models import ProductImage
+from catalog.thumbnails import mark_derivatives_ready, render_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generar las miniaturas (WebP y JPEG) de las imágenes de productos existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 2,
+            help='Cantidad de procesos en paralelo',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerar también las imágenes que ya tienen miniaturas',
+        )
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            images = images.filter(derivatives_ready=False)
+
+        # Las imágenes con el mismo contenido comparten archivo: procesarlo una sola vez
+        pending = {}
+        for image in images.only('id', 'image'):
+            pending.setdefault(image.image.path, []).append(image.id)
+        self.stdout.write(f'Archivos a procesar: {len(pending)} (procesos: {options["workers"]})')
+
+        ready_ids = []
+        errors = []
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(render_derivatives, path): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    future.result()
+                    ready_ids.extend(pending[path])
+                    self.stdout.write(self.style.SUCCESS(f'✓ {os.path.relpath(path, settings.MEDIA_ROOT)}'))
+                except Exception as e:
+                    errors.append(f'{path}: {str(e)}')
+                    self.stdout.write(self.style.ERROR(f'✗ {path}: {str(e)}'))
+
+        mark_derivatives_ready(ready_ids)
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'Procesadas: {len(ready_ids)}')
+        self.stdout.write(f'Errores: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS('\n¡Miniaturas generadas!'))
@@ -0,0 +1,96 @@
+import os
+
+from django.core.management.base import BaseCommand
+from catalog.listings import refresh_listings
+from catalog.models import ProductImage
+from catalog.storage import hash_from_name
+from catalog.thumbnails import FORMATS, PRESETS, delete_derivatives, derivative_name, derivatives_exist
+
+
+class Command(BaseCommand):
+    help = 'Mover las imágenes de productos existentes al almacenamiento direccionado por contenido (SHA-256)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar qué archivos se moverían sin modificar nada',
+        )
+        parser.add_argument(
+            '--keep-originals',
+            action='store_true',
+            help='No borrar los archivos con el nombre anterior',
+        )
+
+    def move_derivatives(self, storage, old_name, new_name):
+        """Reutilizar las miniaturas ya generadas en lugar de volver a calcularlas"""
+        for preset in PRESETS:
+            for fmt in FORMATS:
+                source = derivative_name(old_name, preset, fmt)
+                target = derivative_name(new_name, preset, fmt)
+                if storage.exists(source) and not storage.exists(target):
+                    os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+                    os.replace(storage.path(source), storage.path(target))
+
+    def handle(self, *args, **options):
+        storage = ProductImage._meta.get_field('image').storage
+        images = ProductImage.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+
+        moved = 0
+        skipped = 0
+        missing = []
+        old_names = set()
+        new_names = set()
+        product_ids = set()
+
+        for image in images.only('id', 'product_id', 'image').iterator():
+            old_name = image.image.name
+            if hash_from_name(old_name):
+                skipped += 1
+                continue
+            if not storage.exists(old_name):
+                missing.append(old_name)
+                self.stdout.write(self.style.ERROR(f'✗ {old_name}: el archivo no existe'))
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'  {old_name}')
+                moved += 1
+                continue
+
+            with storage.open(old_name, 'rb') as f:
+                new_name = storage.save(old_name, f)
+            self.move_derivatives(storage, old_name, new_name)
+            ProductImage.objects.filter(pk=image.pk).update(
+                image=new_name,
+                content_hash=hash_from_name(new_name),
+                derivatives_ready=derivatives_exist(storage, new_name),
+            )
+            old_names.add(old_name)
+            new_names.add(new_name)
+            product_ids.add(image.product_id)
+            moved += 1
+            self.stdout.write(self.style.SUCCESS(f'✓ {old_name} -> {new_name}'))
+
+        # Las tarjetas de los listados guardan el nombre del archivo
+        refresh_listings(product_ids)
+
+        deleted = 0
+        if not options['keep_originals']:
+            for old_name in old_names:
+                if ProductImage.objects.filter(image=old_name).exists():
+                    continue
+                delete_derivatives(storage, old_name)
+                storage.delete(old_name)
+                deleted += 1
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'Imágenes movidas: {moved}')
+        self.stdout.write(f'Archivos únicos resultantes: {len(new_names)}')
+        self.stdout.write(f'Ya direccionadas por contenido: {skipped}')
+        self.stdout.write(f'Archivos faltantes: {len(missing)}')
+        self.stdout.write(f'Archivos anteriores borrados: {deleted}')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('\nModo --dry-run: no se modificó nada'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n¡Imágenes migradas!'))
+            self.stdout.write('Ejecuta "python manage.py rebuild_thumbnails" para generar las miniaturas que falten.')
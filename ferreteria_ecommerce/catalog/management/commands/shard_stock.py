@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from catalog import shards
+from catalog.models import ItemStock
+
+
+class Command(BaseCommand):
+    help = 'Repartir el stock de SKU muy disputados en varios contadores (ventas relámpago)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'skus',
+            nargs='*',
+            help='SKU de productos o variantes a repartir',
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=8,
+            help='Cantidad de shards por SKU (default: 8)',
+        )
+        parser.add_argument(
+            '--off',
+            action='store_true',
+            help='Volver al contador en una sola fila',
+        )
+        parser.add_argument(
+            '--rebalance',
+            action='store_true',
+            help='Repartir de nuevo en partes iguales todos los SKU con shards',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SEGUNDOS',
+            help='Con --rebalance, seguir ejecutándose y repartir cada SEGUNDOS',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebalance']:
+            return self.rebalance(options['loop'])
+        if not options['skus']:
+            raise CommandError('Indica al menos un SKU o usa --rebalance')
+        if not options['off'] and options['shards'] < 2:
+            raise CommandError('Se necesitan al menos 2 shards (usa --off para desactivarlos)')
+
+        skus = [sku.upper() for sku in options['skus']]
+        stock_items = ItemStock.objects.filter(
+            Q(variant__isnull=True, product__sku__in=skus) | Q(variant__sku__in=skus)
+        ).select_related('product', 'variant')
+        found = {}
+        for stock_item in stock_items:
+            found[stock_item.variant.sku if stock_item.variant else stock_item.product.sku] = stock_item
+
+        changed = 0
+        for sku in skus:
+            stock_item = found.get(sku)
+            if stock_item is None:
+                self.stdout.write(self.style.ERROR(f'✗ {sku}: no tiene registro de stock'))
+                continue
+            if options['off']:
+                shards.disable(stock_item.pk)
+                self.stdout.write(self.style.SUCCESS(f'✓ {sku}: contador en una sola fila'))
+            else:
+                shards.enable(stock_item.pk, options['shards'])
+                self.stdout.write(self.style.SUCCESS(f'✓ {sku}: repartido en {options["shards"]} shards'))
+            stock_item.refresh_from_db()
+            self.stdout.write(f'  Disponible: {stock_item.available_quantity} de {stock_item.quantity}')
+            changed += 1
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'SKU procesados: {changed}/{len(skus)}')
+        self.stdout.write(f'SKU con shards: {ItemStock.objects.filter(shard_count__gt=0).count()}')
+        if not options['off']:
+            self.stdout.write('Recuerda repartir periódicamente: python manage.py shard_stock --rebalance --loop 60')
+        self.stdout.write(self.style.SUCCESS('\n¡Contadores de stock actualizados!'))
+
+    def rebalance(self, loop):
+        if not loop:
+            count = shards.rebalance_all()
+            self.stdout.write(self.style.SUCCESS(f'✓ SKU repartidos de nuevo: {count}'))
+            return
+
+        self.stdout.write(f'Repartiendo los SKU con shards cada {loop} s (Ctrl+C para salir)...')
+        try:
+            while True:
+                close_old_connections()
+                count = shards.rebalance_all()
+                if count:
+                    self.stdout.write(f'[{timezone.now():%H:%M:%S}] SKU repartidos: {count}')
+                time.sleep(loop)
+        except KeyboardInterrupt:
+            self.stdout.write('\nDetenido.')
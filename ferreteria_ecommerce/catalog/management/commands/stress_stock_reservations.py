@@ -0,0 +1,134 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from catalog.models import Category, ItemStock, Product
+
+
+def legacy_reserve(stock_item, quantity):
+    """Reserva anterior: leer, validar y guardar la fila completa (sufre carreras)"""
+    if stock_item.available_quantity >= quantity:
+        stock_item.reserved_quantity += quantity
+        stock_item.save()
+        return True
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Reservar el mismo SKU desde muchos hilos a la vez y verificar que no haya sobreventa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--attempts', type=int, default=10, help='Reservas por hilo')
+        parser.add_argument('--stock', type=int, default=25, help='Unidades disponibles del SKU')
+        parser.add_argument('--quantity', type=int, default=1, help='Unidades por reserva')
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Ejecutar también la reserva anterior (leer-validar-guardar) para comparar',
+        )
+
+    def hammer(self, stock_id, reserve, threads, attempts, quantity):
+        """Lanzar todos los hilos a la vez; devuelve (reservas exitosas, errores de bloqueo)"""
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            successes = errors = 0
+            try:
+                barrier.wait()
+                for _ in range(attempts):
+                    try:
+                        stock_item = ItemStock.objects.get(pk=stock_id)
+                        if reserve(stock_item, quantity):
+                            successes += 1
+                    except OperationalError:
+                        # SQLite: "database is locked" con escrituras simultáneas
+                        errors += 1
+            finally:
+                connection.close()
+            return successes, errors
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda _: worker(), range(threads)))
+        return sum(s for s, _ in results), sum(e for _, e in results)
+
+    def run_scenario(self, label, stock_item, reserve, options):
+        ItemStock.objects.filter(pk=stock_item.pk).update(quantity=options['stock'], reserved_quantity=0)
+
+        start = time.perf_counter()
+        successes, errors = self.hammer(
+            stock_item.pk, reserve, options['threads'], options['attempts'], options['quantity']
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        stock_item.refresh_from_db()
+
+        expected = successes * options['quantity']
+        lost = expected - stock_item.reserved_quantity
+        oversold = max(expected - stock_item.quantity, 0)
+        return {
+            'label': label,
+            'successes': successes,
+            'errors': errors,
+            'reserved': stock_item.reserved_quantity,
+            'lost': lost,
+            'oversold': oversold,
+            'ms': elapsed,
+        }
+
+    def handle(self, *args, **options):
+        if options['threads'] < 2:
+            raise CommandError('Se necesitan al menos 2 hilos')
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite serializa las escrituras: la prueba es más significativa con PostgreSQL.'
+            ))
+
+        # Los hilos usan sus propias conexiones, así que los datos deben estar confirmados
+        category = Category.objects.create(name='Prueba de concurrencia', slug='stress-stock-reservas')
+        try:
+            product = Product.objects.create(
+                name='Taladro de prueba', slug='stress-stock-taladro', sku='STRESS-STOCK',
+                price=100, stock=options['stock'], category=category,
+            )
+            stock_item = ItemStock.objects.create(product=product, quantity=options['stock'])
+
+            total = options['threads'] * options['attempts']
+            self.stdout.write(
+                f'{options["threads"]} hilos x {options["attempts"]} intentos = {total} reservas '
+                f'de {options["quantity"]} unidad(es) sobre {options["stock"]} en stock'
+            )
+
+            results = [self.run_scenario(
+                'UPDATE condicional', stock_item, ItemStock.reserve_stock, options
+            )]
+            if options['legacy']:
+                results.append(self.run_scenario('Leer-validar-guardar', stock_item, legacy_reserve, options))
+        finally:
+            product = Product.objects.filter(slug='stress-stock-taladro').first()
+            if product:
+                product.delete()
+            category.delete()
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'{"Método":<22} {"Éxitos":>7} {"Reservado":>10} {"Perdidas":>9} {"Sobreventa":>11} {"ms":>9}')
+        for r in results:
+            self.stdout.write(
+                f'{r["label"]:<22} {r["successes"]:>7} {r["reserved"]:>10} '
+                f'{r["lost"]:>9} {r["oversold"]:>11} {r["ms"]:>9.1f}'
+            )
+            if r['errors']:
+                self.stdout.write(self.style.WARNING(f'  {r["errors"]} intento(s) fallaron por bloqueo de la base de datos'))
+
+        atomic = results[0]
+        expected = min(total, options['stock'] // options['quantity']) * options['quantity']
+        if atomic['lost'] or atomic['oversold'] or atomic['reserved'] > options['stock']:
+            raise CommandError('✗ La reserva atómica perdió reservas o vendió de más')
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Sin sobreventa: {atomic["reserved"]}/{options["stock"]} unidades reservadas'
+        ))
+        if not atomic['errors'] and atomic['reserved'] < expected:
+            raise CommandError(f'✗ Se esperaban {expected} unidades reservadas y hay {atomic["reserved"]}')
@@ -0,0 +1,37 @@
+# Generated manually to add the full-text search index
+
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    from catalog.search import get_backend
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection).setup(cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    from catalog.search import get_backend
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection).teardown(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_emergency_fix_productimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_title',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Texto de búsqueda (título)'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_body',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Texto de búsqueda (cuerpo)'),
+        ),
+        # tsvector + GIN en PostgreSQL, tabla FTS5 en SQLite
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='derivatives_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Miniaturas generadas'),
+        ),
+    ]
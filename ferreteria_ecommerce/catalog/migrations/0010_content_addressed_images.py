@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:46
+
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_productimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Hash SHA-256'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=catalog.storage.ContentAddressedStorage(), upload_to='products/', verbose_name='Imagen'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:49
+
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percentage',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(original_price__gt=models.F('price'), then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('original_price'), '-', models.F('price')), '*', models.Value(Decimal('100'))), '/', models.F('original_price'))), default=Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=5)), output_field=models.DecimalField(decimal_places=2, max_digits=5), verbose_name='Porcentaje de descuento'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('discount_percentage__gt', 0), ('is_active', True), ('is_featured', True)), fields=['-discount_percentage', '-created_at', '-id'], name='product_offers_idx'),
+        ),
+    ]
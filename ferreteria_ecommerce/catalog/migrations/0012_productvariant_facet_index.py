@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_product_discount_percentage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['name', 'value', 'product'], name='variant_facet_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:55
+
+import django.db.models.deletion
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_productvariant_facet_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='catalog.product', verbose_name='Producto')),
+                ('name', models.CharField(max_length=200, verbose_name='Nombre')),
+                ('slug', models.SlugField(max_length=200, verbose_name='Slug')),
+                ('summary', models.CharField(blank=True, max_length=300, verbose_name='Resumen')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Precio')),
+                ('original_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Precio original')),
+                ('discount_percentage', models.GeneratedField(db_persist=True, expression=models.Case(models.When(original_price__gt=models.F('price'), then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('original_price'), '-', models.F('price')), '*', models.Value(Decimal('100'))), '/', models.F('original_price'))), default=Decimal('0'), output_field=models.DecimalField(decimal_places=2, max_digits=5)), output_field=models.DecimalField(decimal_places=2, max_digits=5), verbose_name='Porcentaje de descuento')),
+                ('is_featured', models.BooleanField(default=False, verbose_name='Destacado')),
+                ('stock', models.PositiveIntegerField(default=0, verbose_name='Stock')),
+                ('category_id', models.IntegerField(db_index=True, verbose_name='Categoría')),
+                ('category_name', models.CharField(max_length=100, verbose_name='Nombre de la categoría')),
+                ('image_id', models.IntegerField(blank=True, null=True, verbose_name='Imagen principal')),
+                ('image_name', models.CharField(blank=True, max_length=255, verbose_name='Archivo de la imagen')),
+                ('image_hash', models.CharField(blank=True, max_length=64, verbose_name='Hash de la imagen')),
+                ('image_alt', models.CharField(blank=True, max_length=200, verbose_name='Texto alternativo')),
+                ('image_derivatives_ready', models.BooleanField(default=False, verbose_name='Miniaturas generadas')),
+                ('created_at', models.DateTimeField(verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Listado de producto',
+                'verbose_name_plural': 'Listados de productos',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at', '-product'], name='listing_created_idx'), models.Index(fields=['price', 'product'], name='listing_price_idx'), models.Index(fields=['name', 'product'], name='listing_name_idx'), models.Index(fields=['is_featured', '-created_at'], name='listing_featured_idx'), models.Index(condition=models.Q(('discount_percentage__gt', 0), ('is_featured', True)), fields=['-discount_percentage', '-created_at', '-product'], name='listing_offers_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_productlisting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemstock',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Shards de stock'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Número de shard')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Cantidad asignada')),
+                ('reserved_quantity', models.PositiveIntegerField(default=0, verbose_name='Cantidad reservada')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('stock_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='catalog.itemstock', verbose_name='Stock')),
+            ],
+            options={
+                'verbose_name': 'Shard de stock',
+                'verbose_name_plural': 'Shards de stock',
+                'ordering': ['stock_item', 'index'],
+                'unique_together': {('stock_item', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:23
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_stock_shards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Upper('sku'), name='product_sku_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(django.db.models.functions.text.Upper('sku'), name='variant_sku_upper_idx'),
+        ),
+    ]
@@ -1,7 +1,15 @@
+import os
+from decimal import Decimal
+
 from django.db import models
+from django.db.models.functions import Upper
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.text import slugify
-import base64
+from .files import file_sha256
+from .storage import hash_from_name, product_image_storage
+from .thumbnails import PRESETS
 
 
 class Category(models.Model):
@@ -31,6 +39,24 @@ class Category(models.Model):
         return reverse('catalog:category_detail', kwargs={'slug': self.slug})
 
 
+def discount_expression():
+    """Porcentaje de descuento de price respecto a original_price (0 si no hay descuento)"""
+    return models.Case(
+        models.When(
+            original_price__gt=models.F('price'),
+            then=(models.F('original_price') - models.F('price')) * Decimal('100') / models.F('original_price'),
+        ),
+        default=Decimal('0'),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_main_image(self):
+        """Cargar categoría e imágenes de toda la página en consultas fijas (evita N+1 en las tarjetas)"""
+        return self.select_related('category').prefetch_related('images')
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200, verbose_name="Nombre")
     slug = models.SlugField(max_length=200, unique=True, verbose_name="Slug")
@@ -44,13 +70,39 @@ class Product(models.Model):
     weight = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Peso (kg)")
     dimensions = models.CharField(max_length=100, blank=True, verbose_name="Dimensiones")
     sku = models.CharField(max_length=50, unique=True, verbose_name="SKU")
+    # Porcentaje de descuento calculado por la base de datos: se actualiza solo en save() y en update() masivos
+    discount_percentage = models.GeneratedField(
+        expression=discount_expression(),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+        verbose_name="Porcentaje de descuento",
+    )
+    # Texto normalizado para la búsqueda (ver catalog/search.py)
+    search_title = models.TextField(blank=True, default='', editable=False, verbose_name="Texto de búsqueda (título)")
+    search_body = models.TextField(blank=True, default='', editable=False, verbose_name="Texto de búsqueda (cuerpo)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['-created_at']
+        indexes = [
+            # Índices para la paginación por cursor de los listados
+            models.Index(fields=['-created_at', '-id'], name='product_created_keyset_idx'),
+            # Pedido rápido: SKU sin distinguir mayúsculas (cart/quick_order.py)
+            models.Index(Upper('sku'), name='product_sku_upper_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_keyset_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_keyset_idx'),
+            # Página de ofertas: solo productos activos, destacados y con descuento
+            models.Index(
+                fields=['-discount_percentage', '-created_at', '-id'],
+                name='product_offers_idx',
+                condition=models.Q(is_active=True, is_featured=True, discount_percentage__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -58,32 +110,42 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if not adding:
+            # El UPDATE no devuelve el descuento recalculado: se recarga al accederlo
+            self.__dict__.pop('discount_percentage', None)
 
     def get_absolute_url(self):
         return reverse('catalog:product_detail', kwargs={'slug': self.slug})
 
     def get_discount_percentage(self):
         # Solo mostrar descuento si el producto es destacado y tiene precio original
-        if self.is_featured and self.original_price and self.original_price > self.price:
-            return int(((self.original_price - self.price) / self.original_price) * 100)
+        if self.has_discount():
+            return int(self.discount_percentage)
         return 0
 
     def has_discount(self):
         """Verificar si el producto tiene descuento (solo productos destacados)"""
-        return self.is_featured and self.original_price and self.original_price > self.price
+        return self.is_featured and self.discount_percentage > 0
 
-    @property
+    @cached_property
     def main_image(self):
+        # Usar las imágenes precargadas con with_main_image() si existen
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            images = list(self.images.all())
+            return next((image for image in images if image.is_main), images[0] if images else None)
         return self.images.filter(is_main=True).first() or self.images.first()
 
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images', verbose_name="Producto")
-    image = models.ImageField(upload_to='products/', verbose_name="Imagen", null=True, blank=True)
+    image = models.ImageField(upload_to='products/', storage=product_image_storage, verbose_name="Imagen", null=True, blank=True)
     alt_text = models.CharField(max_length=200, blank=True, verbose_name="Texto alternativo")
     is_main = models.BooleanField(default=False, verbose_name="Imagen principal")
     order = models.PositiveIntegerField(default=0, verbose_name="Orden")
+    derivatives_ready = models.BooleanField(default=False, editable=False, verbose_name="Miniaturas generadas")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True, verbose_name="Hash SHA-256")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
 
     class Meta:
@@ -94,25 +156,76 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"Imagen de {self.product.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordar el archivo cargado para detectar reemplazos en save()
+        instance._loaded_image_name = dict(zip(field_names, values)).get('image')
+        return instance
+
     def save(self, *args, **kwargs):
         if self.is_main:
             # Desactivar otras imágenes principales del mismo producto
             ProductImage.objects.filter(product=self.product, is_main=True).update(is_main=False)
+        if not self.image:
+            self.content_hash = ''
+        elif not self.image._committed or self.image.name != getattr(self, '_loaded_image_name', None):
+            if not self.image._committed:
+                # Guardar primero para obtener el nombre direccionado por contenido
+                self.image.save(os.path.basename(self.image.name), self.image.file, save=False)
+            # Archivo nuevo: nuevo hash y las miniaturas se regeneran en segundo plano
+            try:
+                self.content_hash = hash_from_name(self.image.name) or file_sha256(self.image)
+            except OSError:
+                # El archivo no está en el storage: se calcula al servirla (o se responde 404)
+                self.content_hash = ''
+            self.derivatives_ready = False
         super().save(*args, **kwargs)
+        self._loaded_image_name = self.image.name
 
     def get_image_url(self):
-        """Obtener URL de la imagen"""
-        if self.image:
-            return self.image.url
-        return None
+        """Obtener URL de la imagen (compartida por todas las imágenes con el mismo contenido)"""
+        if not self.image:
+            return None
+        if not self.content_hash:
+            return reverse('catalog:product_image', args=[self.pk])
+        return reverse('catalog:image_content', args=[self.content_hash])
+
+    def get_derivative_url(self, preset, fmt='jpeg'):
+        """URL de un derivado redimensionado; la original si aún no se generó"""
+        if not self.image:
+            return None
+        if not self.derivatives_ready or not self.content_hash:
+            return self.get_image_url()
+        return reverse('catalog:image_content_derivative', args=[self.content_hash, preset, fmt])
+
+    def get_srcset(self, fmt='jpeg'):
+        """Valor del atributo srcset con todos los anchos disponibles"""
+        if not self.image or not self.derivatives_ready:
+            return ''
+        return ', '.join(
+            f'{self.get_derivative_url(preset, fmt)} {width}w' for preset, width in PRESETS.items()
+        )
+
+    @property
+    def thumb_url(self):
+        return self.get_derivative_url('thumb')
+
+    @property
+    def card_url(self):
+        return self.get_derivative_url('card')
+
+    @property
+    def detail_url(self):
+        return self.get_derivative_url('detail')
+
+    @property
+    def srcset_webp(self):
+        return self.get_srcset('webp')
 
-    def get_image_data_base64(self):
-        """Obtener los datos de imagen en formato base64 para usar en templates"""
-        if self.image:
-            import base64
-            with open(self.image.path, 'rb') as img_file:
-                return base64.b64encode(img_file.read()).decode('utf-8')
-        return None
+    @property
+    def srcset_jpeg(self):
+        return self.get_srcset('jpeg')
 
 
 class ProductVariant(models.Model):
@@ -131,6 +244,12 @@ class ProductVariant(models.Model):
         verbose_name_plural = "Variantes de productos"
         unique_together = ['product', 'name', 'value']
         ordering = ['name', 'value']
+        indexes = [
+            # Conteo de facetas por atributo (ver catalog/facets.py)
+            models.Index(fields=['name', 'value', 'product'], name='variant_facet_idx'),
+            # Pedido rápido: SKU sin distinguir mayúsculas (cart/quick_order.py)
+            models.Index(Upper('sku'), name='variant_sku_upper_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.name}: {self.value}"
@@ -157,6 +276,8 @@ class ItemStock(models.Model):
     variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_items', verbose_name="Variante")
     quantity = models.PositiveIntegerField(default=0, verbose_name="Cantidad disponible")
     reserved_quantity = models.PositiveIntegerField(default=0, verbose_name="Cantidad reservada")
+    # 0: contador normal; K > 0: el stock se reparte en K filas StockShard (ver catalog/shards.py)
+    shard_count = models.PositiveSmallIntegerField(default=0, verbose_name="Shards de stock")
     min_stock_level = models.PositiveIntegerField(default=5, verbose_name="Nivel mínimo de stock")
     location = models.CharField(max_length=100, blank=True, verbose_name="Ubicación en almacén")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
@@ -176,41 +297,73 @@ class ItemStock(models.Model):
     @property
     def available_quantity(self):
         """Cantidad realmente disponible (total - reservada)"""
-        return self.quantity - self.reserved_quantity
+        available = self.quantity - self.reserved_quantity
+        if self.shard_count:
+            # Lo repartido en shards figura como reservado en esta fila: sumar su parte libre
+            available += sum(shard.quantity - shard.reserved_quantity for shard in self.shards.all())
+        return available
 
     @property
     def is_low_stock(self):
         """Verificar si el stock está bajo"""
         return self.available_quantity <= self.min_stock_level
 
+    def _update_stock(self, condition, quantity=0, reserved=0):
+        """
+        UPDATE condicional en una sola sentencia: la base de datos evalúa la
+        condición y aplica el cambio sobre la fila actual, así dos pedidos
+        simultáneos no pueden pasar la validación con el mismo valor leído.
+        Devuelve True si se actualizó la fila.
+        """
+        changes = {}
+        if quantity:
+            changes['quantity'] = models.F('quantity') + quantity
+        if reserved:
+            changes['reserved_quantity'] = models.F('reserved_quantity') + reserved
+        now = timezone.now()
+        updated = ItemStock.objects.filter(condition, pk=self.pk).update(updated_at=now, **changes)
+        if updated:
+            # La fila cumplió la condición: el mismo cambio en la copia en memoria, sin otro SELECT
+            self.quantity += quantity
+            self.reserved_quantity += reserved
+            self.updated_at = now
+        else:
+            # No alcanzó: releer para informar lo que realmente queda disponible
+            self.refresh_from_db(fields=['quantity', 'reserved_quantity', 'updated_at'])
+        return updated == 1
+
+    def _update_shards(self, operation, quantity):
+        """La misma operación sobre los contadores repartidos de un SKU muy disputado"""
+        from . import shards
+
+        done = getattr(shards, operation)(self.pk, quantity)
+        # La operación puede reescribir la fila principal: se recargan solo si se leen
+        for field in ('quantity', 'reserved_quantity', 'shard_count', 'updated_at'):
+            self.__dict__.pop(field, None)
+        getattr(self, '_prefetched_objects_cache', {}).pop('shards', None)
+        return done
+
     def reserve_stock(self, quantity):
         """Reservar stock para el carrito"""
-        if self.available_quantity >= quantity:
-            self.reserved_quantity += quantity
-            self.save()
-            return True
-        return False
+        if self.shard_count:
+            return self._update_shards('reserve', quantity)
+        return self._update_stock(models.Q(quantity__gte=models.F('reserved_quantity') + quantity), reserved=quantity)
 
     def release_stock(self, quantity):
         """Liberar stock reservado"""
-        if self.reserved_quantity >= quantity:
-            self.reserved_quantity -= quantity
-            self.save()
-            return True
-        return False
+        if self.shard_count:
+            return self._update_shards('release', quantity)
+        return self._update_stock(models.Q(reserved_quantity__gte=quantity), reserved=-quantity)
 
     def consume_stock(self, quantity):
         """Consumir stock (para órdenes confirmadas)"""
-        if self.available_quantity >= quantity:
-            self.quantity -= quantity
-            self.save()
-            return True
-        return False
+        if self.shard_count:
+            return self._update_shards('consume', quantity)
+        return self._update_stock(models.Q(quantity__gte=models.F('reserved_quantity') + quantity), quantity=-quantity)
 
     def add_stock(self, quantity):
         """Agregar stock"""
-        self.quantity += quantity
-        self.save()
+        self._update_stock(models.Q(), quantity=quantity)
 
     def save(self, *args, **kwargs):
         # Si no hay variante, crear un stock item por defecto para el producto
@@ -220,3 +373,99 @@ class ItemStock(models.Model):
             if existing.exists():
                 return  # No crear duplicados
         super().save(*args, **kwargs)
+
+
+class StockShard(models.Model):
+    """
+    Parte del stock de un SKU muy disputado: las reservas se reparten entre
+    varias filas para que no todas esperen el bloqueo de la misma fila.
+    """
+    stock_item = models.ForeignKey(ItemStock, on_delete=models.CASCADE, related_name='shards', verbose_name="Stock")
+    index = models.PositiveSmallIntegerField(verbose_name="Número de shard")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Cantidad asignada")
+    reserved_quantity = models.PositiveIntegerField(default=0, verbose_name="Cantidad reservada")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
+
+    class Meta:
+        verbose_name = "Shard de stock"
+        verbose_name_plural = "Shards de stock"
+        unique_together = ['stock_item', 'index']
+        ordering = ['stock_item', 'index']
+
+    def __str__(self):
+        return f"{self.stock_item} #{self.index} ({self.reserved_quantity}/{self.quantity})"
+
+
+class ProductListing(models.Model):
+    """
+    Modelo de lectura para las tarjetas de los listados: una fila por producto
+    activo con todo lo que muestra la tarjeta (ver catalog/listings.py).
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='listing', verbose_name="Producto")
+    name = models.CharField(max_length=200, verbose_name="Nombre")
+    slug = models.SlugField(max_length=200, verbose_name="Slug")
+    summary = models.CharField(max_length=300, blank=True, verbose_name="Resumen")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Precio")
+    original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Precio original")
+    discount_percentage = models.GeneratedField(
+        expression=discount_expression(),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+        verbose_name="Porcentaje de descuento",
+    )
+    is_featured = models.BooleanField(default=False, verbose_name="Destacado")
+    stock = models.PositiveIntegerField(default=0, verbose_name="Stock")
+    category_id = models.IntegerField(db_index=True, verbose_name="Categoría")
+    category_name = models.CharField(max_length=100, verbose_name="Nombre de la categoría")
+    # Imagen principal (los mismos campos que usa ProductImage para armar sus URLs)
+    image_id = models.IntegerField(null=True, blank=True, verbose_name="Imagen principal")
+    image_name = models.CharField(max_length=255, blank=True, verbose_name="Archivo de la imagen")
+    image_hash = models.CharField(max_length=64, blank=True, verbose_name="Hash de la imagen")
+    image_alt = models.CharField(max_length=200, blank=True, verbose_name="Texto alternativo")
+    image_derivatives_ready = models.BooleanField(default=False, verbose_name="Miniaturas generadas")
+    created_at = models.DateTimeField(verbose_name="Fecha de creación")
+
+    class Meta:
+        verbose_name = "Listado de producto"
+        verbose_name_plural = "Listados de productos"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-product'], name='listing_created_idx'),
+            models.Index(fields=['price', 'product'], name='listing_price_idx'),
+            models.Index(fields=['name', 'product'], name='listing_name_idx'),
+            models.Index(fields=['is_featured', '-created_at'], name='listing_featured_idx'),
+            models.Index(
+                fields=['-discount_percentage', '-created_at', '-product'],
+                name='listing_offers_idx',
+                condition=models.Q(is_featured=True, discount_percentage__gt=0),
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def id(self):
+        return self.product_id
+
+    def get_absolute_url(self):
+        return reverse('catalog:product_detail', kwargs={'slug': self.slug})
+
+    def get_discount_percentage(self):
+        if self.has_discount():
+            return int(self.discount_percentage)
+        return 0
+
+    def has_discount(self):
+        return self.is_featured and self.discount_percentage > 0
+
+    @cached_property
+    def main_image(self):
+        """ProductImage sin consultar la base de datos, solo para armar URLs en la plantilla"""
+        if self.image_id is None:
+            return None
+        return ProductImage(
+            pk=self.image_id, product_id=self.product_id, image=self.image_name or None,
+            content_hash=self.image_hash, alt_text=self.image_alt,
+            derivatives_ready=self.image_derivatives_ready,
+        )
@@ -0,0 +1,192 @@
+"""
+Paginación por cursor (keyset) para listados.
+
+En lugar de ``OFFSET`` + ``COUNT(*)`` cada página se obtiene con un filtro
+sobre los valores de ordenamiento de la última fila vista, por lo que la
+página 5000 cuesta lo mismo que la página 1. Los cursores son tokens
+firmados y opacos para el cliente.
+"""
+import json
+
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    """Página de resultados; se comporta como ``django.core.paginator.Page`` en las plantillas"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], 'prev')
+
+    @property
+    def estimated_count(self):
+        return self.paginator.estimated_count
+
+    @property
+    def count_is_estimate(self):
+        return self.paginator.count_is_estimate
+
+
+class KeysetPaginator:
+    """
+    Paginador por cursor sobre un queryset.
+
+    ``ordering`` es la lista de campos (o anotaciones) del ``order_by``,
+    por ejemplo ``['-created_at', '-id']``. Si no termina en la clave
+    primaria se agrega para desempatar.
+    """
+
+    def __init__(self, queryset, per_page, ordering, with_estimate=False):
+        ordering = list(ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.with_estimate = with_estimate
+        self._estimated_count = None
+
+    @property
+    def fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _output_field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        opts = self.queryset.model._meta
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        if field.generated:
+            return field.output_field
+        return field
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            values.append(None if value is None else str(value))
+        return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, raw_values = signing.loads(cursor, salt=CURSOR_SALT)
+            if direction not in ('next', 'prev') or len(raw_values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            values = [
+                None if raw is None else self._output_field(name).to_python(raw)
+                for (name, _), raw in zip(self.fields, raw_values)
+            ]
+        except (signing.BadSignature, ValueError, TypeError) as e:
+            raise InvalidCursor(cursor) from e
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Filtro "(a, b, id) > (va, vb, vid)" respetando la dirección de cada campo"""
+        fields = self.fields
+        condition = Q()
+        for i, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j in range(i):
+                term &= Q(**{fields[j][0]: values[j]})
+            condition |= term
+        # Cota no estricta sobre el primer campo para que el planificador use el índice
+        first, descending = fields[0]
+        lookup = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{first}__{lookup}': values[0]}) & condition
+
+    def get_page(self, cursor=None):
+        """Obtener la página indicada por el cursor; un cursor inválido devuelve la primera"""
+        direction, values = 'next', None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = 'next', None
+
+        forward = direction == 'next'
+        if forward:
+            ordering = self.ordering
+        else:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if forward:
+            return KeysetPage(rows, self, has_next=has_more, has_previous=values is not None)
+        rows.reverse()
+        return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+
+    @property
+    def estimated_count(self):
+        """Total aproximado (estimación del planificador en PostgreSQL)"""
+        if not self.with_estimate:
+            return None
+        if self._estimated_count is None:
+            self._estimated_count = estimate_count(self.queryset)
+        return self._estimated_count
+
+    @property
+    def count_is_estimate(self):
+        """True si ``estimated_count`` sale del planificador y no de un ``COUNT(*)``"""
+        return connections[self.queryset.db].vendor == 'postgresql'
+
+
+def estimate_count(queryset):
+    """Usar ``EXPLAIN`` en PostgreSQL para evitar un ``COUNT(*)`` completo"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,240 @@
+"""
+Búsqueda de productos con índice de texto completo.
+
+Los textos se normalizan en Python (minúsculas, sin acentos y con un
+stemming ligero para español) y se guardan en ``Product.search_title`` y
+``Product.search_body``. Cada base de datos indexa esas columnas con su
+motor nativo:
+
+- PostgreSQL: columna ``search_vector`` (tsvector generada) con índice GIN.
+- SQLite: tabla virtual FTS5 ``catalog_product_fts`` (para pruebas locales).
+
+Cualquier otro motor usa la búsqueda con ``icontains`` de siempre.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+FTS_TABLE = 'catalog_product_fts'
+
+# Productos por UPDATE al guardar los documentos (index_products)
+INDEX_BATCH_SIZE = 500
+
+
+def fold(text):
+    """Pasar a minúsculas y quitar acentos ("Martíllos" -> "martillos")"""
+    text = unicodedata.normalize('NFKD', text or '').lower()
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def stem(token):
+    """Stemming ligero para español: quita plurales y la vocal final de género"""
+    if token.isdigit():
+        return token
+    if token.endswith('z'):
+        # La z final pasa a c, como en el plural: luz/luces -> luc, lapiz/lapices -> lapic
+        token = token[:-1] + 'c'
+    if len(token) <= 3:
+        return token
+    if token.endswith('es') and token[-3] not in 'aeiou':
+        token = token[:-2]
+    elif token.endswith('s'):
+        token = token[:-1]
+    if len(token) > 4 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Convertir un texto en la lista de términos indexables"""
+    return [stem(token) for token in TOKEN_RE.findall(fold(text))]
+
+
+def category_path(category):
+    """Nombres de la categoría y sus ancestros"""
+    names = []
+    while category is not None:
+        names.append(category.name)
+        category = category.parent
+    return names
+
+
+def build_document(product):
+    """Obtener (título, cuerpo) normalizados para indexar un producto"""
+    title = tokenize(f'{product.name} {product.sku}')
+    body = tokenize(' '.join(category_path(product.category) + [product.description]))
+    return ' '.join(title), ' '.join(body)
+
+
+class BaseSearchBackend:
+    """Búsqueda sin índice: filtro ``icontains`` sobre nombre, descripción y categoría"""
+
+    def setup(self, cursor):
+        pass
+
+    def teardown(self, cursor):
+        pass
+
+    def write(self, cursor, rows):
+        pass
+
+    def delete(self, cursor, product_ids):
+        pass
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def rank(self, query, id_column):
+        """Expresión de relevancia para el producto cuyo id está en ``id_column`` (otra tabla)"""
+        return Value(0.0, output_field=FloatField())
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector generado a partir de los campos normalizados + índice GIN"""
+
+    def setup(self, cursor):
+        cursor.execute(
+            "ALTER TABLE catalog_product ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple'::regconfig, coalesce(search_title, '')), 'A') || "
+            "setweight(to_tsvector('simple'::regconfig, coalesce(search_body, '')), 'B')"
+            ") STORED"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS catalog_product_search_vector_gin "
+            "ON catalog_product USING gin (search_vector)"
+        )
+
+    def teardown(self, cursor):
+        cursor.execute("DROP INDEX IF EXISTS catalog_product_search_vector_gin")
+        cursor.execute("ALTER TABLE catalog_product DROP COLUMN IF EXISTS search_vector")
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return super().search(queryset, query)
+        # Coincidencia por prefijo para que funcione mientras el usuario escribe
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(
+                "SELECT id FROM catalog_product WHERE search_vector @@ to_tsquery('simple', %s)",
+                [tsquery],
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                "ts_rank_cd(catalog_product.search_vector, to_tsquery('simple', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    def rank(self, query, id_column):
+        terms = tokenize(query)
+        if not terms:
+            return super().rank(query, id_column)
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return RawSQL(
+            "(SELECT ts_rank_cd(search_vector, to_tsquery('simple', %s)) "
+            f"FROM catalog_product WHERE id = {id_column})",
+            [tsquery],
+            output_field=FloatField(),
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """Tabla FTS5 con su propia copia de los documentos (solo para pruebas locales)"""
+
+    def setup(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(search_title, search_body)"
+        )
+
+    def teardown(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def write(self, cursor, rows):
+        self.delete(cursor, [row[0] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, search_title, search_body) VALUES (%s, %s, %s)",
+            rows,
+        )
+
+    def delete(self, cursor, product_ids):
+        for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+            chunk = product_ids[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return super().search(queryset, query)
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(search_rank=self.rank(query, 'catalog_product.id'))
+
+    def rank(self, query, id_column):
+        terms = tokenize(query)
+        if not terms:
+            return super().rank(query, id_column)
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        # bm25() devuelve valores menores para mejores coincidencias
+        return RawSQL(
+            f"(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {id_column})",
+            [match],
+            output_field=FloatField(),
+        )
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend(conn=None):
+    conn = conn or connection
+    return BACKENDS.get(conn.vendor, BaseSearchBackend)()
+
+
+def search_products(queryset, query):
+    """Filtrar un queryset de productos por texto y anotar ``search_rank``"""
+    return get_backend().search(queryset, query)
+
+
+def search_rank(query, id_column):
+    """Relevancia de ``query`` para filas de otra tabla que guardan el id del producto"""
+    return get_backend().rank(query, id_column)
+
+
+def index_products(products):
+    """Recalcular y guardar el documento de búsqueda de los productos dados"""
+    from .models import Product
+
+    backend = get_backend()
+    products = list(products)
+    rows = []
+    for product in products:
+        product.search_title, product.search_body = build_document(product)
+        rows.append((product.pk, product.search_title, product.search_body))
+    if rows:
+        Product.objects.bulk_update(products, ['search_title', 'search_body'], batch_size=INDEX_BATCH_SIZE)
+        with connection.cursor() as cursor:
+            backend.write(cursor, rows)
+    return len(rows)
+
+
+def unindex_products(product_ids):
+    with connection.cursor() as cursor:
+        get_backend().delete(cursor, list(product_ids))
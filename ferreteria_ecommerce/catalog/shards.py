@@ -0,0 +1,172 @@
+"""
+Contadores de stock repartidos para SKU muy disputados.
+
+En una venta relámpago cada "agregar al carrito" de un producto destacado
+actualiza la misma fila de ``ItemStock`` y el bloqueo de esa fila pone en
+cola a toda la tienda. Para los SKU designados (``python manage.py
+shard_stock``) las unidades se reparten entre K filas ``StockShard``: cada
+reserva toma al azar un shard con lugar que no esté bloqueado por otra
+transacción (``SKIP LOCKED``) y solo si ninguno alcanza vuelve a repartir
+todo bajo bloqueo. Así hasta K compradores reservan a la vez.
+
+Con shards activos:
+
+- ``reserved_quantity`` de la fila principal es la suma de
+  ``StockShard.quantity``: lo repartido figura como apartado;
+- lo que entra después (``add_stock``) queda libre en la fila principal
+  hasta el siguiente reparto;
+- el disponible real es el libre de la fila principal más el libre de cada
+  shard (``ItemStock.available_quantity``).
+
+``rebalance`` reparte todo en partes iguales; lo corre periódicamente
+``shard_stock --rebalance --loop``. Los caminos lentos bloquean siempre los
+shards en orden y después la fila principal.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ItemStock, StockShard
+
+
+def enable(stock_id, count):
+    """Repartir el stock del registro en ``count`` shards (o cambiar cuántos tiene)"""
+    with transaction.atomic():
+        shards = _lock(stock_id)
+        stock_item = ItemStock.objects.select_for_update().get(pk=stock_id)
+        held = sum(shard.reserved_quantity for shard in shards) if shards else stock_item.reserved_quantity
+
+        StockShard.objects.filter(stock_item_id=stock_id, index__gte=count).delete()
+        shards = shards[:count] + StockShard.objects.bulk_create([
+            StockShard(stock_item_id=stock_id, index=index) for index in range(len(shards), count)
+        ])
+        ItemStock.objects.filter(pk=stock_id).update(shard_count=count)
+        _distribute(stock_item, shards, stock_item.quantity, held)
+
+
+def disable(stock_id):
+    """Volver al contador en una sola fila"""
+    with transaction.atomic():
+        shards = _lock(stock_id)
+        ItemStock.objects.select_for_update().filter(pk=stock_id).update(
+            shard_count=0,
+            reserved_quantity=sum(shard.reserved_quantity for shard in shards),
+            updated_at=timezone.now(),
+        )
+        StockShard.objects.filter(stock_item_id=stock_id).delete()
+
+
+def reserve(stock_id, quantity):
+    """Reservar en un shard al azar con lugar; si ninguno alcanza, repartir de nuevo"""
+    with transaction.atomic():
+        shard = _pick(stock_id, Q(quantity__gte=F('reserved_quantity') + quantity))
+        if shard:
+            _update(shard, reserved_quantity=F('reserved_quantity') + quantity)
+            return True
+    return rebalance(stock_id, reserve=quantity)
+
+
+def release(stock_id, quantity):
+    """Liberar de cualquier shard que tenga esas unidades reservadas"""
+    with transaction.atomic():
+        shard = _pick(stock_id, Q(reserved_quantity__gte=quantity))
+        if shard:
+            _update(shard, reserved_quantity=F('reserved_quantity') - quantity)
+            return True
+    return rebalance(stock_id, release=quantity)
+
+
+def consume(stock_id, quantity):
+    """Descontar unidades vendidas de un shard con lugar y de la fila principal"""
+    with transaction.atomic():
+        shard = _pick(stock_id, Q(quantity__gte=F('reserved_quantity') + quantity))
+        if shard:
+            _update(shard, quantity=F('quantity') - quantity)
+            ItemStock.objects.filter(pk=stock_id).update(
+                quantity=F('quantity') - quantity,
+                reserved_quantity=F('reserved_quantity') - quantity,
+                updated_at=timezone.now(),
+            )
+            return True
+    return rebalance(stock_id, consume=quantity)
+
+
+def rebalance(stock_id, reserve=0, release=0, consume=0, reserved=None):
+    """
+    Bloquear el SKU completo y repartir en partes iguales lo reservado y lo
+    libre (incluido lo que entró en la fila principal). Opcionalmente aplica
+    en el mismo paso una reserva, liberación o venta que no entró en ningún
+    shard, o corrige el total reservado (``reserved``). Devuelve False si no
+    alcanza el stock; ahí no cambia nada.
+    """
+    with transaction.atomic():
+        shards = _lock(stock_id)
+        stock_item = ItemStock.objects.select_for_update().get(pk=stock_id)
+        if not shards:
+            # Se desactivaron los shards mientras tanto: operar sobre la fila principal
+            return _unsharded(stock_item, reserve, release, consume)
+
+        held = sum(shard.reserved_quantity for shard in shards) if reserved is None else reserved
+        held = max(held + reserve - release, 0)
+        quantity = stock_item.quantity - consume
+        if (reserve or consume) and held > quantity:
+            return False
+        _distribute(stock_item, shards, quantity, held)
+    return True
+
+
+def rebalance_all():
+    """Repartir de nuevo todos los SKU con shards; devuelve cuántos se revisaron"""
+    stock_ids = list(ItemStock.objects.filter(shard_count__gt=0).values_list('pk', flat=True))
+    for stock_id in stock_ids:
+        rebalance(stock_id)
+    return len(stock_ids)
+
+
+def _lock(stock_id):
+    return list(StockShard.objects.select_for_update().filter(stock_item_id=stock_id).order_by('index'))
+
+
+def _pick(stock_id, condition):
+    """Un shard al azar que cumpla la condición, salteando los bloqueados por otras transacciones"""
+    return (
+        StockShard.objects.select_for_update(skip_locked=True)
+        .filter(condition, stock_item_id=stock_id)
+        .order_by('?')
+        .first()
+    )
+
+
+def _update(shard, **changes):
+    StockShard.objects.filter(pk=shard.pk).update(updated_at=timezone.now(), **changes)
+
+
+def _share(total, parts, index):
+    """Parte ``index`` de ``total`` repartido en ``parts`` partes casi iguales"""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def _distribute(stock_item, shards, quantity, held):
+    """Escribir el reparto: ``held`` reservadas y el resto de ``quantity`` libre"""
+    now = timezone.now()
+    free = max(quantity - held, 0)
+    for index, shard in enumerate(shards):
+        shard.reserved_quantity = _share(held, len(shards), index)
+        shard.quantity = shard.reserved_quantity + _share(free, len(shards), index)
+        shard.updated_at = now
+    StockShard.objects.bulk_update(shards, ['quantity', 'reserved_quantity', 'updated_at'])
+    ItemStock.objects.filter(pk=stock_item.pk).update(
+        quantity=quantity,
+        reserved_quantity=sum(shard.quantity for shard in shards),
+        updated_at=now,
+    )
+
+
+def _unsharded(stock_item, reserve, release, consume):
+    if reserve:
+        return stock_item.reserve_stock(reserve)
+    if release:
+        return stock_item.release_stock(release)
+    if consume:
+        return stock_item.consume_stock(consume)
+    return True
@@ -0,0 +1,94 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Product, ProductImage
+from .listings import SOURCE_FIELDS, refresh_listings
+from .search import index_products, unindex_products
+from .thumbnails import delete_derivatives, schedule_derivatives
+from .tree import get_category_tree, invalidate_category_tree
+
+# Campos de Product que forman parte del documento de búsqueda
+SEARCH_FIELDS = {'name', 'sku', 'description', 'category'}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+def clear_category_tree(sender, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Product)
+def clear_category_tree_counts(sender, update_fields=None, **kwargs):
+    # Solo la categoría y el estado activo afectan los conteos del árbol
+    if update_fields is None or {'category', 'is_active'}.intersection(update_fields):
+        invalidate_category_tree()
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    unindex_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created=False, raw=False, **kwargs):
+    # Una categoría nueva aún no tiene productos
+    if raw or created:
+        return
+    products = Product.objects.filter(
+        category_id__in=get_category_tree().by_id[instance.pk].all_descendant_ids
+    ).select_related('category__parent')
+    index_products(list(products))
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    if raw or instance.derivatives_ready:
+        return
+    schedule_derivatives(instance)
+
+
+@receiver(post_delete, sender=ProductImage)
+def delete_image_files(sender, instance, **kwargs):
+    # Los archivos se comparten entre imágenes con el mismo contenido
+    if not instance.image or ProductImage.objects.filter(image=instance.image.name).exists():
+        return
+    delete_derivatives(instance.image.storage, instance.image.name)
+    instance.image.storage.delete(instance.image.name)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_listing(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not SOURCE_FIELDS.intersection(update_fields):
+        return
+    refresh_listings([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_listings(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    refresh_listings(Product.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_image_listing(sender, instance, raw=False, origin=None, **kwargs):
+    if raw:
+        return
+    # Imagen borrada en cascada con su producto o categoría: la fila del listado se va con el producto
+    deleted_from = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and deleted_from is not ProductImage:
+        return
+    refresh_listings([instance.product_id])
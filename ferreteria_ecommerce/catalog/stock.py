@@ -0,0 +1,145 @@
+"""
+Operaciones de stock por lotes.
+
+Cada función recibe {id de ItemStock: cantidad} y la aplica con un solo
+UPDATE agrupado (un ``CASE`` por id), en lugar de un ``get()`` y un UPDATE
+por línea del carrito. Antes de escribir, las filas se bloquean con
+``SELECT ... FOR UPDATE`` en orden de id: dos transacciones que tocan los
+mismos registros siempre los bloquean en el mismo orden y no pueden quedar
+esperándose entre sí.
+
+``reserve_many``, ``consume_many`` y ``settle_many`` son todo o nada: si alguna fila no
+alcanza no se modifica ninguna y devuelven False.
+
+Los SKU con shards (ver ``catalog/shards.py``) no entran en el UPDATE
+agrupado ni se bloquean: cada uno pasa por sus contadores repartidos.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import shards
+from .models import ItemStock
+
+
+def by_key(keys, lock=False):
+    """
+    {(id de producto, id de variante): ItemStock} para las claves dadas, en una
+    sola consulta. Con ``lock`` las filas quedan bloqueadas en orden de id
+    (debe llamarse dentro de una transacción); las de SKU con shards no se
+    bloquean, justamente para no volver a poner en cola a sus compradores.
+    """
+    lookup = Q()
+    for product_id, variant_id in keys:
+        lookup |= Q(product_id=product_id, variant_id=variant_id)
+    if not lookup:
+        return {}
+    rows = {(stock.product_id, stock.variant_id): stock for stock in ItemStock.objects.filter(lookup).order_by('pk')}
+    plain = [stock.pk for stock in rows.values() if not stock.shard_count]
+    if lock and plain:
+        for stock in ItemStock.objects.select_for_update().filter(pk__in=plain).order_by('pk'):
+            rows[(stock.product_id, stock.variant_id)] = stock
+    return rows
+
+
+def lock(stock_ids):
+    """Bloquear las filas de stock en orden de id"""
+    return list(ItemStock.objects.select_for_update().filter(pk__in=stock_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def reserve_many(amounts):
+    """
+    Reservar las cantidades dadas; las negativas liberan. Los aumentos solo se
+    aplican si hay stock disponible en todas las filas.
+    """
+    amount = _per_row(amounts)
+    releases = [pk for pk, quantity in amounts.items() if quantity <= 0]
+    return _apply(
+        amounts,
+        lambda stock_id, quantity: (
+            shards.reserve(stock_id, quantity) if quantity > 0 else shards.release(stock_id, -quantity)
+        ),
+        Q(pk__in=releases) | Q(quantity__gte=F('reserved_quantity') + amount),
+        reserved_quantity=Greatest(F('reserved_quantity') + amount, Value(0)),
+    )
+
+
+def release_many(amounts):
+    """
+    Liberar las cantidades reservadas dadas. Un contador desfasado no bloquea
+    la liberación: nunca baja de 0 (``resync_reserved_quantities`` lo corrige).
+    """
+    amount = _per_row(amounts)
+    return _apply(
+        amounts,
+        shards.release,
+        Q(),
+        reserved_quantity=Greatest(F('reserved_quantity') - amount, Value(0)),
+    )
+
+
+def consume_many(amounts):
+    """Descontar del stock las cantidades vendidas (sin tocar unidades reservadas por otros)"""
+    amount = _per_row(amounts)
+    return _apply(
+        amounts,
+        shards.consume,
+        Q(quantity__gte=F('reserved_quantity') + amount),
+        quantity=F('quantity') - amount,
+    )
+
+
+def settle_many(amounts):
+    """
+    Vender unidades reservadas (checkout): ``amounts`` es {id: (vendidas,
+    reservadas por el carrito)}. Libera la reserva y descuenta lo vendido en
+    el mismo UPDATE; falla si lo vendido no cabe en lo que queda libre.
+    """
+    sold = _per_row({pk: sold for pk, (sold, _) in amounts.items()})
+    held = _per_row({pk: held for pk, (_, held) in amounts.items()})
+    remaining = Greatest(F('reserved_quantity') - held, Value(0))
+    return _apply(
+        amounts,
+        _settle_sharded,
+        Q(quantity__gte=remaining + sold),
+        quantity=F('quantity') - sold,
+        reserved_quantity=remaining,
+    )
+
+
+def _settle_sharded(stock_id, amounts):
+    sold, held = amounts
+    return (not held or shards.release(stock_id, held)) and (not sold or shards.consume(stock_id, sold))
+
+
+def _per_row(amounts):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in amounts.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _apply(amounts, sharded_operation, condition, **changes):
+    """
+    Bloquear las filas y aplicar el UPDATE condicional; las filas con shards
+    pasan por ``sharded_operation``. Si alguna no alcanza, no cambia nada.
+    """
+    amounts = {pk: quantity for pk, quantity in amounts.items() if quantity}
+    if not amounts:
+        return True
+    sharded = set(ItemStock.objects.filter(pk__in=amounts, shard_count__gt=0).values_list('pk', flat=True))
+    plain = [pk for pk in amounts if pk not in sharded]
+
+    with transaction.atomic():
+        if plain:
+            lock(plain)
+            updated = ItemStock.objects.filter(condition, pk__in=plain).update(updated_at=timezone.now(), **changes)
+            if updated != len(plain):
+                transaction.set_rollback(True)
+                return False
+        for stock_id in sorted(sharded):
+            if not sharded_operation(stock_id, amounts[stock_id]):
+                transaction.set_rollback(True)
+                return False
+    return True
@@ -0,0 +1,63 @@
+"""
+Almacenamiento direccionado por contenido para imágenes de productos.
+
+Cada archivo se guarda con el SHA-256 de su contenido como nombre::
+
+    products/3f/a2/3fa2...c9.jpg
+
+Subir la misma foto para varios productos (o variantes) reutiliza el
+mismo archivo y sus miniaturas, y como el contenido de una ruta nunca
+cambia sus URLs pueden cachearse indefinidamente.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def content_path(directory, digest, ext):
+    """Ruta dentro del storage para un hash: "products/3f/a2/<hash>.jpg" """
+    return os.path.join(directory, digest[:2], digest[2:4], f'{digest}{ext}')
+
+
+def hash_from_name(name):
+    """Extraer el hash de un nombre direccionado por contenido (None si es un nombre antiguo)"""
+    stem = os.path.splitext(os.path.basename(name or ''))[0]
+    return stem if HASH_RE.match(stem) else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage que nombra los archivos por su SHA-256 y no duplica contenido"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        name = content_path(directory, digest.hexdigest(), ext)
+        try:
+            return super().save(name, content, max_length=max_length)
+        except FileExistsError:
+            # Mismo contenido ya almacenado (quizás por otra petición simultánea)
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre depende solo del contenido: nunca renombrar
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+
+product_image_storage = ContentAddressedStorage()
@@ -0,0 +1,141 @@
+"""
+Derivados redimensionados de ProductImage (miniaturas responsive).
+
+Por cada imagen original se generan anchos fijos en WebP y JPEG,
+guardados junto al original::
+
+    products/3f/a2/<hash>.jpg
+    products/3f/a2/<hash>.thumb.webp   products/3f/a2/<hash>.thumb.jpg
+    products/3f/a2/<hash>.card.webp    products/3f/a2/<hash>.card.jpg
+    products/3f/a2/<hash>.detail.webp  products/3f/a2/<hash>.detail.jpg
+
+La generación corre en un pool de procesos en segundo plano para no
+bloquear la petición que sube la imagen.
+"""
+import atexit
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Ancho en píxeles de cada derivado
+PRESETS = {
+    'thumb': 150,
+    'card': 400,
+    'detail': 800,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+_executor = None
+
+
+def derivative_name(name, preset, fmt):
+    """Nombre del derivado dentro del storage ("products/a.jpg" -> "products/a.card.webp")"""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{preset}.{EXTENSIONS[fmt]}'
+
+
+def render_derivatives(source_path):
+    """
+    Generar todos los derivados de un archivo.
+
+    Se ejecuta dentro de los procesos del pool: solo usa Pillow y el
+    sistema de archivos, nunca la base de datos.
+    """
+    from PIL import Image, ImageOps
+
+    root, _ = os.path.splitext(source_path)
+    written = []
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+        for preset, width in PRESETS.items():
+            resized = original.copy()
+            # Nunca ampliar imágenes pequeñas
+            if resized.width > width:
+                height = round(resized.height * width / resized.width)
+                resized = resized.resize((width, height), Image.LANCZOS)
+            for fmt, (pil_format, options) in FORMATS.items():
+                target = f'{root}.{preset}.{EXTENSIONS[fmt]}'
+                image = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                image.save(target, pil_format, **options)
+                written.append(target)
+    return written
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2))
+        atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def mark_derivatives_ready(image_ids):
+    from .models import ProductImage, ProductListing
+
+    ProductImage.objects.filter(pk__in=image_ids).update(derivatives_ready=True)
+    ProductListing.objects.filter(image_id__in=image_ids).update(image_derivatives_ready=True)
+
+
+def _on_done(image_id, future):
+    # Se ejecuta en un hilo del pool, con su propia conexión a la base de datos
+    error = future.exception()
+    if error is not None:
+        logger.error('No se pudieron generar los derivados de la imagen %s: %s', image_id, error)
+        return
+    close_old_connections()
+    try:
+        mark_derivatives_ready([image_id])
+    finally:
+        connection.close()
+
+
+def schedule_derivatives(product_image):
+    """Encolar la generación de derivados cuando la transacción actual se confirme"""
+    from .models import ProductImage
+
+    if not product_image.image:
+        return
+    image_id = product_image.pk
+    # El mismo archivo ya subido para otro producto: sus derivados sirven
+    if ProductImage.objects.filter(image=product_image.image.name, derivatives_ready=True).exists():
+        mark_derivatives_ready([image_id])
+        product_image.derivatives_ready = True
+        return
+    source_path = product_image.image.path
+
+    def submit():
+        if not getattr(settings, 'THUMBNAIL_ASYNC', True):
+            render_derivatives(source_path)
+            mark_derivatives_ready([image_id])
+            return
+        future = get_executor().submit(render_derivatives, source_path)
+        future.add_done_callback(lambda f: _on_done(image_id, f))
+
+    transaction.on_commit(submit)
+
+
+def derivatives_exist(storage, name):
+    return all(
+        storage.exists(derivative_name(name, preset, fmt)) for preset in PRESETS for fmt in FORMATS
+    )
+
+
+def delete_derivatives(storage, name):
+    for preset in PRESETS:
+        for fmt in FORMATS:
+            derivative = derivative_name(name, preset, fmt)
+            if storage.exists(derivative):
+                storage.delete(derivative)
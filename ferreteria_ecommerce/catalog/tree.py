@@ -0,0 +1,148 @@
+"""
+Caché en memoria del árbol de categorías.
+
+El árbol completo (ids, slugs, rutas, descendientes y conteo de productos)
+se construye con una sola consulta y se guarda en el proceso. Se invalida
+al guardar o borrar categorías y productos (ver ``catalog/signals.py``) y
+además expira tras ``CATEGORY_TREE_TTL`` segundos para que los demás
+procesos del servidor también vean los cambios.
+
+Solo se guarda un árbol construido con datos confirmados: mientras el hilo
+tiene cambios de categorías o productos sin confirmar, cada consulta arma
+un árbol propio que no se comparte, y el árbol compartido se descarta al
+confirmar. Si la transacción se revierte no queda nada que limpiar.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.urls import reverse
+
+_lock = threading.Lock()
+_tree = None
+# Por hilo: invalidó el árbol dentro de una transacción que todavía no se confirmó
+_pending = threading.local()
+
+
+class CategoryNode:
+    """Categoría del árbol; expone los mismos atributos que usan las plantillas"""
+
+    def __init__(self, id, name, slug, description, parent_id, is_active, own_product_count):
+        self.id = self.pk = id
+        self.name = name
+        self.slug = slug
+        self.description = description
+        self.parent_id = parent_id
+        self.is_active = is_active
+        self.own_product_count = own_product_count
+        self.parent = None
+        self.children = []
+        # Se completan al construir el árbol; descendant_ids solo incluye subcategorías activas
+        self.path = []
+        self.descendant_ids = frozenset()
+        self.all_descendant_ids = frozenset()
+        self.product_count = 0
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f'<CategoryNode {self.slug}>'
+
+    def get_absolute_url(self):
+        return reverse('catalog:category_detail', kwargs={'slug': self.slug})
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.built_at = time.monotonic()
+        self.by_id = {row['id']: CategoryNode(**row) for row in rows}
+        self.by_slug = {node.slug: node for node in self.by_id.values()}
+        self.roots = []
+        for node in self.by_id.values():
+            parent = self.by_id.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                node.parent = parent
+                parent.children.append(node)
+        for root in self.roots:
+            self._walk(root, [])
+
+    def _walk(self, node, path):
+        """Calcular ruta, descendientes y conteos; las categorías inactivas ocultan su subárbol"""
+        node.path = path + [node]
+        descendant_ids = {node.id}
+        all_descendant_ids = {node.id}
+        product_count = node.own_product_count
+        for child in node.children:
+            self._walk(child, node.path)
+            all_descendant_ids |= child.all_descendant_ids
+            if child.is_active:
+                descendant_ids |= child.descendant_ids
+                product_count += child.product_count
+        node.children = [child for child in node.children if child.is_active]
+        node.descendant_ids = frozenset(descendant_ids)
+        node.all_descendant_ids = frozenset(all_descendant_ids)
+        node.product_count = product_count
+
+    def get(self, slug):
+        """Categoría activa (y con todos sus ancestros activos) por slug, o None"""
+        node = self.by_slug.get(slug)
+        if node is None or not all(ancestor.is_active for ancestor in node.path):
+            return None
+        return node
+
+    def active(self):
+        """Categorías visibles, ordenadas por nombre"""
+        nodes = [node for node in self.by_id.values() if self.get(node.slug) is not None]
+        return sorted(nodes, key=lambda node: node.name)
+
+    def active_roots(self):
+        return sorted((node for node in self.roots if node.is_active), key=lambda node: node.name)
+
+
+def build_category_tree():
+    from .models import Category
+
+    rows = Category.objects.annotate(
+        own_product_count=Count('products', filter=Q(products__is_active=True))
+    ).values('id', 'name', 'slug', 'description', 'parent_id', 'is_active', 'own_product_count')
+    return CategoryTree(rows)
+
+
+def get_category_tree():
+    global _tree
+    if getattr(_pending, 'changes', False):
+        if transaction.get_connection().in_atomic_block:
+            return build_category_tree()
+        # La transacción se revirtió (on_commit nunca corrió)
+        _pending.changes = False
+    tree = _tree
+    ttl = getattr(settings, 'CATEGORY_TREE_TTL', 60)
+    if tree is not None and time.monotonic() - tree.built_at < ttl:
+        return tree
+    with _lock:
+        if _tree is tree:
+            _tree = build_category_tree()
+        return _tree
+
+
+def _clear():
+    global _tree
+    _tree = None
+
+
+def _committed():
+    _pending.changes = False
+    _clear()
+
+
+def invalidate_category_tree():
+    """Descartar el árbol ahora y de nuevo al confirmar la transacción en curso"""
+    _clear()
+    if transaction.get_connection().in_atomic_block:
+        _pending.changes = True
+        transaction.on_commit(_committed)
@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import api, views
 
 app_name = 'catalog'
 
@@ -9,5 +9,8 @@ urlpatterns = [
     path('offers/', views.offers, name='offers'),
     path('product/<slug:slug>/', views.product_detail, name='product_detail'),
     path('category/<slug:slug>/', views.category_detail, name='category_detail'),
+    path('api/availability/', api.availability, name='api_availability'),
     path('image/<int:image_id>/', views.product_image, name='product_image'),
+    re_path(r'^images/(?P<digest>[0-9a-f]{64})/$', views.image_content, name='image_content'),
+    re_path(r'^images/(?P<digest>[0-9a-f]{64})/(?P<preset>\w+)\.(?P<fmt>\w+)$', views.image_content, name='image_content_derivative'),
 ]
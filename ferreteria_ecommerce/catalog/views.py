@@ -1,14 +1,26 @@
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
-from django.db.models import Q, F
-from django.http import HttpResponse
-from .models import Category, Product, ProductImage
+from django.http import Http404
+from .facets import FacetSelection, apply_facets, build_facets
+from .files import file_sha256, serve_file
+from .listings import listings_for
+from .models import Product, ProductImage, ProductListing
+from .search import search_products
+from .pagination import KeysetPaginator
+from .thumbnails import FORMATS, PRESETS, derivative_name
+from .tree import get_category_tree
+
+
+def _get_category_or_404(tree, slug):
+    category = tree.get(slug)
+    if category is None:
+        raise Http404
+    return category
 
 
 def home(request):
     """Vista de la página de inicio"""
-    featured_products = Product.objects.filter(is_featured=True, is_active=True)[:8]
-    categories = Category.objects.filter(is_active=True, parent=None)[:6]
+    featured_products = ProductListing.objects.filter(is_featured=True)[:8]
+    categories = get_category_tree().active_roots()[:6]
     
     context = {
         'featured_products': featured_products,
@@ -18,43 +30,51 @@ def home(request):
 
 
 def product_list(request):
-    """Lista de productos con filtros"""
+    """Lista de productos con filtros y facetas"""
     products = Product.objects.filter(is_active=True)
+    listings = ProductListing.objects.all()
     category_slug = request.GET.get('category')
     search_query = request.GET.get('q')
     
+    tree = get_category_tree()
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug, is_active=True)
-        products = products.filter(category=category)
+        # Incluir los productos de las subcategorías
+        category = _get_category_or_404(tree, category_slug)
+        products = products.filter(category_id__in=category.descendant_ids)
+        listings = listings.filter(category_id__in=category.descendant_ids)
     
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
+        products = search_products(products, search_query)
+    
+    # Facetas: conteos sobre el resultado actual y luego los filtros marcados
+    selection = FacetSelection.from_query(request.GET)
+    facets = build_facets(products, selection)
+    if search_query or selection.is_active:
+        listings = listings_for(apply_facets(products, selection), search_query)
     
     # Ordenamiento - por defecto mostrar los más recientes primero
     sort_by = request.GET.get('sort', 'newest')
-    if sort_by == 'price_low':
-        products = products.order_by('price')
+    if sort_by == 'relevance' and search_query:
+        ordering = ['-search_rank', '-created_at', '-pk']
+    elif sort_by == 'price_low':
+        ordering = ['price', 'pk']
     elif sort_by == 'price_high':
-        products = products.order_by('-price')
+        ordering = ['-price', '-pk']
     elif sort_by == 'name':
-        products = products.order_by('name')
+        ordering = ['name', 'pk']
     else:  # newest por defecto
-        products = products.order_by('-created_at')
+        ordering = ['-created_at', '-pk']
     
-    # Paginación
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor
+    paginator = KeysetPaginator(listings, 12, ordering)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
-    categories = Category.objects.filter(is_active=True)
+    categories = tree.active()
     
     context = {
         'page_obj': page_obj,
         'categories': categories,
+        'facets': facets,
         'current_category': category_slug,
         'search_query': search_query,
         'sort_by': sort_by,
@@ -67,55 +87,52 @@ def offers(request):
     # Filtro por categoría
     category_slug = request.GET.get('category')
     current_category = None
+    tree = get_category_tree()
     
     if category_slug:
-        # Si se selecciona una categoría específica, mostrar todos los productos de esa categoría
+        # Si se selecciona una categoría específica, mostrar todos los productos de esa categoría y sus subcategorías
         current_category = category_slug
-        category = get_object_or_404(Category, slug=category_slug, is_active=True)
-        products = Product.objects.filter(category=category, is_active=True)
+        category = _get_category_or_404(tree, category_slug)
+        products = Product.objects.filter(category_id__in=category.descendant_ids, is_active=True)
+        listings = ProductListing.objects.filter(category_id__in=category.descendant_ids)
     else:
         # Si no se selecciona categoría (Todas las Ofertas), mostrar solo productos con descuento
         products = Product.objects.filter(
             is_active=True,
             is_featured=True,
-            original_price__isnull=False,
-            original_price__gt=F('price')
+            discount_percentage__gt=0
         )
+        listings = ProductListing.objects.filter(is_featured=True, discount_percentage__gt=0)
     
     # Búsqueda
     search_query = request.GET.get('q')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__name__icontains=search_query)
-        )
+        listings = listings_for(search_products(products, search_query), search_query)
     
     # Ordenamiento
     sort_by = request.GET.get('sort', 'newest' if category_slug else 'discount')
-    if sort_by == 'price_low':
-        products = products.order_by('price')
+    if sort_by == 'relevance' and search_query:
+        ordering = ['-search_rank', '-created_at', '-pk']
+    elif sort_by == 'price_low':
+        ordering = ['price', 'pk']
     elif sort_by == 'price_high':
-        products = products.order_by('-price')
+        ordering = ['-price', '-pk']
     elif sort_by == 'name':
-        products = products.order_by('name')
+        ordering = ['name', 'pk']
     elif sort_by == 'newest':
-        products = products.order_by('-created_at')
+        ordering = ['-created_at', '-pk']
     elif sort_by == 'discount' and not category_slug:
-        # Solo aplicar ordenamiento por descuento si no hay categoría seleccionada
-        products = products.annotate(
-            discount_percentage=((F('original_price') - F('price')) / F('original_price') * 100)
-        ).order_by('-discount_percentage', '-created_at')
+        # Solo aplicar ordenamiento por descuento si no hay categoría seleccionada (usa listing_offers_idx)
+        ordering = ['-discount_percentage', '-created_at', '-pk']
     else:
         # Por defecto, ordenar por más recientes
-        products = products.order_by('-created_at')
+        ordering = ['-created_at', '-pk']
     
-    # Paginación
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor
+    paginator = KeysetPaginator(listings, 12, ordering)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
-    categories = Category.objects.filter(is_active=True)
+    categories = tree.active()
     
     context = {
         'page_obj': page_obj,
@@ -136,32 +153,30 @@ def offers(request):
 
 def product_detail(request, slug):
     """Detalle de un producto"""
-    product = get_object_or_404(Product, slug=slug, is_active=True)
+    product = get_object_or_404(Product.objects.with_main_image(), slug=slug, is_active=True)
     
     # Obtener productos relacionados de la misma categoría
-    same_category_products = Product.objects.filter(
+    related_ids = list(Product.objects.filter(
         category=product.category,
         is_active=True
-    ).exclude(id=product.id)[:3]
+    ).exclude(id=product.id).values_list('id', flat=True)[:3])
     
     # Obtener productos destacados de otras categorías
-    featured_products = Product.objects.filter(
+    related_ids += Product.objects.filter(
         is_featured=True,
         is_active=True
-    ).exclude(id=product.id).exclude(category=product.category)[:2]
-    
-    # Combinar productos relacionados
-    related_products = list(same_category_products) + list(featured_products)
+    ).exclude(id=product.id).exclude(category=product.category).values_list('id', flat=True)[:2]
     
     # Si no hay suficientes productos relacionados, agregar productos recientes
-    if len(related_products) < 4:
-        recent_products = Product.objects.filter(
+    if len(related_ids) < 4:
+        related_ids += Product.objects.filter(
             is_active=True
-        ).exclude(id=product.id).exclude(id__in=[p.id for p in related_products])[:4-len(related_products)]
-        related_products.extend(recent_products)
+        ).exclude(id=product.id).exclude(id__in=related_ids).values_list('id', flat=True)[:4-len(related_ids)]
     
-    # Limitar a 4 productos
-    related_products = related_products[:4]
+    # Limitar a 4 productos y leer sus tarjetas del modelo de lectura en una sola consulta
+    related_ids = related_ids[:4]
+    listings_by_id = ProductListing.objects.in_bulk(related_ids)
+    related_products = [listings_by_id[product_id] for product_id in related_ids if product_id in listings_by_id]
     
     context = {
         'product': product,
@@ -172,32 +187,32 @@ def product_detail(request, slug):
 
 def category_detail(request, slug):
     """Detalle de una categoría"""
-    category = get_object_or_404(Category, slug=slug, is_active=True)
-    products = Product.objects.filter(category=category, is_active=True)
+    category = _get_category_or_404(get_category_tree(), slug)
+    # Productos de la categoría y de todas sus subcategorías activas
+    listings = ProductListing.objects.filter(category_id__in=category.descendant_ids)
     
     # Búsqueda dentro de la categoría
     search_query = request.GET.get('q')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = Product.objects.filter(category_id__in=category.descendant_ids, is_active=True)
+        listings = listings_for(search_products(products, search_query), search_query)
     
     # Ordenamiento - por defecto mostrar los más recientes primero
     sort_by = request.GET.get('sort', 'newest')
-    if sort_by == 'price_low':
-        products = products.order_by('price')
+    if sort_by == 'relevance' and search_query:
+        ordering = ['-search_rank', '-created_at', '-pk']
+    elif sort_by == 'price_low':
+        ordering = ['price', 'pk']
     elif sort_by == 'price_high':
-        products = products.order_by('-price')
+        ordering = ['-price', '-pk']
     elif sort_by == 'name':
-        products = products.order_by('name')
+        ordering = ['name', 'pk']
     else:  # newest por defecto
-        products = products.order_by('-created_at')
+        ordering = ['-created_at', '-pk']
     
-    # Paginación
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor
+    paginator = KeysetPaginator(listings, 12, ordering, with_estimate=True)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'category': category,
@@ -208,13 +223,57 @@ def category_detail(request, slug):
     return render(request, 'catalog/category_detail.html', context)
 
 
-def product_image(request, image_id):
-    """Vista para servir imágenes desde la base de datos"""
+def _serve_product_image(request, product_image, preset=None, fmt=None, immutable=False):
+    storage = product_image.image.storage
+    name = product_image.image.name
+    etag = product_image.content_hash
+    if preset is not None:
+        if preset not in PRESETS or fmt not in FORMATS:
+            raise Http404
+        if not product_image.derivatives_ready:
+            # Aún no hay derivados: la original, sin cache de larga duración
+            immutable = False
+        else:
+            name = derivative_name(name, preset, fmt)
+            etag = f'{etag}.{preset}.{fmt}'
     try:
-        product_image = get_object_or_404(ProductImage, id=image_id)
-        response = HttpResponse(product_image.image_data, content_type=product_image.image_type)
-        response['Content-Disposition'] = f'inline; filename="{product_image.filename}"'
-        return response
-    except Exception as e:
-        # Retornar una imagen por defecto o error 404
-        return HttpResponse(status=404)
+        return serve_file(request, storage, name, etag, immutable=immutable)
+    except OSError:
+        # Fila sin archivo en el storage (FileNotFoundError incluido)
+        raise Http404
+
+
+def product_image(request, image_id):
+    """Servir la imagen de un ProductImage por id (se revalida con ETag/Last-Modified)"""
+    product_image = get_object_or_404(
+        ProductImage.objects.only('image', 'content_hash', 'derivatives_ready'), id=image_id
+    )
+    if not product_image.image:
+        raise Http404
+    if not product_image.content_hash:
+        # Imágenes anteriores al hash: se calcula una vez y se guarda
+        try:
+            product_image.content_hash = file_sha256(product_image.image)
+        except OSError:
+            raise Http404
+        ProductImage.objects.filter(pk=product_image.pk).update(content_hash=product_image.content_hash)
+    return _serve_product_image(request, product_image)
+
+
+def image_content(request, digest, preset=None, fmt=None):
+    """
+    Servir una imagen (o uno de sus derivados) por el SHA-256 de su contenido.
+
+    El contenido de estas URLs nunca cambia, así que se cachean por un año
+    y la misma foto usada en varios productos se descarga una sola vez.
+    """
+    product_image = (
+        ProductImage.objects.filter(content_hash=digest)
+        .exclude(image='')
+        .only('image', 'content_hash', 'derivatives_ready')
+        .order_by('-derivatives_ready')
+        .first()
+    )
+    if product_image is None:
+        raise Http404
+    return _serve_product_image(request, product_image, preset, fmt, immutable=True)
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'cart.middleware.CartCookieMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -66,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cart.context_processors.cart',
             ],
         },
     },
@@ -132,6 +134,40 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Miniaturas de ProductImage (catalog/thumbnails.py)
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Segundos que cada proceso conserva el árbol de categorías en memoria (catalog/tree.py)
+CATEGORY_TREE_TTL = 60
+
+# Caché compartida; guarda el id del carrito de cada cookie (cart/store.py).
+# Con varios procesos en producción conviene Redis:
+#     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#     'LOCATION': 'redis://127.0.0.1:6379/1',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ferreteria',
+    }
+}
+
+# Caché donde se guardan las versiones de las tablas de cupones y promociones
+# (promotions/versions.py). Debe ser compartida entre procesos; con DEBUG = False
+# una LocMemCache es un error del chequeo del sistema (promotions.E001).
+PROMOTIONS_VERSION_CACHE = 'default'
+
+# Carrito identificado por cookie firmada, sin sesión (cart/store.py)
+CART_COOKIE_NAME = 'cart_id'
+CART_COOKIE_AGE = 60 * 60 * 24 * 30
+CART_CACHE_TIMEOUT = 60 * 60
+
+# Segundos que se mantiene reservado el stock de un carrito sin actividad (cart/reservations.py)
+CART_RESERVATION_TTL = 30 * 60
+
+# Segundos que se recuerda la orden creada por cada clave de checkout (orders/idempotency.py)
+CHECKOUT_KEY_TTL = 24 * 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
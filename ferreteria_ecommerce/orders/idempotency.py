@@ -0,0 +1,75 @@
+"""
+Claves de idempotencia del checkout.
+
+El formulario de ``checkout.html`` lleva una clave aleatoria nueva en cada
+carga. Al confirmar, la clave se inserta (por sesión) en la misma
+transacción que crea la orden:
+
+- si la orden se crea, la clave queda apuntando a ella y cualquier reenvío
+  del mismo formulario redirige a esa orden sin tocar el stock ni el carrito;
+- si dos envíos llegan a la vez, el segundo espera en el índice único hasta
+  que el primero confirme, falla con ``IntegrityError`` y redirige a la orden;
+- si el checkout falla (por ejemplo, sin stock) la transacción se revierte,
+  la clave desaparece y el comprador puede volver a intentar.
+
+Las claves vencen tras ``CHECKOUT_KEY_TTL``; las borra por lotes
+``python manage.py purge_checkout_keys``.
+"""
+import re
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CheckoutKey
+
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'CHECKOUT_KEY_TTL', 24 * 60 * 60))
+
+
+def new_key():
+    return secrets.token_urlsafe(32)
+
+
+def clean_key(value):
+    """Clave enviada por el formulario, o None si falta o no tiene el formato esperado"""
+    return value if value and KEY_PATTERN.match(value) else None
+
+
+def completed_order(session_key, key):
+    """Número de la orden ya creada con esta clave (None si todavía no hay)"""
+    if not session_key or not key:
+        return None
+    return (
+        CheckoutKey.objects.filter(session_key=session_key, key=key, order__isnull=False)
+        .values_list('order__order_number', flat=True).first()
+    )
+
+
+def claim(session_key, key):
+    """
+    Registrar la clave antes de crear la orden; debe llamarse dentro de la
+    transacción del checkout. Lanza ``IntegrityError`` si otro envío ya la usó.
+    """
+    return CheckoutKey.objects.create(session_key=session_key, key=key, expires_at=timezone.now() + key_ttl())
+
+
+def complete(checkout_key, order):
+    CheckoutKey.objects.filter(pk=checkout_key.pk).update(order=order)
+
+
+def purge_expired(batch_size=1000, now=None):
+    """Borrar las claves vencidas por lotes; devuelve cuántas se borraron"""
+    now = now or timezone.now()
+    purged = 0
+    while True:
+        ids = list(CheckoutKey.objects.filter(expires_at__lte=now).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += CheckoutKey.objects.filter(pk__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            return purged
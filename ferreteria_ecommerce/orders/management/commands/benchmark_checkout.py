@@ -0,0 +1,130 @@
+import secrets
+import statistics
+import time
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from cart import reservations
+from cart.models import Cart
+from catalog.models import Category, ItemStock, Product
+from orders import placement
+from orders.models import Order, OrderItem
+from promotions.rules import get_promotion_engine
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_place_order(cart, order):
+    """Checkout anterior: un INSERT por línea y dos guardados de la fila de stock por línea"""
+    cart_items = list(cart.items.all())
+    cart.recalculate_totals()
+    order.subtotal = cart.get_total()
+    order.total = order.subtotal - order.discount
+    order.save()
+    for cart_item in cart_items:
+        OrderItem.objects.create(
+            order=order, product=cart_item.product, variant=cart_item.variant,
+            quantity=cart_item.quantity, price=cart_item.price, total=cart_item.get_total(),
+        )
+        stock_item = ItemStock.objects.get(product=cart_item.product, variant=cart_item.variant)
+        stock_item.release_stock(cart_item.quantity)
+        if not stock_item.consume_stock(cart_item.quantity):
+            transaction.set_rollback(True)
+            return False
+    cart.clear()
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Medir la latencia y las consultas del checkout según la cantidad de líneas del carrito'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,30,100', help='Líneas por carrito, separadas por coma')
+        parser.add_argument('--repeat', type=int, default=5, help='Checkouts por tamaño y método')
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Medir también el checkout anterior (una consulta por línea) para comparar',
+        )
+
+    def checkout(self, place, products, session, size):
+        """Llenar un carrito con ``size`` líneas reservadas y confirmarlo; devuelve (ms, consultas)"""
+        cart = Cart.objects.create(token=secrets.token_urlsafe(32))
+        reservations.add_quantities(cart, {(product.pk, None): (1, product.price) for product in products[:size]})
+        order = Order(
+            session=session, customer_name='Benchmark', customer_email='benchmark@example.com',
+            customer_phone='0', shipping_address='-', shipping_city='-', shipping_state='-',
+            shipping_zip_code='0', discount=0,
+        )
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                placed = place(cart, order)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not placed:
+            raise CommandError(f'✗ El checkout de {size} líneas falló')
+        return elapsed, len(queries)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(value) for value in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes debe ser una lista de enteros, por ejemplo 1,10,30')
+        if any(size < 1 for size in sizes):
+            raise CommandError('Cada tamaño de carrito debe ser al menos 1')
+
+        methods = [('Por lotes', placement.place_order)]
+        if options['legacy']:
+            methods.append(('Por línea', legacy_place_order))
+
+        results = []
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        try:
+            with transaction.atomic():
+                store = SessionStore()
+                store.create()
+                session = Session.objects.get(session_key=store.session_key)
+                category = Category.objects.create(name='Benchmark checkout', slug='benchmark-checkout')
+                # Cada checkout vende 1 unidad por línea y el stock se repone después de cada serie
+                stock = options['repeat']
+                products = Product.objects.bulk_create([
+                    Product(
+                        name=f'Producto checkout {i}', slug=f'benchmark-checkout-{i}', sku=f'BENCH-CO-{i}',
+                        description='-', price=100 + i, stock=stock, category=category,
+                    )
+                    for i in range(max(sizes))
+                ])
+                ItemStock.objects.bulk_create([ItemStock(product=product, quantity=stock) for product in products])
+                # El evaluador de promociones se compila una vez por proceso: no contarlo en el primer checkout
+                get_promotion_engine()
+
+                for size in sizes:
+                    for label, place in methods:
+                        samples = [self.checkout(place, products, session, size) for _ in range(options['repeat'])]
+                        results.append({
+                            'size': size,
+                            'label': label,
+                            'ms': statistics.median(ms for ms, _ in samples),
+                            'queries': max(count for _, count in samples),
+                        })
+                        ItemStock.objects.filter(product__category=category).update(quantity=stock, reserved_quantity=0)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS (mediana por checkout)')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'{"Líneas":>7} {"Método":<12} {"ms":>9} {"Consultas":>10}')
+        for r in results:
+            self.stdout.write(f'{r["size"]:>7} {r["label"]:<12} {r["ms"]:>9.1f} {r["queries"]:>10}')
+
+        batched = [r['queries'] for r in results if r['label'] == 'Por lotes']
+        if max(batched) != min(batched):
+            raise CommandError(f'✗ El checkout por lotes hizo entre {min(batched)} y {max(batched)} consultas según el tamaño')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ El checkout hace {batched[0]} consultas sin importar las líneas del carrito'))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from orders.idempotency import purge_expired
+from orders.models import CheckoutKey
+
+
+class Command(BaseCommand):
+    help = 'Borrar las claves de idempotencia del checkout vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Claves borradas por consulta',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SEGUNDOS',
+            help='Seguir ejecutándose y revisar cada SEGUNDOS (modo worker)',
+        )
+
+    def sweep(self, batch_size):
+        purged = purge_expired(batch_size=batch_size)
+        if purged:
+            self.stdout.write(f'[{timezone.now():%H:%M:%S}] Claves vencidas borradas: {purged}')
+        return purged
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['loop']:
+            self.stdout.write(f'Revisando claves vencidas cada {options["loop"]} s (Ctrl+C para salir)...')
+            try:
+                while True:
+                    close_old_connections()
+                    self.sweep(batch_size)
+                    time.sleep(options['loop'])
+            except KeyboardInterrupt:
+                self.stdout.write('\nDetenido.')
+            return
+
+        purged = self.sweep(batch_size)
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'Claves borradas: {purged}')
+        self.stdout.write(f'Claves vigentes: {CheckoutKey.objects.count()}')
+        self.stdout.write(self.style.SUCCESS('\n¡Claves vencidas borradas!'))
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from cart.models import Cart, CartItem
+from catalog.models import Category, ItemStock, Product
+from orders import placement
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Confirmar muchos carritos con los mismos SKU a la vez y verificar que no haya bloqueos mutuos ni sobreventa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Checkouts simultáneos (uno por hilo)')
+        parser.add_argument('--skus', type=int, default=10, help='SKU compartidos por todos los carritos')
+        parser.add_argument(
+            '--stock',
+            type=int,
+            help='Unidades de cada SKU (default: la mitad de los hilos, para que compitan por el stock)',
+        )
+
+    def fill_carts(self, products, threads):
+        """
+        Un carrito por hilo con 1 unidad de cada SKU, agregados en distinto orden.
+        Los items no tienen reserva, así los checkouts compiten por el stock
+        libre, como cuando las reservas de los compradores ya vencieron.
+        """
+        carts = []
+        for number in range(threads):
+            cart = Cart.objects.create(token=f'stress-checkout-{number}')
+            shuffled = random.sample(products, len(products))
+            for product in shuffled:
+                CartItem.objects.create(cart=cart, product=product, quantity=1, price=product.price)
+            carts.append(cart)
+        return carts
+
+    def hammer(self, carts, session):
+        """Lanzar todos los checkouts a la vez; devuelve (confirmados, rechazados, bloqueos mutuos, otros errores)"""
+        barrier = threading.Barrier(len(carts))
+
+        def worker(cart):
+            try:
+                order = Order(
+                    session=session, customer_name='Prueba', customer_email='stress@example.com',
+                    customer_phone='0', shipping_address='-', shipping_city='-', shipping_state='-',
+                    shipping_zip_code='0', discount=0,
+                )
+                barrier.wait()
+                try:
+                    with transaction.atomic():
+                        return 'placed' if placement.place_order(cart, order) else 'rejected'
+                except OperationalError as e:
+                    # PostgreSQL: "deadlock detected"; SQLite: "database is locked"
+                    return 'deadlock' if 'deadlock' in str(e).lower() else 'error'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(carts)) as executor:
+            outcomes = list(executor.map(worker, carts))
+        return [outcomes.count(key) for key in ('placed', 'rejected', 'deadlock', 'error')]
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        stock = options['stock'] if options['stock'] is not None else threads // 2
+        if threads < 2:
+            raise CommandError('Se necesitan al menos 2 hilos')
+        if options['skus'] < 2:
+            raise CommandError('Se necesitan al menos 2 SKU para que el orden de bloqueo importe')
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite bloquea toda la base en cada escritura: los bloqueos mutuos solo se pueden dar con PostgreSQL.'
+            ))
+
+        # Los hilos usan sus propias conexiones, así que los datos deben estar confirmados
+        store = SessionStore()
+        store.create()
+        session = Session.objects.get(session_key=store.session_key)
+        category = Category.objects.create(name='Prueba de checkout', slug='stress-checkout')
+        try:
+            products = [
+                Product.objects.create(
+                    name=f'Producto compartido {i}', slug=f'stress-checkout-{i}', sku=f'STRESS-CO-{i}',
+                    price=100, stock=stock, category=category,
+                )
+                for i in range(options['skus'])
+            ]
+            ItemStock.objects.bulk_create([ItemStock(product=product, quantity=stock) for product in products])
+            carts = self.fill_carts(products, threads)
+
+            self.stdout.write(
+                f'{threads} checkouts simultáneos de {options["skus"]} SKU compartidos, '
+                f'{stock} unidades de cada uno'
+            )
+            start = time.perf_counter()
+            placed, rejected, deadlocks, errors = self.hammer(carts, session)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            rows = list(ItemStock.objects.filter(product__category=category).values_list('quantity', 'reserved_quantity'))
+            orders = Order.objects.filter(session=session).count()
+        finally:
+            Order.objects.filter(session=session).delete()
+            Cart.objects.filter(token__startswith='stress-checkout-').delete()
+            Product.objects.filter(category=category).delete()
+            category.delete()
+            session.delete()
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'Órdenes confirmadas: {placed}')
+        self.stdout.write(f'Rechazadas por falta de stock: {rejected}')
+        self.stdout.write(f'Bloqueos mutuos (deadlock): {deadlocks}')
+        self.stdout.write(f'Tiempo total: {elapsed:.1f} ms')
+        if errors:
+            self.stdout.write(self.style.WARNING(f'  {errors} checkout(s) fallaron por bloqueo de la base de datos'))
+
+        if deadlocks:
+            raise CommandError(f'✗ {deadlocks} checkout(s) terminaron en deadlock')
+        if orders != placed:
+            raise CommandError(f'✗ Se confirmaron {placed} checkouts pero hay {orders} órdenes')
+        for quantity, reserved in rows:
+            if quantity != stock - placed or quantity < 0 or reserved:
+                raise CommandError(
+                    f'✗ Stock inconsistente: quedan {quantity} (reservadas {reserved}), se esperaban {stock - placed}'
+                )
+        if not errors and placed != min(threads, stock):
+            raise CommandError(f'✗ Se esperaban {min(threads, stock)} órdenes y se confirmaron {placed}')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Sin deadlocks ni sobreventa: {placed} órdenes, stock consistente'))
@@ -106,7 +106,7 @@ class Command(BaseCommand):
             self.stdout.write(f'✓ Sesión de prueba creada: {session.session_key}')
             
             # 7. Crear carrito de prueba
-            cart, created = Cart.objects.get_or_create(session=session)
+            cart, created = Cart.objects.get_or_create(token=session.session_key)
             if created:
                 self.stdout.write(f'✓ Carrito creado para sesión: {cart.id}')
             else:
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_orderitem_variant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_keyset_idx'),
+        ),
+    ]
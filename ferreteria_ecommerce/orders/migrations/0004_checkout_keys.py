@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40, verbose_name='Sesión')),
+                ('key', models.CharField(max_length=64, verbose_name='Clave')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Vence')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checkout_keys', to='orders.order', verbose_name='Orden')),
+            ],
+            options={
+                'verbose_name': 'Clave de checkout',
+                'verbose_name_plural': 'Claves de checkout',
+                'constraints': [models.UniqueConstraint(fields=('session_key', 'key'), name='checkout_key_unique')],
+            },
+        ),
+    ]
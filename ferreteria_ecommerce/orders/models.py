@@ -1,9 +1,36 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.sessions.models import Session
 from catalog.models import Product, ProductVariant
 from promotions.models import Coupon
 
 
+class OrderQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Cancelar en masa (``update(status='cancelled')``) no pasa por
+        ``Order.save``: devolver aquí, en lote, los usos de cupón de las
+        órdenes que se cancelan.
+        """
+        if kwargs.get('status') != 'cancelled':
+            return super().update(**kwargs)
+        from promotions import redemptions
+
+        with transaction.atomic(using=self.db):
+            cancelled = list(self.exclude(status='cancelled').filter(coupon__isnull=False).values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            if cancelled:
+                redemptions.give_back_orders(cancelled)
+        return updated
+
+    def delete(self):
+        """Borrar las órdenes devolviendo antes, en lote, sus usos de cupón"""
+        from promotions import redemptions
+
+        with transaction.atomic(using=self.db):
+            redemptions.give_back_orders(self.filter(coupon__isnull=False).values('pk'))
+            return super().delete()
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pendiente'),
@@ -32,10 +59,15 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Orden"
         verbose_name_plural = "Órdenes"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Orden {self.order_number}"
@@ -83,3 +115,26 @@ class OrderItem(models.Model):
         if self.variant:
             return self.variant.sku
         return self.product.sku
+
+
+class CheckoutKey(models.Model):
+    """
+    Clave de idempotencia del formulario de checkout: el primer envío que
+    completa la orden la guarda y los reenvíos con la misma clave (doble clic,
+    reintentos) redirigen a esa orden sin volver a procesar el carrito.
+    """
+    session_key = models.CharField(max_length=40, verbose_name="Sesión")
+    key = models.CharField(max_length=64, verbose_name="Clave")
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='checkout_keys', verbose_name="Orden")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Vence")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+
+    class Meta:
+        verbose_name = "Clave de checkout"
+        verbose_name_plural = "Claves de checkout"
+        constraints = [
+            models.UniqueConstraint(fields=['session_key', 'key'], name='checkout_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} → {self.order.order_number if self.order else 'sin orden'}"
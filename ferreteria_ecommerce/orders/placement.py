@@ -0,0 +1,98 @@
+"""
+Creación de la orden a partir del carrito.
+
+La transacción del checkout hace un número fijo de consultas sin importar
+cuántas líneas tenga el carrito:
+
+- las líneas y sus precios se leen con una consulta y los ``OrderItem`` se
+  insertan con un solo ``bulk_create``;
+- las reservas del carrito se bloquean primero y el stock después, en orden
+  de id (el mismo orden que ``release_expired``), así dos checkouts o una
+  liberación simultánea sobre los mismos SKU nunca quedan esperándose entre
+  sí;
+- liberar la reserva y descontar lo vendido es un solo UPDATE agrupado
+  (``catalog.stock.settle_many``).
+
+Los montos se calculan con las mismas líneas que se guardan (promociones y
+cupón incluidos), no con los totales que vio la página del checkout: si el
+carrito cambió mientras tanto, la orden cobra lo que realmente lleva.
+
+Los bloqueos se toman al final, después de insertar la orden, para
+mantenerlos el menor tiempo posible.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+from cart.models import StockReservation
+from catalog import stock
+from promotions import redemptions
+from promotions.rules import get_promotion_engine
+from .models import OrderItem
+
+
+class CouponUnavailable(Exception):
+    """El cupón agotó sus usos o venció mientras se confirmaba la orden"""
+
+
+def place_order(cart, order, coupon=None):
+    """
+    Guardar ``order`` (con cliente y sesión ya asignados) con las líneas del
+    carrito, vender el stock y vaciar el carrito. Subtotal, promociones y el
+    descuento de ``coupon`` se calculan aquí a partir de esas líneas; el uso
+    del cupón se cuenta solo si descontó algo. Debe llamarse dentro de una
+    transacción; devuelve False (y la marca para revertir) si el carrito está
+    vacío o algún producto ya no tiene stock, y lanza ``CouponUnavailable``
+    si el cupón ya no tiene usos.
+    """
+    lines = list(
+        cart.items.order_by('pk')
+        .values_list('product_id', 'variant_id', 'product__category_id', 'quantity', 'price')
+    )
+    if not lines:
+        return False
+
+    priced = get_promotion_engine().price(
+        (product_id, category_id, quantity, price) for product_id, _, category_id, quantity, price in lines
+    )
+    coupon_discount = coupon.discount_for(priced.total) if coupon else Decimal('0.00')
+    order.coupon = coupon if coupon_discount else None
+    order.subtotal = priced.subtotal
+    order.discount = min(priced.discount + coupon_discount, order.subtotal)
+    order.total = order.subtotal - order.discount
+    order.save()
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order, product_id=product_id, variant_id=variant_id,
+            quantity=quantity, price=price, total=quantity * price,
+        )
+        for product_id, variant_id, _, quantity, price in lines
+    ])
+
+    held = list(
+        StockReservation.objects.select_for_update().filter(cart_item__cart=cart)
+        .order_by('stock_item_id', 'pk').values_list('pk', 'stock_item_id', 'quantity')
+    )
+    stock_items = stock.by_key((product_id, variant_id) for product_id, variant_id, _, _, _ in lines)
+
+    amounts = defaultdict(lambda: [0, 0])
+    for product_id, variant_id, _, quantity, _ in lines:
+        stock_item = stock_items.get((product_id, variant_id))
+        if stock_item:
+            amounts[stock_item.pk][0] += quantity
+    for _, stock_item_id, quantity in held:
+        amounts[stock_item_id][1] += quantity
+
+    if not stock.settle_many({pk: tuple(amount) for pk, amount in amounts.items()}):
+        transaction.set_rollback(True)
+        return False
+
+    # Las reservas ya se descontaron del stock: borrarlas antes de vaciar el carrito
+    StockReservation.objects.filter(pk__in=[pk for pk, _, _ in held]).delete()
+    cart.clear()
+
+    # El uso del cupón se cuenta al final, con la fila del cupón bloqueada el menor tiempo posible
+    if order.coupon_id and not redemptions.redeem(order, coupon_discount):
+        raise CouponUnavailable(coupon.code)
+    return True
@@ -1,107 +1,107 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.http import require_POST
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.contrib.sessions.models import Session
-from .models import Order, OrderItem
+from .models import Order
 from .forms import CheckoutForm
-from cart.views import get_or_create_cart
+from . import idempotency, placement
+from cart import reservations
+from cart.pricing import cart_totals, price_lines
+from cart.store import get_cart
 from promotions.models import Coupon
-from catalog.models import ItemStock
+from promotions.table import get_coupon
+
+
+def order_placed(request, order_number):
+    messages.success(request, f'Orden {order_number} creada exitosamente.')
+    return redirect('orders:order_detail', order_number=order_number)
 
 
 def checkout(request):
     """Vista del checkout"""
-    cart = get_or_create_cart(request)
-    cart_items = cart.items.all()
+    # Reenvío de un formulario ya confirmado (doble clic, reintento): misma respuesta
+    checkout_key = idempotency.clean_key(request.POST.get('checkout_key')) if request.method == 'POST' else None
+    order_number = idempotency.completed_order(request.session.session_key, checkout_key)
+    if order_number:
+        return order_placed(request, order_number)
+    
+    cart = get_cart(request)
+    cart_items = cart.items.all() if cart else []
     
     if not cart_items:
         messages.error(request, 'Tu carrito está vacío.')
         return redirect('cart:cart_detail')
     
-    # Obtener cupón aplicado si existe
-    applied_coupon = None
-    discount_amount = 0
-    
-    if 'applied_coupon_id' in request.session:
-        try:
-            applied_coupon = Coupon.objects.get(id=request.session['applied_coupon_id'])
-            if applied_coupon.is_valid():
-                cart_total = cart.get_total()
-                if cart_total >= applied_coupon.min_amount:
-                    discount_amount = applied_coupon.calculate_discount(cart_total)
-        except Coupon.DoesNotExist:
-            # Si el cupón no existe, limpiarlo de la sesión
-            if 'applied_coupon_id' in request.session:
-                del request.session['applied_coupon_id']
+    # Promociones y cupón con el mismo cálculo que el carrito; el límite de uso
+    # real del cupón se verifica al canjearlo
+    totals = cart_totals(request, cart)
+    applied_coupon = totals.coupon
     
     if request.method == 'POST':
         form = CheckoutForm(request.POST)
         if form.is_valid():
+            # La orden queda asociada a la sesión (se crea recién aquí, fuera de la
+            # transacción para que una orden revertida no se lleve la sesión)
+            if not request.session.session_key:
+                request.session.create()
             try:
                 with transaction.atomic():
+                    # La clave se registra primero: un segundo envío simultáneo espera aquí
+                    claimed = checkout_key and idempotency.claim(request.session.session_key, checkout_key)
+                    
                     # Crear la orden
                     order = form.save(commit=False)
-                    # Corregir el manejo de sesiones
                     order.session = Session.objects.get(session_key=request.session.session_key)
-                    order.subtotal = cart.get_total()
-                    order.discount = discount_amount
-                    order.total = order.subtotal - order.discount
-                    if applied_coupon:
-                        order.coupon = applied_coupon
-                    order.save()
                     
-                    # Crear items de la orden con variantes
-                    for cart_item in cart_items:
-                        OrderItem.objects.create(
-                            order=order,
-                            product=cart_item.product,
-                            variant=cart_item.variant,  # Agregar variante
-                            quantity=cart_item.quantity,
-                            price=cart_item.price,
-                            total=cart_item.get_total()
-                        )
-                        
-                        # Consumir stock reservado y liberar la reserva
-                        if cart_item.variant:
-                            try:
-                                stock_item = ItemStock.objects.get(product=cart_item.product, variant=cart_item.variant)
-                                stock_item.consume_stock(cart_item.quantity)
-                                stock_item.release_stock(cart_item.quantity)
-                            except ItemStock.DoesNotExist:
-                                pass
-                        else:
-                            try:
-                                stock_item = ItemStock.objects.get(product=cart_item.product, variant__isnull=True)
-                                stock_item.consume_stock(cart_item.quantity)
-                                stock_item.release_stock(cart_item.quantity)
-                            except ItemStock.DoesNotExist:
-                                pass
+                    # Montos, líneas, stock, carrito y uso del cupón en un número fijo de
+                    # consultas (orders/placement.py); solo consume un uso el cupón que descontó
+                    if not placement.place_order(cart, order, coupon=applied_coupon):
+                        messages.error(request, 'Algunos productos ya no tienen stock suficiente. Revisa tu carrito.')
+                        return redirect('cart:cart_detail')
+                    
+                    if claimed:
+                        idempotency.complete(claimed, order)
                     
-                    # Limpiar carrito y cupón aplicado
-                    cart.clear()
+                    # Limpiar cupón aplicado
                     if 'applied_coupon_id' in request.session:
                         del request.session['applied_coupon_id']
                     
-                    messages.success(request, f'Orden {order.order_number} creada exitosamente.')
-                    return redirect('orders:order_detail', order_number=order.order_number)
+                    return order_placed(request, order.order_number)
                     
+            except placement.CouponUnavailable:
+                request.session.pop('applied_coupon_id', None)
+                messages.error(request, f'El cupón {applied_coupon.code} ya no está disponible (alcanzó su límite de uso o venció).')
+                return redirect('cart:cart_detail')
+            except IntegrityError:
+                # Otro envío con la misma clave creó la orden mientras tanto
+                order_number = idempotency.completed_order(request.session.session_key, checkout_key)
+                if order_number:
+                    return order_placed(request, order_number)
+                messages.error(request, 'Error al procesar la orden. Inténtalo de nuevo.')
             except Exception as e:
                 messages.error(request, 'Error al procesar la orden. Inténtalo de nuevo.')
     else:
         form = CheckoutForm()
-    
-    # Calcular el total final con descuento
-    cart_total = cart.get_total()
-    final_total = cart_total - discount_amount
+        # Sin bloquear stock en un GET; el checkout vende lo que todavía esté disponible
+        if reservations.touch(cart, rehold=False):
+            messages.warning(request, 'La reserva de algunos productos venció; se confirmará si todavía hay stock.')
+        # La sesión se crea al mostrar el formulario para que un doble envío
+        # llegue con la misma cookie y se reconozca su clave
+        if not request.session.session_key:
+            request.session.create()
     
     context = {
         'form': form,
         'cart': cart,
         'cart_items': cart_items,
+        'subtotal': totals.subtotal,
+        'promotions': totals.promotions,
+        'promotion_discount': totals.promotion_discount,
         'applied_coupon': applied_coupon,
-        'discount_amount': discount_amount,
-        'final_total': final_total,
+        'discount_amount': totals.coupon_discount,
+        'final_total': totals.total,
+        'checkout_key': checkout_key or idempotency.new_key(),
     }
     return render(request, 'orders/checkout.html', context)
 
@@ -130,28 +130,25 @@ def apply_coupon(request):
         messages.error(request, 'Por favor ingresa un código de cupón.')
         return redirect('cart:cart_detail')
     
-    try:
-        coupon = Coupon.objects.get(code=coupon_code)
-        if not coupon.is_valid():
+    coupon = get_coupon(code=coupon_code)
+    if coupon is None:
+        if Coupon.objects.filter(code=coupon_code).exists():
             messages.error(request, 'Este cupón no es válido o ha expirado.')
-            return redirect('cart:cart_detail')
-        
-        cart = get_or_create_cart(request)
-        cart_total = cart.get_total()
-        
-        if cart_total < coupon.min_amount:
-            messages.error(request, f'El monto mínimo para usar este cupón es ${coupon.min_amount}.')
-            return redirect('cart:cart_detail')
-        
-        # Guardar el cupón en la sesión para usarlo en el checkout
-        request.session['applied_coupon_id'] = coupon.id
-        discount = coupon.calculate_discount(cart_total)
-        
-        messages.success(request, f'Cupón aplicado. Descuento: ${discount}')
-        
-    except Coupon.DoesNotExist:
-        messages.error(request, 'Código de cupón inválido.')
+        else:
+            messages.error(request, 'Código de cupón inválido.')
+        return redirect('cart:cart_detail')
+    
+    cart_total = price_lines(get_cart(request)).total
+    
+    if cart_total < coupon.min_amount:
+        messages.error(request, f'El monto mínimo para usar este cupón es ${coupon.min_amount}.')
+        return redirect('cart:cart_detail')
+    
+    # Guardar el cupón en la sesión para usarlo en el checkout
+    request.session['applied_coupon_id'] = coupon.id
+    discount = coupon.discount_for(cart_total)
     
+    messages.success(request, f'Cupón aplicado. Descuento: ${discount}')
     return redirect('cart:cart_detail')
 
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Coupon
+from .models import Coupon, CouponRedemption, Promotion
 
 
 @admin.register(Coupon)
@@ -8,3 +8,20 @@ class CouponAdmin(admin.ModelAdmin):
     list_filter = ['discount_type', 'is_active', 'valid_from', 'valid_to']
     search_fields = ['code']
     readonly_fields = ['used_count', 'created_at']
+
+
+@admin.register(CouponRedemption)
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ['coupon', 'order', 'discount', 'created_at', 'returned_at']
+    list_filter = ['returned_at', 'created_at']
+    search_fields = ['coupon__code', 'order__order_number']
+    readonly_fields = ['coupon', 'order', 'discount', 'created_at', 'returned_at']
+
+
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'scope', 'category', 'product', 'condition', 'action', 'is_active', 'valid_from', 'valid_to']
+    list_filter = ['scope', 'action', 'is_active', 'valid_from', 'valid_to']
+    search_fields = ['name', 'category__name', 'product__name', 'product__sku']
+    raw_id_fields = ['product']
+    readonly_fields = ['created_at']
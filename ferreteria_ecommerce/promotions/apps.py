@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PromotionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'promotions'
+
+    def ready(self):
+        from django.core import checks
+        from . import signals  # noqa: F401
+        from .versions import check_version_cache
+
+        checks.register(check_version_cache, checks.Tags.caches)
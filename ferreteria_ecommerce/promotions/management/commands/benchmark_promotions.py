@@ -0,0 +1,159 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from catalog.tree import CategoryTree
+from promotions.models import Promotion
+from promotions.rules import PricedCart, PromotionEngine, allocate
+
+
+def naive_price(promotions, lines, now, tree):
+    """Evaluación directa: cada promoción recorre todas las líneas (O(líneas x promociones))"""
+    priced = PricedCart(subtotal=sum((quantity * price for _, _, quantity, price in lines), Decimal('0.00')))
+    remaining = [quantity * price for _, _, quantity, price in lines]
+    for promotion in sorted(promotions, key=lambda p: p.pk):
+        if not promotion.is_current(now):
+            continue
+        scoped = []
+        for index, (product_id, category_id, quantity, price) in enumerate(lines):
+            if promotion.scope == 'product':
+                matches = product_id == promotion.product_id
+            elif promotion.scope == 'category':
+                node = tree.by_id.get(category_id)
+                matches = node is not None and any(ancestor.id == promotion.category_id for ancestor in node.path)
+            else:
+                matches = True
+            if matches:
+                scoped.append((index, quantity, price))
+        if not scoped:
+            continue
+        quantity = sum(q for _, q, _ in scoped)
+        amount = sum((q * p for _, q, p in scoped), Decimal('0.00'))
+        discount = promotion.discount_for(quantity, amount, [(p, q) for _, q, p in scoped])
+        if discount > 0:
+            discount = allocate(discount, amount, [(i, q * p) for i, q, p in scoped], remaining)
+        if discount > 0:
+            priced.applied.append((promotion, discount))
+    return priced
+
+
+class Command(BaseCommand):
+    help = 'Medir el evaluador de promociones calculando muchos carritos en memoria (sin base de datos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carts', type=int, default=10000, help='Carritos a calcular')
+        parser.add_argument('--lines', type=int, default=20, help='Líneas máximas por carrito')
+        parser.add_argument('--rules', type=int, default=500, help='Promociones vigentes')
+        parser.add_argument('--products', type=int, default=5000, help='Productos distintos')
+        parser.add_argument('--categories', type=int, default=200, help='Categorías (en árbol de hasta 3 niveles)')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla para repetir los mismos datos')
+        parser.add_argument(
+            '--naive',
+            action='store_true',
+            help='Medir también la evaluación directa (cada promoción contra cada línea) y comparar resultados',
+        )
+
+    def build_tree(self, rng, count):
+        rows = []
+        for category_id in range(1, count + 1):
+            # 10 raíces, 40 subcategorías y el resto en el tercer nivel
+            if category_id <= 10:
+                parent_id = None
+            elif category_id <= 50:
+                parent_id = rng.randint(1, 10)
+            else:
+                parent_id = rng.randint(11, min(50, category_id - 1))
+            rows.append({
+                'id': category_id, 'name': f'Categoría {category_id}', 'slug': f'categoria-{category_id}',
+                'description': '', 'parent_id': parent_id, 'is_active': True, 'own_product_count': 0,
+            })
+        return CategoryTree(rows)
+
+    def build_promotions(self, rng, options, now):
+        promotions = []
+        for pk in range(1, options['rules'] + 1):
+            # Casi todas son por producto; las de todo el carrito son muy pocas
+            scope = 'cart' if pk % 100 == 0 else rng.choice(['product', 'product', 'category'])
+            promotion = Promotion(
+                pk=pk, name=f'Promoción {pk}', scope=scope,
+                product_id=rng.randint(1, options['products']) if scope == 'product' else None,
+                category_id=rng.randint(1, options['categories']) if scope == 'category' else None,
+                condition=rng.choice(['none', 'min_quantity', 'min_amount']),
+                condition_value=Decimal(rng.choice([0, 2, 3, 500])),
+                action=rng.choice(['percentage', 'fixed', 'buy_x_pay_y'] if scope == 'product' else ['percentage', 'fixed']),
+                action_value=Decimal(rng.choice([5, 10, 15, 20])),
+                buy_quantity=2, pay_quantity=1,
+                valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+            )
+            promotions.append(promotion)
+        return promotions
+
+    def build_carts(self, rng, options):
+        product_categories = {
+            product_id: rng.randint(1, options['categories']) for product_id in range(1, options['products'] + 1)
+        }
+        carts = []
+        for _ in range(options['carts']):
+            product_ids = rng.sample(range(1, options['products'] + 1), rng.randint(1, options['lines']))
+            carts.append([
+                (product_id, product_categories[product_id], rng.randint(1, 5), Decimal(rng.randint(50, 5000)))
+                for product_id in product_ids
+            ])
+        return carts
+
+    def run(self, label, price, carts):
+        start = time.perf_counter()
+        results = [price(lines) for lines in carts]
+        elapsed = time.perf_counter() - start
+        return {'label': label, 'seconds': elapsed, 'results': results}
+
+    def handle(self, *args, **options):
+        for name in ('carts', 'lines', 'rules', 'products', 'categories'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} debe ser al menos 1')
+
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        tree = self.build_tree(rng, options['categories'])
+        promotions = self.build_promotions(rng, options, now)
+        carts = self.build_carts(rng, options)
+        lines = sum(len(cart) for cart in carts)
+        self.stdout.write(
+            f'{len(carts)} carritos ({lines} líneas), {len(promotions)} promociones, '
+            f'{options["categories"]} categorías'
+        )
+
+        start = time.perf_counter()
+        engine = PromotionEngine(promotions, version='benchmark')
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        results = [self.run('Índices', lambda cart: engine.price(cart, now=now, tree=tree), carts)]
+        if options['naive']:
+            results.append(self.run('Directa', lambda cart: naive_price(promotions, cart, now, tree), carts))
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'Compilar {len(promotions)} promociones: {compile_ms:.1f} ms')
+        self.stdout.write(f'{"Método":<10} {"Total s":>9} {"µs/carrito":>11} {"Descuento total":>17}')
+        for r in results:
+            discount = sum(priced.discount for priced in r['results'])
+            self.stdout.write(
+                f'{r["label"]:<10} {r["seconds"]:>9.2f} {r["seconds"] / len(carts) * 1e6:>11.1f} {discount:>17,.2f}'
+            )
+
+        if options['naive']:
+            indexed, naive = results[0]['results'], results[1]['results']
+            mismatches = sum(
+                1 for a, b in zip(indexed, naive)
+                if a.discount != b.discount or {p.pk for p, _ in a.applied} != {p.pk for p, _ in b.applied}
+            )
+            if mismatches:
+                raise CommandError(f'✗ {mismatches} carritos con descuentos distintos entre los dos métodos')
+            speedup = results[1]['seconds'] / results[0]['seconds']
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Mismos descuentos en los {len(carts)} carritos ({speedup:.1f}x más rápido con índices)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✓ {len(carts)} carritos calculados'))
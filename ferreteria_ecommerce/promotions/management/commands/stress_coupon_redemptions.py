@@ -0,0 +1,142 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from orders.models import Order
+from promotions import redemptions
+from promotions.models import Coupon, CouponRedemption
+
+
+def legacy_redeem(order):
+    """Uso anterior: leer, validar y guardar el cupón completo (sufre carreras)"""
+    coupon = Coupon.objects.get(pk=order.coupon_id)
+    if coupon.is_valid():
+        coupon.used_count += 1
+        coupon.save()
+        return True
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Canjear el mismo cupón desde muchos hilos a la vez y verificar que nunca supere su límite de uso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--attempts', type=int, default=10, help='Canjes por hilo')
+        parser.add_argument('--limit', type=int, default=100, help='Límite de uso del cupón')
+        parser.add_argument(
+            '--legacy',
+            action='store_true',
+            help='Ejecutar también el uso anterior (leer-validar-guardar) para comparar',
+        )
+
+    def hammer(self, orders, redeem, threads):
+        """Lanzar todos los hilos a la vez; devuelve (canjes exitosos, errores de bloqueo)"""
+        barrier = threading.Barrier(threads)
+        batches = [orders[i::threads] for i in range(threads)]
+
+        def worker(batch):
+            successes = errors = 0
+            try:
+                barrier.wait()
+                for order in batch:
+                    try:
+                        with transaction.atomic():
+                            if redeem(order):
+                                successes += 1
+                    except OperationalError:
+                        # SQLite: "database is locked" con escrituras simultáneas
+                        errors += 1
+            finally:
+                connection.close()
+            return successes, errors
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(worker, batches))
+        return sum(s for s, _ in results), sum(e for _, e in results)
+
+    def run_scenario(self, label, coupon, orders, redeem, options):
+        Coupon.objects.filter(pk=coupon.pk).update(used_count=0)
+        CouponRedemption.objects.filter(coupon=coupon).delete()
+
+        start = time.perf_counter()
+        successes, errors = self.hammer(orders, redeem, options['threads'])
+        elapsed = (time.perf_counter() - start) * 1000
+        coupon.refresh_from_db()
+
+        return {
+            'label': label,
+            'successes': successes,
+            'errors': errors,
+            'used': coupon.used_count,
+            'records': CouponRedemption.objects.filter(coupon=coupon).count(),
+            'ms': elapsed,
+        }
+
+    def handle(self, *args, **options):
+        if options['threads'] < 2:
+            raise CommandError('Se necesitan al menos 2 hilos')
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite serializa las escrituras: la prueba es más significativa con PostgreSQL.'
+            ))
+
+        total = options['threads'] * options['attempts']
+        limit = options['limit']
+        # Los hilos usan sus propias conexiones, así que los datos deben estar confirmados
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code='STRESS-CUPON', discount_type='fixed', discount_value=10,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1), usage_limit=limit,
+        )
+        store = SessionStore()
+        store.create()
+        session = Session.objects.get(session_key=store.session_key)
+        try:
+            orders = Order.objects.bulk_create([
+                Order(
+                    session=session, order_number=f'STRESS-CP-{i}', customer_name='Prueba',
+                    customer_email='stress@example.com', customer_phone='0', shipping_address='-',
+                    shipping_city='-', shipping_state='-', shipping_zip_code='0',
+                    subtotal=100, discount=10, total=90, coupon=coupon,
+                )
+                for i in range(total)
+            ])
+
+            self.stdout.write(f'{options["threads"]} hilos x {options["attempts"]} intentos = {total} canjes de un cupón con límite {limit}')
+            results = [self.run_scenario('UPDATE condicional', coupon, orders, redemptions.redeem, options)]
+            if options['legacy']:
+                results.append(self.run_scenario('Leer-validar-guardar', coupon, orders, legacy_redeem, options))
+        finally:
+            # Primero el cupón: sus usos se borran con él y no hay nada que devolver
+            coupon.delete()
+            Order.objects.filter(session=session).delete()
+            session.delete()
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('RESULTADOS')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'{"Método":<22} {"Éxitos":>7} {"Usos":>6} {"Registros":>10} {"ms":>9}')
+        for r in results:
+            self.stdout.write(
+                f'{r["label"]:<22} {r["successes"]:>7} {r["used"]:>6} {r["records"]:>10} {r["ms"]:>9.1f}'
+            )
+            if r['errors']:
+                self.stdout.write(self.style.WARNING(f'  {r["errors"]} intento(s) fallaron por bloqueo de la base de datos'))
+
+        atomic = results[0]
+        if atomic['used'] > limit or atomic['used'] != atomic['successes'] or atomic['records'] != atomic['successes']:
+            raise CommandError(
+                f'✗ El cupón con límite {limit} quedó con {atomic["used"]} usos, '
+                f'{atomic["successes"]} canjes confirmados y {atomic["records"]} registros'
+            )
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Sin canjes de más: {atomic["used"]}/{limit} usos'))
+        expected = min(total, limit)
+        if not atomic['errors'] and atomic['used'] < expected:
+            raise CommandError(f'✗ Se esperaban {expected} usos y hay {atomic["used"]}')
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_checkout_keys'),
+        ('promotions', '0002_coupon_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('discount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Descuento aplicado')),
+                ('returned_at', models.DateTimeField(blank=True, null=True, verbose_name='Uso devuelto')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de uso')),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='promotions.coupon', verbose_name='Cupón')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemption', to='orders.order', verbose_name='Orden')),
+            ],
+            options={
+                'verbose_name': 'Uso de cupón',
+                'verbose_name_plural': 'Usos de cupones',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
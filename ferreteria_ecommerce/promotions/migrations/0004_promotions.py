@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_stock_shards'),
+        ('promotions', '0003_coupon_redemptions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('description', models.CharField(blank=True, max_length=200, verbose_name='Descripción')),
+                ('scope', models.CharField(choices=[('cart', 'Todo el carrito'), ('category', 'Categoría (incluye subcategorías)'), ('product', 'Producto')], default='cart', max_length=10, verbose_name='Alcance')),
+                ('condition', models.CharField(choices=[('none', 'Sin condición'), ('min_quantity', 'Cantidad mínima'), ('min_amount', 'Monto mínimo')], default='none', max_length=15, verbose_name='Condición')),
+                ('condition_value', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Valor de la condición')),
+                ('action', models.CharField(choices=[('percentage', 'Porcentaje'), ('fixed', 'Monto fijo'), ('buy_x_pay_y', 'Lleva X, paga Y')], default='percentage', max_length=15, verbose_name='Acción')),
+                ('action_value', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Valor del descuento')),
+                ('buy_quantity', models.PositiveIntegerField(blank=True, null=True, verbose_name='Lleva (X)')),
+                ('pay_quantity', models.PositiveIntegerField(blank=True, null=True, verbose_name='Paga (Y)')),
+                ('max_discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Descuento máximo')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Activa')),
+                ('valid_from', models.DateTimeField(verbose_name='Válida desde')),
+                ('valid_to', models.DateTimeField(verbose_name='Válida hasta')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='catalog.category', verbose_name='Categoría')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='catalog.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Promoción',
+                'verbose_name_plural': 'Promociones',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
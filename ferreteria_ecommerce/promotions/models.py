@@ -1,6 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 
 
 class Coupon(models.Model):
@@ -51,7 +51,13 @@ class Coupon(models.Model):
         return True
 
     def calculate_discount(self, total_amount):
-        if not self.is_valid() or total_amount < self.min_amount:
+        if not self.is_valid():
+            return Decimal('0.00')
+        return self.discount_for(total_amount)
+
+    def discount_for(self, total_amount):
+        """Descuento para el total, sin volver a validar el cupón (ya validado con ``promotions.table``)"""
+        if total_amount < self.min_amount:
             return Decimal('0.00')
 
         if self.discount_type == 'percentage':
@@ -64,8 +70,134 @@ class Coupon(models.Model):
         return min(discount, total_amount)
 
     def use(self):
-        if self.is_valid():
-            self.used_count += 1
-            self.save()
-            return True
-        return False
+        """
+        Registrar un uso con un UPDATE condicional: la base de datos verifica
+        vigencia y límite sobre la fila actual, así dos checkouts simultáneos
+        no pueden usar el último cupón disponible. Devuelve True si se contó.
+        """
+        from django.utils import timezone
+
+        now = timezone.now()
+        updated = Coupon.objects.filter(
+            models.Q(usage_limit__isnull=True) | models.Q(used_count__lt=models.F('usage_limit')),
+            pk=self.pk, is_active=True, valid_from__lte=now, valid_to__gte=now,
+        ).update(used_count=models.F('used_count') + 1)
+        self.refresh_from_db(fields=['used_count'])
+        return updated == 1
+
+    def give_back(self):
+        """Devolver un uso (orden cancelada o reembolsada)"""
+        updated = Coupon.objects.filter(pk=self.pk, used_count__gt=0).update(used_count=models.F('used_count') - 1)
+        self.refresh_from_db(fields=['used_count'])
+        return updated == 1
+
+
+class CouponRedemption(models.Model):
+    """Uso de un cupón por una orden; permite devolverlo si la orden se cancela"""
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions', verbose_name="Cupón")
+    order = models.OneToOneField('orders.Order', on_delete=models.CASCADE, related_name='coupon_redemption', verbose_name="Orden")
+    discount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Descuento aplicado")
+    returned_at = models.DateTimeField(null=True, blank=True, verbose_name="Uso devuelto")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de uso")
+
+    class Meta:
+        verbose_name = "Uso de cupón"
+        verbose_name_plural = "Usos de cupones"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.coupon.code} en {self.order.order_number}"
+
+
+class Promotion(models.Model):
+    """
+    Promoción automática (sin código): a qué se aplica (alcance), cuándo
+    (condición sobre las líneas del alcance) y qué descuenta (acción). Se
+    evalúa con ``promotions.rules``.
+    """
+    SCOPES = [
+        ('cart', 'Todo el carrito'),
+        ('category', 'Categoría (incluye subcategorías)'),
+        ('product', 'Producto'),
+    ]
+    CONDITIONS = [
+        ('none', 'Sin condición'),
+        ('min_quantity', 'Cantidad mínima'),
+        ('min_amount', 'Monto mínimo'),
+    ]
+    ACTIONS = [
+        ('percentage', 'Porcentaje'),
+        ('fixed', 'Monto fijo'),
+        ('buy_x_pay_y', 'Lleva X, paga Y'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Nombre")
+    description = models.CharField(max_length=200, blank=True, verbose_name="Descripción")
+    scope = models.CharField(max_length=10, choices=SCOPES, default='cart', verbose_name="Alcance")
+    category = models.ForeignKey('catalog.Category', on_delete=models.CASCADE, null=True, blank=True, related_name='promotions', verbose_name="Categoría")
+    product = models.ForeignKey('catalog.Product', on_delete=models.CASCADE, null=True, blank=True, related_name='promotions', verbose_name="Producto")
+    condition = models.CharField(max_length=15, choices=CONDITIONS, default='none', verbose_name="Condición")
+    condition_value = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Valor de la condición")
+    action = models.CharField(max_length=15, choices=ACTIONS, default='percentage', verbose_name="Acción")
+    action_value = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Valor del descuento")
+    buy_quantity = models.PositiveIntegerField(null=True, blank=True, verbose_name="Lleva (X)")
+    pay_quantity = models.PositiveIntegerField(null=True, blank=True, verbose_name="Paga (Y)")
+    max_discount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Descuento máximo")
+    is_active = models.BooleanField(default=True, verbose_name="Activa")
+    valid_from = models.DateTimeField(verbose_name="Válida desde")
+    valid_to = models.DateTimeField(verbose_name="Válida hasta")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+
+    class Meta:
+        verbose_name = "Promoción"
+        verbose_name_plural = "Promociones"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.scope == 'category' and not self.category_id:
+            raise ValidationError({'category': 'Indica la categoría de la promoción.'})
+        if self.scope == 'product' and not self.product_id:
+            raise ValidationError({'product': 'Indica el producto de la promoción.'})
+        if self.action == 'buy_x_pay_y' and not (self.buy_quantity and self.pay_quantity is not None and self.pay_quantity < self.buy_quantity):
+            raise ValidationError({'pay_quantity': 'Para "lleva X, paga Y" Y debe ser menor que X (2x1: X=2, Y=1).'})
+        if self.valid_from and self.valid_to and self.valid_from > self.valid_to:
+            raise ValidationError({'valid_to': 'La fecha final debe ser posterior a la inicial.'})
+
+    def is_current(self, now):
+        return self.is_active and self.valid_from <= now <= self.valid_to
+
+    def discount_for(self, quantity, amount, units):
+        """
+        Descuento sobre las líneas del alcance: ``quantity`` unidades por
+        ``amount`` en total; ``units`` son pares (precio unitario, cantidad).
+        """
+        if self.condition == 'min_quantity' and quantity < self.condition_value:
+            return Decimal('0.00')
+        if self.condition == 'min_amount' and amount < self.condition_value:
+            return Decimal('0.00')
+
+        if self.action == 'percentage':
+            discount = (amount * self.action_value) / 100
+        elif self.action == 'fixed':
+            discount = self.action_value
+        else:
+            # Lleva X, paga Y: las unidades gratis son las más baratas del alcance.
+            # Una promoción mal cargada (sin X o Y, o con Y >= X) no descuenta nada
+            if not (self.buy_quantity and self.pay_quantity is not None and self.pay_quantity < self.buy_quantity):
+                return Decimal('0.00')
+            free = (quantity // self.buy_quantity) * (self.buy_quantity - self.pay_quantity)
+            discount = Decimal('0.00')
+            for price, count in sorted(units):
+                if free <= 0:
+                    break
+                discount += price * min(count, free)
+                free -= count
+
+        if self.max_discount is not None:
+            discount = min(discount, self.max_discount)
+        return min(discount, amount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
@@ -0,0 +1,79 @@
+"""
+Usos de cupones por orden.
+
+El checkout cuenta el uso del cupón dentro de la misma transacción que crea
+la orden (``Coupon.use``: ``UPDATE ... SET used_count = used_count + 1
+WHERE used_count < usage_limit``). Si ninguna fila cambia, el cupón se agotó
+o venció mientras tanto y la orden se rechaza. Cada uso queda registrado en
+``CouponRedemption``; cancelar o reembolsar la orden devuelve el uso una
+sola vez (``give_back``). Los borrados y cancelaciones masivas de órdenes,
+que no pasan por ``Order.save``, devuelven los usos en lote
+(``give_back_orders``). Los cambios de ``used_count`` que afectan la
+disponibilidad recargan la tabla de cupones en memoria (``table.py``).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Coupon, CouponRedemption
+from .table import invalidate_coupon_table
+
+
+def redeem(order, discount=None):
+    """
+    Contar el uso del cupón de la orden (ya guardada) y registrarlo con el
+    descuento que aplicó el cupón (por defecto todo ``order.discount``; las
+    promociones automáticas no cuentan). Debe llamarse dentro de la
+    transacción del checkout; devuelve False si el cupón ya no tiene usos
+    disponibles.
+    """
+    if not order.coupon_id:
+        return True
+    coupon = order.coupon
+    if not coupon.use():
+        # La tabla en memoria tenía un conteo viejo: que todos los procesos la recarguen
+        invalidate_coupon_table()
+        return False
+    if coupon.usage_limit is not None and coupon.used_count >= coupon.usage_limit:
+        invalidate_coupon_table()  # Último uso: dejar de ofrecerlo
+    CouponRedemption.objects.create(
+        coupon=coupon, order=order, discount=order.discount if discount is None else discount,
+    )
+    return True
+
+
+def give_back(order):
+    """Devolver el uso del cupón de una orden cancelada o reembolsada; devuelve False si no había nada que devolver"""
+    with transaction.atomic():
+        returned = CouponRedemption.objects.filter(order=order, returned_at__isnull=True).update(
+            returned_at=timezone.now(),
+        )
+        if not returned:
+            return False
+        CouponRedemption.objects.select_related('coupon').get(order=order).coupon.give_back()
+        invalidate_coupon_table()
+    return True
+
+
+def give_back_orders(orders):
+    """
+    Devolver de una vez los usos pendientes de varias órdenes (ids o
+    queryset): una actualización de los registros y una por cupón, sin
+    recorrer las órdenes. Devuelve cuántos usos se devolvieron.
+    """
+    with transaction.atomic():
+        pending = list(
+            CouponRedemption.objects.select_for_update()
+            .filter(order__in=orders, returned_at__isnull=True)
+            .values_list('pk', 'coupon_id')
+        )
+        if not pending:
+            return 0
+        CouponRedemption.objects.filter(pk__in=[pk for pk, _ in pending]).update(returned_at=timezone.now())
+        for coupon_id, uses in Counter(coupon_id for _, coupon_id in pending).items():
+            Coupon.objects.filter(pk=coupon_id).update(used_count=Greatest(F('used_count') - uses, 0))
+        invalidate_coupon_table()
+    return len(pending)
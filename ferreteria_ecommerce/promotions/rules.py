@@ -0,0 +1,181 @@
+"""
+Evaluador de promociones automáticas.
+
+Las promociones vigentes se compilan una vez por proceso en índices por
+producto y por categoría (más la lista de las que valen para todo el
+carrito). Calcular un carrito es una pasada por sus líneas: cada línea
+busca en los índices su producto y su categoría con sus ancestros (del
+árbol en memoria, ``catalog/tree.py``) y suma cantidad e importe al grupo de
+cada promoción que coincide. Después cada grupo calcula su descuento una
+vez y lo reparte entre sus líneas; varias promociones sobre la misma línea
+nunca descuentan más que su importe. El costo es O(líneas + promociones que
+coinciden), sin importar cuántas promociones existan.
+
+Como la tabla de cupones (``table.py``), el evaluador compara su versión con
+la de la caché compartida; guardar o borrar una promoción la cambia (ver
+``promotions/signals.py``).
+"""
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import versions
+
+VERSION_KEY = 'promotions:rules'
+CENT = Decimal('0.01')
+
+_lock = threading.Lock()
+_engine = None
+
+
+@dataclass
+class PricedCart:
+    subtotal: Decimal = Decimal('0.00')
+    # Pares (promoción, descuento), solo las que descontaron algo
+    applied: list = field(default_factory=list)
+
+    @property
+    def discount(self):
+        return min(sum((discount for _, discount in self.applied), Decimal('0.00')), self.subtotal)
+
+    @property
+    def total(self):
+        return self.subtotal - self.discount
+
+
+class PromotionEngine:
+    def __init__(self, promotions, version):
+        self.version = version
+        self.cart_rules = []
+        self.by_product = {}
+        self.by_category = {}
+        for promotion in promotions:
+            if promotion.scope == 'product':
+                self.by_product.setdefault(promotion.product_id, []).append(promotion)
+            elif promotion.scope == 'category':
+                self.by_category.setdefault(promotion.category_id, []).append(promotion)
+            else:
+                self.cart_rules.append(promotion)
+        self._paths = {}
+        self._paths_tree = None
+
+    def __bool__(self):
+        return bool(self.cart_rules or self.by_product or self.by_category)
+
+    def category_rules(self, category_id, tree):
+        """Promociones de la categoría y de sus ancestros (se recuerdan mientras el árbol no cambie)"""
+        if self._paths_tree is not tree:
+            self._paths, self._paths_tree = {}, tree
+        rules = self._paths.get(category_id)
+        if rules is None:
+            node = tree.by_id.get(category_id)
+            path = [ancestor.id for ancestor in node.path] if node else [category_id]
+            rules = self._paths[category_id] = tuple(
+                promotion for ancestor_id in path for promotion in self.by_category.get(ancestor_id, ())
+            )
+        return rules
+
+    def price(self, lines, now=None, tree=None):
+        """
+        Descuentos para las líneas ``(product_id, category_id, cantidad,
+        precio unitario)`` de un carrito.
+        """
+        now = now or timezone.now()
+        if tree is None and self.by_category:
+            from catalog.tree import get_category_tree
+
+            tree = get_category_tree()
+
+        priced = PricedCart()
+        quantity_total = 0
+        units = []
+        members = []
+        groups = {}
+        for index, (product_id, category_id, quantity, price) in enumerate(lines):
+            amount = quantity * price
+            priced.subtotal += amount
+            quantity_total += quantity
+            units.append((price, quantity))
+            members.append((index, amount))
+
+            matches = self.by_product.get(product_id, ())
+            if self.by_category and category_id is not None:
+                matches = (*matches, *self.category_rules(category_id, tree))
+            for promotion in matches:
+                group = groups.get(promotion.id)
+                if group is None:
+                    group = groups[promotion.id] = [promotion, 0, Decimal('0.00'), [], []]
+                group[1] += quantity
+                group[2] += amount
+                group[3].append((price, quantity))
+                group[4].append((index, amount))
+
+        for promotion in self.cart_rules:
+            groups[promotion.id] = [promotion, quantity_total, priced.subtotal, units, members]
+
+        # Lo que cada línea todavía puede descontar; las promociones se aplican por id
+        remaining = [amount for _, amount in members]
+        for promotion, quantity, amount, group_units, group_members in sorted(groups.values(), key=lambda g: g[0].id):
+            if not promotion.is_current(now):
+                continue
+            discount = promotion.discount_for(quantity, amount, group_units)
+            if discount > 0:
+                discount = allocate(discount, amount, group_members, remaining)
+            if discount > 0:
+                priced.applied.append((promotion, discount))
+        return priced
+
+
+def allocate(discount, amount, members, remaining):
+    """
+    Repartir ``discount`` entre las líneas ``(índice, importe)`` del grupo en
+    proporción a su importe, sin pasar lo que le queda a cada línea en
+    ``remaining``. Devuelve la parte que se pudo aplicar.
+    """
+    applied = Decimal('0.00')
+    last = len(members) - 1
+    for position, (index, line_amount) in enumerate(members):
+        pending = discount - applied
+        share = pending if position == last else min((discount * line_amount / amount).quantize(CENT), pending)
+        share = min(share, remaining[index])
+        remaining[index] -= share
+        applied += share
+    return applied
+
+
+def build_promotion_engine(version):
+    from .models import Promotion
+
+    promotions = list(Promotion.objects.filter(is_active=True, valid_to__gte=timezone.now()))
+    return PromotionEngine(promotions, version)
+
+
+def current_version():
+    return versions.current_version(VERSION_KEY)
+
+
+def get_promotion_engine():
+    global _engine
+    engine = _engine
+    version = current_version()
+    if engine is not None and engine.version == version:
+        return engine
+    with _lock:
+        if _engine is engine:
+            _engine = build_promotion_engine(version)
+        return _engine
+
+
+def _bump():
+    global _engine
+    _engine = None
+    versions.bump_version(VERSION_KEY)
+
+
+def invalidate_promotion_engine():
+    """Descartar el evaluador en todos los procesos ahora y de nuevo al confirmar la transacción en curso"""
+    _bump()
+    transaction.on_commit(_bump)
@@ -0,0 +1,40 @@
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import redemptions
+from .models import Coupon, CouponRedemption, Promotion
+from .rules import invalidate_promotion_engine
+from .table import invalidate_coupon_table
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def clear_coupon_table(sender, **kwargs):
+    invalidate_coupon_table()
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def clear_promotion_engine(sender, **kwargs):
+    invalidate_promotion_engine()
+
+
+@receiver(post_save, sender='orders.Order')
+def give_back_cancelled_coupon(sender, instance, created, **kwargs):
+    """Devolver el uso del cupón cuando la orden se cancela (una sola vez por orden)"""
+    if not created and instance.status == 'cancelled' and instance.coupon_id:
+        redemptions.give_back(instance)
+
+
+@receiver(post_delete, sender=CouponRedemption)
+def give_back_deleted_order_coupon(sender, instance, origin=None, **kwargs):
+    """
+    Devolver el uso de un cupón cuya orden se borró (el registro se borra en
+    cascada con ella). No aplica si se borra el cupón o el registro mismo, ni
+    si el uso ya se había devuelto (``give_back_orders`` antes de un borrado masivo).
+    """
+    deleted_from = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if instance.returned_at is not None or deleted_from in (Coupon, CouponRedemption):
+        return
+    Coupon.objects.filter(pk=instance.coupon_id, used_count__gt=0).update(used_count=F('used_count') - 1)
+    invalidate_coupon_table()
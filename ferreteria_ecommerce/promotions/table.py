@@ -0,0 +1,111 @@
+"""
+Tabla en memoria de los cupones activos.
+
+El carrito, el checkout y los formularios de cupón consultan el cupón en
+cada petición. Los cupones activos se cargan con una sola consulta y se
+guardan en el proceso, por código y por id, junto con un índice de sus
+ventanas de vigencia: los extremos ``valid_from``/``valid_to`` ordenados
+parten el tiempo en tramos y cada tramo guarda los ids vigentes, así saber
+si un cupón vale ahora es una búsqueda binaria y una pertenencia a un
+conjunto.
+
+Cada proceso compara su tabla con una versión guardada en la caché
+compartida ``PROMOTIONS_VERSION_CACHE`` (ver ``versions.py``). Guardar o
+borrar un cupón cambia esa versión (ver ``promotions/signals.py``) y todos
+los procesos la reconstruyen en su siguiente consulta. ``used_count`` se
+copia al construir la tabla y solo sirve para avisar antes; el límite real
+lo aplica ``Coupon.use()`` contra la base de datos al confirmar la orden.
+"""
+import copy
+import threading
+from bisect import bisect_right
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import versions
+
+VERSION_KEY = 'promotions:coupon-table'
+
+_lock = threading.Lock()
+_table = None
+
+
+class CouponTable:
+    def __init__(self, coupons, version):
+        self.version = version
+        self.by_id = {coupon.pk: coupon for coupon in coupons}
+        self.by_code = {coupon.code: coupon for coupon in coupons}
+
+        # Tramo i: desde boundaries[i - 1] (incluido) hasta boundaries[i] (excluido)
+        self.boundaries = sorted({coupon.valid_from for coupon in coupons} | {coupon.valid_to for coupon in coupons})
+        self.windows = [frozenset()] + [
+            frozenset(coupon.pk for coupon in coupons if coupon.valid_from <= moment < coupon.valid_to)
+            for moment in self.boundaries
+        ]
+        # valid_to es inclusivo: en ese instante exacto el cupón todavía vale
+        self.last_moments = {(coupon.valid_to, coupon.pk) for coupon in coupons}
+
+    def active_ids(self, now=None):
+        """Ids de los cupones vigentes en ``now`` (sin mirar el límite de uso)"""
+        now = now or timezone.now()
+        return self.windows[bisect_right(self.boundaries, now)]
+
+    def is_active(self, coupon_id, now=None):
+        now = now or timezone.now()
+        if coupon_id in self.active_ids(now):
+            return True
+        return (now, coupon_id) in self.last_moments
+
+    def get(self, code=None, id=None, now=None):
+        """
+        Copia del cupón vigente con ese código o id, o None si no existe, no
+        está vigente o ya agotó sus usos según el conteo de la tabla.
+        """
+        coupon = self.by_code.get(code) if code is not None else self.by_id.get(id)
+        if coupon is None or not self.is_active(coupon.pk, now):
+            return None
+        if coupon.usage_limit is not None and coupon.used_count >= coupon.usage_limit:
+            return None
+        # Copia: quien la use puede modificarla (por ejemplo Coupon.use refresca used_count)
+        return copy.copy(coupon)
+
+
+def build_coupon_table(version):
+    from .models import Coupon
+
+    coupons = list(Coupon.objects.filter(is_active=True, valid_to__gte=timezone.now()))
+    return CouponTable(coupons, version)
+
+
+def current_version():
+    return versions.current_version(VERSION_KEY)
+
+
+def get_coupon_table():
+    global _table
+    table = _table
+    version = current_version()
+    if table is not None and table.version == version:
+        return table
+    with _lock:
+        if _table is table:
+            _table = build_coupon_table(version)
+        return _table
+
+
+def get_coupon(code=None, id=None, now=None):
+    """Cupón vigente por código o id (ver ``CouponTable.get``)"""
+    return get_coupon_table().get(code=code, id=id, now=now)
+
+
+def _bump():
+    global _table
+    _table = None
+    versions.bump_version(VERSION_KEY)
+
+
+def invalidate_coupon_table():
+    """Descartar la tabla en todos los procesos ahora y de nuevo al confirmar la transacción en curso"""
+    _bump()
+    transaction.on_commit(_bump)
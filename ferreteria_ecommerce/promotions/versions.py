@@ -0,0 +1,44 @@
+"""
+Versiones compartidas de las tablas en memoria (``table.py`` y ``rules.py``).
+
+Cada proceso guarda su tabla junto con la versión con la que la construyó y
+la compara en cada consulta con la versión guardada en la caché
+``settings.PROMOTIONS_VERSION_CACHE``. Esa caché tiene que ser la misma para
+todos los procesos: con ``LocMemCache`` cada proceso tiene su propia versión
+y guardar un cupón solo invalida la tabla del proceso que lo guardó. Por eso
+fuera de DEBUG una caché local es un error de configuración que el chequeo
+del sistema ``promotions.E001`` reporta al arrancar (``check_version_cache``).
+"""
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def version_cache():
+    return caches[getattr(settings, 'PROMOTIONS_VERSION_CACHE', 'default')]
+
+
+def check_version_cache(app_configs=None, **kwargs):
+    """Chequeo del sistema: fuera de DEBUG la caché de versiones debe ser compartida"""
+    alias = getattr(settings, 'PROMOTIONS_VERSION_CACHE', 'default')
+    if settings.DEBUG or not isinstance(caches[alias], LocMemCache):
+        return []
+    return [
+        checks.Error(
+            f"PROMOTIONS_VERSION_CACHE ('{alias}') es una LocMemCache, que no se comparte entre "
+            "procesos: los cambios de cupones y promociones no llegarían a los demás.",
+            hint='Configura una caché compartida (Redis, Memcached o base de datos).',
+            id='promotions.E001',
+        )
+    ]
+
+
+def current_version(key):
+    return version_cache().get_or_set(key, lambda: uuid.uuid4().hex, timeout=None)
+
+
+def bump_version(key):
+    version_cache().set(key, uuid.uuid4().hex, timeout=None)
@@ -1,12 +1,20 @@
-// Actualizar contador del carrito
-function updateCartCount() {
+// Actualizar contador del carrito.
+// La página ya trae el contador y las acciones del carrito hechas con fetch
+// devuelven cart_count; solo se consulta /cart/count/ si no se pasa el valor
+// (el navegador revalida con ETag y normalmente recibe 304).
+function updateCartCount(count) {
     const cartCountElement = document.getElementById('cart-count');
     if (!cartCountElement) {
         console.warn('Elemento cart-count no encontrado');
         return;
     }
     
-    fetch('/cart/count/')
+    if (typeof count === 'number') {
+        cartCountElement.textContent = count;
+        return;
+    }
+    
+    fetch('/cart/count/', { credentials: 'same-origin' })
         .then(response => {
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
@@ -22,9 +30,8 @@ function updateCartCount() {
             }
         })
         .catch(error => {
+            // Conservar el valor que trajo la página
             console.error('Error al actualizar contador del carrito:', error);
-            // Mantener el contador en 0 si hay error
-            cartCountElement.textContent = '0';
         });
 }
 
@@ -34,13 +41,11 @@ function forceUpdateCartCount() {
     updateCartCount();
 }
 
-// Actualizar contador al cargar la página
-document.addEventListener('DOMContentLoaded', function() {
-    console.log('DOM cargado, actualizando contador del carrito...');
-    updateCartCount();
-    
-    // También actualizar después de un pequeño delay para asegurar que todo esté listo
-    setTimeout(updateCartCount, 100);
+// Al volver con "Atrás" el navegador puede mostrar la página guardada con un contador viejo
+window.addEventListener('pageshow', function(event) {
+    if (event.persisted) {
+        updateCartCount();
+    }
 });
 
 // Actualizar contador cuando la página se vuelve visible (útil para pestañas)
@@ -59,25 +59,107 @@ function updateButtonState(itemId) {
     }
 }
 
+// Cantidades pendientes de enviar: se juntan todos los cambios del carrito
+// y se mandan en un solo pedido a /cart/update/
+const pendingQuantities = {};
+let pendingTimer = null;
+
 // Función para actualizar automáticamente la cantidad
 function autoUpdateQuantity(itemId) {
     const quantityInput = document.getElementById('quantity-' + itemId);
-    const form = quantityInput.closest('form');
+    if (!quantityInput || quantityInput.value === quantityInput.dataset.saved) {
+        return;
+    }
     
-    if (form) {
-        // Mostrar indicador de carga en el botón de actualizar
-        const submitBtn = form.querySelector('button[type="submit"]');
-        
-        submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
-        submitBtn.disabled = true;
-        submitBtn.classList.add('btn-primary');
-        submitBtn.classList.remove('btn-outline-primary');
-        
-        // Enviar el formulario
-        form.submit();
+    pendingQuantities[itemId] = parseInt(quantityInput.value);
+    clearTimeout(pendingTimer);
+    pendingTimer = setTimeout(sendPendingQuantities, 300);
+}
+
+// Enviar todas las cantidades pendientes en un solo pedido
+function sendPendingQuantities() {
+    const container = document.getElementById('cart-items');
+    const itemIds = Object.keys(pendingQuantities);
+    if (!container || itemIds.length === 0) {
+        return;
+    }
+    
+    const lines = itemIds.map(itemId => ({item_id: itemId, quantity: pendingQuantities[itemId]}));
+    itemIds.forEach(itemId => delete pendingQuantities[itemId]);
+    
+    fetch(container.dataset.updateUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
+            'X-Requested-With': 'XMLHttpRequest'
+        },
+        body: JSON.stringify({items: lines})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.items === undefined) {
+            // El carrito ya no existe: recargar para mostrar el estado real
+            window.location.reload();
+            return;
+        }
+        applyCartState(data);
+        if (!data.success) {
+            showCartMessage(data.message);
+        }
+    })
+    .catch(error => {
+        console.error('Error al actualizar el carrito:', error);
+        window.location.reload();
+    });
+}
+
+// Mostrar en la página el estado que devolvió el servidor
+function applyCartState(data) {
+    data.items.forEach(function(item) {
+        const quantityInput = document.getElementById('quantity-' + item.item_id);
+        const lineTotal = document.getElementById('line-total-' + item.item_id);
+        if (quantityInput && !(item.item_id in pendingQuantities)) {
+            quantityInput.value = item.quantity;
+            quantityInput.dataset.saved = String(item.quantity);
+            updateButtonState(item.item_id);
+        }
+        if (lineTotal) {
+            lineTotal.textContent = item.total;
+        }
+    });
+    
+    ['subtotal', 'promotions', 'discount', 'total'].forEach(function(field) {
+        const element = document.getElementById('cart-' + field);
+        if (element) {
+            element.textContent = data[field];
+        }
+    });
+    
+    if (typeof updateCartCount === 'function') {
+        updateCartCount(data.cart_count);
     }
 }
 
+// Aviso simple cuando alguna cantidad no se pudo aplicar
+function showCartMessage(message) {
+    const notification = document.createElement('div');
+    notification.className = 'alert alert-warning alert-dismissible fade show position-fixed';
+    notification.style.cssText = 'top: 20px; right: 20px; z-index: 9999; min-width: 300px;';
+    notification.innerHTML = `
+        <i class="fas fa-exclamation-circle me-2"></i>
+        ${message}
+        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+    `;
+    document.body.appendChild(notification);
+    
+    setTimeout(() => {
+        if (notification.parentNode) {
+            notification.remove();
+        }
+    }, 3000);
+}
+
 // Inicializar cuando se carga la página
 document.addEventListener('DOMContentLoaded', function() {
     // Obtener todos los selectores de cantidad en el carrito
@@ -85,6 +167,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     quantityInputs.forEach(function(input) {
         const itemId = input.id.split('-')[1];
+        input.dataset.saved = input.value;
         
         // Inicializar estado de botones
         updateButtonState(itemId);
@@ -2,11 +2,8 @@
 // Esperar a que base.js esté completamente cargado
 function initializeOffers() {
     
-    // Asegurar que el contador del carrito se actualice
-    if (typeof updateCartCount === 'function') {
-        console.log('Actualizando contador del carrito desde offers.js...');
-        updateCartCount();
-    } else {
+    // El contador del carrito ya viene en la página; solo esperar a base.js
+    if (typeof updateCartCount !== 'function') {
         console.warn('Función updateCartCount no encontrada, esperando...');
         // Reintentar después de un delay
         setTimeout(initializeOffers, 100);
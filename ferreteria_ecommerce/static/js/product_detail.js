@@ -85,12 +85,13 @@ function addRelatedProductToCart(productId, event) {
     submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Agregando...';
     submitBtn.disabled = true;
     
-    // Enviar formulario
-    fetch(form.action, {
+    // Enviar formulario al endpoint JSON (asíncrono bajo ASGI)
+    fetch(form.dataset.cartApi, {
         method: 'POST',
         body: new FormData(form),
         headers: {
-            'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value
+            'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value,
+            'X-Requested-With': 'XMLHttpRequest'
         }
     })
     .then(response => response.json())
@@ -99,8 +100,9 @@ function addRelatedProductToCart(productId, event) {
             // Mostrar mensaje de éxito
             showNotification('Producto agregado al carrito', 'success');
             
-            // Actualizar contador del carrito
+            // Actualizar contador del carrito y stock disponible
             updateCartCount(data.cart_count);
+            refreshAvailability();
             
             // Cambiar botón a estado de éxito
             submitBtn.innerHTML = '<i class="fas fa-check me-2"></i>¡Agregado!';
@@ -114,7 +116,7 @@ function addRelatedProductToCart(productId, event) {
                 submitBtn.classList.add('btn-accent');
             }, 2000);
         } else {
-            showNotification('Error al agregar el producto', 'error');
+            showNotification(data.message || 'Error al agregar el producto', 'error');
             submitBtn.innerHTML = originalText;
             submitBtn.disabled = false;
         }
@@ -127,6 +129,33 @@ function addRelatedProductToCart(productId, event) {
     });
 }
 
+// Función para actualizar el stock disponible del producto
+function refreshAvailability() {
+    const status = document.getElementById('stock-status');
+    if (!status) {
+        return;
+    }
+    
+    fetch(status.dataset.availabilityUrl, { credentials: 'same-origin' })
+    .then(response => response.json())
+    .then(data => {
+        const product = data.products && data.products[status.dataset.productId];
+        if (!product) {
+            return;
+        }
+        status.innerHTML = product.in_stock
+            ? `<div class="stock-status in-stock"><i class="fas fa-check-circle"></i> En stock - ${product.available} unidades disponibles</div>`
+            : '<div class="stock-status out-of-stock"><i class="fas fa-times-circle"></i> Sin stock</div>';
+        
+        const quantityInput = document.getElementById('quantity');
+        if (quantityInput && product.available > 0) {
+            quantityInput.max = product.available;
+            updateButtonState();
+        }
+    })
+    .catch(error => console.error('Error:', error));
+}
+
 // Función para mostrar notificaciones
 function showNotification(message, type = 'info') {
     // Crear elemento de notificación
@@ -188,18 +217,22 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Configurar formularios de productos relacionados
-    const relatedProductForms = document.querySelectorAll('form[action*="add_to_cart"]');
+    const relatedProductForms = document.querySelectorAll('form[data-cart-api]');
     relatedProductForms.forEach(form => {
         form.addEventListener('submit', function(event) {
             addRelatedProductToCart(null, event);
         });
     });
     
+    // El stock de la página puede estar desactualizado (caché, reservas de otros)
+    refreshAvailability();
+    
     // Configurar miniaturas de imágenes
     const thumbnails = document.querySelectorAll('.thumbnail');
     thumbnails.forEach(thumb => {
         thumb.addEventListener('click', function() {
-            changeMainImage(this.src);
+            // Las miniaturas son pequeñas: usar la versión de detalle si existe
+            changeMainImage(this.dataset.full || this.src);
         });
     });
     
@@ -5,23 +5,15 @@ function handleFilter(filter) {
     // Obtener la URL actual
     let url = new URL(window.location);
     
-    // Obtener la página actual
-    let currentPage = url.searchParams.get('page');
-    
-    // Limpiar parámetros existentes
+    // Limpiar parámetros existentes (el cursor depende del filtro, volver a la primera página)
     url.searchParams.delete('status');
-    url.searchParams.delete('page');
+    url.searchParams.delete('cursor');
     
     // Si no es "all", agregar el filtro de estado
     if (filter !== 'all') {
         url.searchParams.set('status', filter);
     }
     
-    // Mantener la página actual si existe
-    if (currentPage) {
-        url.searchParams.set('page', currentPage);
-    }
-    
     console.log('Navigating to:', url.toString());
     
     // Navegar a la nueva URL
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from catalog.models import Category, Product
+from catalog.pagination import KeysetPaginator
+from warehouse.models import InventoryMovement
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Comparar la latencia de OFFSET vs cursor en movimientos de inventario (página 1 vs página profunda)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=5000, help='Página profunda a medir')
+        parser.add_argument('--per-page', type=int, default=50, help='Movimientos por página')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por medición')
+
+    def timed(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+        per_page = options['per_page']
+        repeat = options['repeat']
+        total = pages * per_page
+
+        # Todo se ejecuta dentro de una transacción que se revierte al final
+        try:
+            with transaction.atomic():
+                self.stdout.write(f'Generando {total} movimientos de prueba...')
+                category = Category.objects.create(name='Benchmark', slug='benchmark-paginacion')
+                product = Product.objects.create(
+                    name='Producto benchmark', slug='producto-benchmark-paginacion',
+                    description='-', price=1, category=category, sku='BENCH-PAG'
+                )
+                InventoryMovement.objects.bulk_create(
+                    (InventoryMovement(product=product, movement_type='in', quantity=1, reason='benchmark')
+                     for _ in range(total)),
+                    batch_size=5000,
+                )
+
+                movements = InventoryMovement.objects.select_related('product', 'variant')
+                ordering = ['-created_at', '-id']
+                offset_paginator = Paginator(movements.order_by(*ordering), per_page)
+                keyset_paginator = KeysetPaginator(movements, per_page, ordering)
+
+                # Cursor que apunta a la página profunda (se obtiene una sola vez, fuera de la medición)
+                anchor = movements.order_by(*ordering)[(pages - 1) * per_page - 1]
+                deep_cursor = keyset_paginator.encode_cursor(anchor, 'next')
+
+                results = [
+                    ('OFFSET página 1', self.timed(lambda: list(offset_paginator.get_page(1)), repeat)),
+                    (f'OFFSET página {pages}', self.timed(lambda: list(offset_paginator.get_page(pages)), repeat)),
+                    ('Cursor página 1', self.timed(lambda: list(keyset_paginator.get_page(None)), repeat)),
+                    (f'Cursor página {pages}', self.timed(lambda: list(keyset_paginator.get_page(deep_cursor)), repeat)),
+                ]
+
+                self.stdout.write('\n' + '=' * 50)
+                self.stdout.write('RESULTADOS (mediana en ms)')
+                self.stdout.write('=' * 50)
+                for label, ms in results:
+                    self.stdout.write(f'{label:<25} {ms:>10.2f} ms')
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('\nDatos de prueba eliminados.'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_keyset_indexes'),
+        ('orders', '0003_order_keyset_index'),
+        ('warehouse', '0002_inventorymovement_variant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorymovement',
+            index=models.Index(fields=['-created_at', '-id'], name='movement_created_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['-shipped_at', '-id'], name='shipment_shipped_keyset_idx'),
+        ),
+    ]
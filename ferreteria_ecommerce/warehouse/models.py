@@ -23,6 +23,9 @@ class InventoryMovement(models.Model):
         verbose_name = "Movimiento de inventario"
         verbose_name_plural = "Movimientos de inventario"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='movement_created_keyset_idx'),
+        ]
 
     def __str__(self):
         variant_info = f" - {self.variant.name}: {self.variant.value}" if self.variant else ""
@@ -45,7 +48,7 @@ class InventoryMovement(models.Model):
             elif self.movement_type == 'adjustment':
                 # Para ajustes, establecer la cantidad directamente
                 stock_item.quantity = self.quantity
-                stock_item.save()
+                stock_item.save(update_fields=['quantity', 'updated_at'])
                 
         except Exception as e:
             # Si hay error, solo registrar el movimiento sin afectar stock
@@ -63,6 +66,9 @@ class Shipment(models.Model):
         verbose_name = "Despacho"
         verbose_name_plural = "Despachos"
         ordering = ['-shipped_at']
+        indexes = [
+            models.Index(fields=['-shipped_at', '-id'], name='shipment_shipped_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"Despacho {self.order.order_number}"
@@ -1,32 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
 from django.urls import reverse
 from django.db import transaction
+from django.utils.http import urlencode
 from .models import InventoryMovement, Shipment
 from orders.models import Order
+from catalog.pagination import KeysetPaginator
 
 
 def redirect_with_params(request, url_name):
     """Redirigir manteniendo los parámetros de filtro y página"""
     # Obtener parámetros actuales
     status_filter = request.GET.get('status')
-    page = request.GET.get('page')
+    cursor = request.GET.get('cursor')
     
     # Construir la URL base
     url = reverse(url_name)
     
     # Agregar parámetros si existen
-    params = []
+    params = {}
     if status_filter:
-        params.append(f'status={status_filter}')
-    if page:
-        params.append(f'page={page}')
+        params['status'] = status_filter
+    if cursor:
+        params['cursor'] = cursor
     
     # Construir URL final
     if params:
-        url += '?' + '&'.join(params)
+        url += '?' + urlencode(params)
     
     return redirect(url)
 
@@ -34,21 +35,22 @@ def redirect_with_params(request, url_name):
 def order_list(request):
     """Lista de órdenes para el almacén"""
     # Mostrar todas las órdenes ordenadas por fecha y hora de creación (más recientes primero)
-    orders = Order.objects.select_related('coupon').order_by('-created_at', '-id')
+    orders = Order.objects.select_related('coupon')
     
     # Filtros
     status_filter = request.GET.get('status')
     if status_filter:
         orders = orders.filter(status=status_filter)
     
-    # Paginación
-    paginator = Paginator(orders, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor
+    paginator = KeysetPaginator(orders, 20, ['-created_at', '-id'], with_estimate=True)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
         'status_filter': status_filter,
+        # Solo decide si se muestra "Eliminar Todas"; el conteo exacto lo da delete_all_orders
+        'has_orders': Order.objects.exists(),
     }
     return render(request, 'warehouse/order_list.html', context)
 
@@ -193,17 +195,16 @@ def delete_all_orders(request):
 
 def inventory_movements(request):
     """Lista de movimientos de inventario"""
-    movements = InventoryMovement.objects.all().order_by('-created_at')
+    movements = InventoryMovement.objects.select_related('product', 'variant')
     
     # Filtros
     movement_type = request.GET.get('type')
     if movement_type:
         movements = movements.filter(movement_type=movement_type)
     
-    # Paginación
-    paginator = Paginator(movements, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor (la tabla solo crece, evitar OFFSET y COUNT)
+    paginator = KeysetPaginator(movements, 50, ['-created_at', '-id'])
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -214,12 +215,11 @@ def inventory_movements(request):
 
 def shipments_list(request):
     """Lista de despachos"""
-    shipments = Shipment.objects.all().order_by('-shipped_at')
+    shipments = Shipment.objects.select_related('order')
     
-    # Paginación
-    paginator = Paginator(shipments, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor
+    paginator = KeysetPaginator(shipments, 20, ['-shipped_at', '-id'])
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,